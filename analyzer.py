@@ -1,13 +1,17 @@
 # analyzer
 
 import logging
+from dataclasses import dataclass, field
 from enum import Enum, auto
 
 import expression as Expr
 import statement as Stmt
+from environment import Capture
 from errors import LoxError
 from tokens import Token
 
+DECLARATIONS = (Stmt.Var, Stmt.Function, Stmt.Class)
+
 
 class FunctionType(Enum):
     NONE = (auto(),)
@@ -22,6 +26,29 @@ class ClassType(Enum):
     SUBCLASS = auto()
 
 
+@dataclass
+class Local:
+    slot: int
+    # The frame holding it, counted from the outermost frame open
+    frame: int
+    # Whether functions may capture it, so that it is held in a Cell
+    cell: bool = False
+    is_defined: bool = False
+
+
+@dataclass
+class FrameState:
+    """A frame open: of a function, or of a scope outside any function."""
+
+    # Names the functions declared in it refer to. Its locals of those
+    # names are held in cells.
+    captured: set[str]
+    size: int = 0
+    # The variables of enclosing frames the function captures, and the
+    # index of the upvalue of each
+    upvalues: dict[Capture, int] = field(default_factory=dict)
+
+
 class AnalyzerError(LoxError):
     def __init__(self, token: Token, message: str):
         super().__init__(message)
@@ -36,16 +63,21 @@ class AnalyzerError(LoxError):
 
 class Analyzer:
     def __init__(self):
-        self.scopes: list[dict[str, bool]] = []
+        self.scopes: list[dict[str, Local]] = []
+        # The frames open, innermost last. Functions, and the scopes of
+        # 'super' and of blocks outside any function open one, blocks in a
+        # function keep their locals in its frame.
+        self.frames: list[FrameState] = []
         self.functions: list[FunctionType] = [FunctionType.NONE]
         self.classes: list[ClassType] = [ClassType.NONE]
         self.logger = logging.getLogger("Lox.Analyzer")
 
-    def analyze(self, statements: list[Stmt.Statement]):
+    def analyze(self, statements: list[Stmt.Statement]) -> bool:
         has_error = False
+        calls = False
         for stmt in statements:
             try:
-                self.analyze_one(stmt)
+                calls |= self.analyze_one(stmt)
 
             except LoxError as e:
                 self.logger.error(e)
@@ -53,29 +85,44 @@ class Analyzer:
 
         if has_error:
             raise LoxError()
+        return calls
 
-    def analyze_one(self, stmt_or_expr: Stmt.Statement | Expr.Expression):
+    def analyze_one(self, stmt_or_expr: Stmt.Statement | Expr.Expression) -> bool:
+        """Return whether the node contains a call, recorded on it."""
+        calls = False
         match stmt_or_expr:
             case Stmt.Block(stmts):
+                # Locals take slots of the enclosing frame, or outside any
+                # function of the one frame all such blocks share, reused by
+                # every run of the block: those that functions capture get a
+                # new cell each time they are declared instead of a new frame.
+                has_frame = not self.frames and any(
+                    isinstance(stmt, DECLARATIONS) for stmt in stmts
+                )
+                if has_frame:
+                    self.frames.append(FrameState(captured_names(stmts)))
                 self.begin_scope()
-                self.analyze(stmts)
+                calls = self.analyze(stmts)
                 self.end_scope()
+                if has_frame:
+                    stmt_or_expr.size = self.frames.pop().size
+                stmt_or_expr.has_frame = has_frame
 
             case Stmt.Var(name, initializer):
-                self.declare(name)
+                self.declaration(stmt_or_expr)
                 if initializer:
-                    self.analyze_one(initializer)
+                    calls = self.analyze_one(initializer)
                 self.define(name)
 
             case Stmt.Function(name, _, _):
-                self.declare(name)
+                self.declaration(stmt_or_expr)
                 self.define(name)
                 self.analyze_function(stmt_or_expr, FunctionType.FUNCTION)
 
             case Stmt.Class(name, superclass, methods):
                 self.classes.append(ClassType.CLASS)
 
-                self.declare(name)
+                self.declaration(stmt_or_expr)
                 self.define(name)
 
                 if superclass:
@@ -86,12 +133,12 @@ class Analyzer:
                     self.classes.append(ClassType.SUBCLASS)
                     self.analyze_one(superclass)
 
+                    # 'super' is the one local of a frame of its own,
+                    # which the methods close over
+                    self.frames.append(FrameState(captured_names(methods)))
                     self.begin_scope()
-                    self.scopes[-1]["super"] = True
+                    self.add_local("super").is_defined = True
 
-                self.begin_scope()
-
-                self.scopes[-1]["this"] = True
                 for m in methods:
                     fntype = (
                         FunctionType.INITIALIZER
@@ -100,25 +147,24 @@ class Analyzer:
                     )
                     self.analyze_function(m, fntype)
 
-                self.end_scope()
-
                 if superclass:
                     self.end_scope()
+                    stmt_or_expr.upvalues = list(self.frames.pop().upvalues)
                     self.classes.pop()
 
                 self.classes.pop()
 
             case Stmt.Expression(expr):
-                self.analyze_one(expr)
+                calls = self.analyze_one(expr)
 
             case Stmt.If(cond, cons, alt):
-                self.analyze_one(cond)
-                self.analyze_one(cons)
+                calls = self.analyze_one(cond)
+                calls |= self.analyze_one(cons)
                 if alt:
-                    self.analyze_one(alt)
+                    calls |= self.analyze_one(alt)
 
             case Stmt.Print(expr):
-                self.analyze_one(expr)
+                calls = self.analyze_one(expr)
 
             case Stmt.Return(keyword, value):
                 if self.functions[-1] == FunctionType.NONE:
@@ -130,56 +176,60 @@ class Analyzer:
                             keyword, "Can't return a value from an initializer"
                         )
 
-                    self.analyze_one(value)
+                    calls = self.analyze_one(value)
+                    stmt_or_expr.tail = isinstance(value, Expr.Call)
 
             case Stmt.While(cond, body):
-                self.analyze_one(cond)
-                self.analyze_one(body)
+                calls = self.analyze_one(cond)
+                calls |= self.analyze_one(body)
 
             case Expr.Variable(name):
                 if self.scopes:
-                    scope = self.scopes[-1]
-                    if not scope.get(name.lexeme, True):
+                    local = self.scopes[-1].get(name.lexeme)
+                    if local and not local.is_defined:
                         raise AnalyzerError(
                             name, "Can't read local variable in its own initializer"
                         )
+                self.resolve(stmt_or_expr, name.lexeme)
 
             case Expr.Assignment(name, value):
-                self.analyze_one(value)
+                calls = self.analyze_one(value)
+                self.resolve(stmt_or_expr, name.lexeme)
 
             case Expr.Binary(_, left, right):
-                self.analyze_one(left)
-                self.analyze_one(right)
+                calls = self.analyze_one(left)
+                calls |= self.analyze_one(right)
 
             case Expr.Call(callee, _, args):
                 self.analyze_one(callee)
                 for arg in args:
                     self.analyze_one(arg)
+                calls = True
 
             case Expr.Set(target, _, value):
-                self.analyze_one(value)
-                self.analyze_one(target)
+                calls = self.analyze_one(value)
+                calls |= self.analyze_one(target)
 
             case Expr.Get(target):
-                self.analyze_one(target)
+                calls = self.analyze_one(target)
 
             case Expr.Grouping(expr):
-                self.analyze_one(expr)
+                calls = self.analyze_one(expr)
 
             case Expr.Literal():
-                return
+                pass
 
             case Expr.Logical(_, left, right):
-                self.analyze_one(left)
-                self.analyze_one(right)
+                calls = self.analyze_one(left)
+                calls |= self.analyze_one(right)
 
             case Expr.Unary(_, expr):
-                self.analyze_one(expr)
+                calls = self.analyze_one(expr)
 
             case Expr.This(keyword):
                 if self.classes[-1] == ClassType.NONE:
                     raise AnalyzerError(keyword, "Can't use 'this' outside of a class")
-                return
+                self.resolve(stmt_or_expr, "this")
 
             case Expr.Super(keyword, _):
                 if self.classes[-1] == ClassType.NONE:
@@ -189,22 +239,36 @@ class Analyzer:
                     raise AnalyzerError(
                         keyword, "Can't use 'super' in a class with no superclass"
                     )
-                return
+                self.resolve(stmt_or_expr, "super")
+                stmt_or_expr.this = Expr.This(keyword)
+                self.resolve(stmt_or_expr.this, "this")
 
             case _:
                 raise NotImplementedError
 
+        if calls:
+            stmt_or_expr.calls = True
+        return calls
+
     def analyze_function(self, fn: Stmt.Function, fntype: FunctionType):
         self.functions.append(fntype)
+        self.frames.append(FrameState(captured_names(fn.body)))
         self.begin_scope()
+        if fntype != FunctionType.FUNCTION:
+            # Methods run with their instance in the first slot
+            self.add_local("this").is_defined = True
         for param in fn.params:
             self.declare(param)
             self.define(param)
+        fn.cells = [local.slot for local in self.scopes[-1].values() if local.cell]
 
         for stmt in fn.body:
             self.analyze_one(stmt)
 
         self.end_scope()
+        frame = self.frames.pop()
+        fn.size = frame.size
+        fn.upvalues = list(frame.upvalues)
         self.functions.pop()
 
     def begin_scope(self):
@@ -213,14 +277,28 @@ class Analyzer:
     def end_scope(self):
         self.scopes.pop()
 
-    def declare(self, name: Token):
+    def add_local(self, name: str) -> Local:
+        frame = self.frames[-1]
+        local = Local(frame.size, len(self.frames) - 1, name in frame.captured)
+        frame.size += 1
+        self.scopes[-1][name] = local
+        return local
+
+    def declare(self, name: Token) -> Local | None:
+        """Return the local declared, None for a global."""
         if not self.scopes:
-            return
+            return None
 
         scope = self.scopes[-1]
         if name.lexeme in scope:
             raise AnalyzerError(name, "Already a variable with this name in this scope")
-        scope[name.lexeme] = False
+        return self.add_local(name.lexeme)
+
+    def declaration(self, stmt: Stmt.Var | Stmt.Function | Stmt.Class):
+        local = self.declare(stmt.name)
+        if local:
+            stmt.slot = local.slot
+            stmt.cell = local.cell
 
     def define(self, name: Token):
         if not self.scopes:
@@ -228,4 +306,101 @@ class Analyzer:
 
         scope = self.scopes[-1]
         if name.lexeme in scope:
-            scope[name.lexeme] = True
+            scope[name.lexeme].is_defined = True
+
+    def resolve(
+        self,
+        expr: Expr.Variable | Expr.Assignment | Expr.This | Expr.Super,
+        name: str,
+    ):
+        for scope in reversed(self.scopes):
+            local = scope.get(name)
+            if local:
+                frame = len(self.frames) - 1
+                expr.depth = frame - local.frame
+                expr.slot = local.slot
+                if expr.depth:
+                    # Functions declared in its frame may only refer to it
+                    # through the name
+                    assert local.cell
+                    expr.upvalue = self.capture(frame, local)
+                else:
+                    expr.cell = local.cell
+                return
+        # Not found: assume it is global.
+
+    def capture(self, frame: int, local: Local) -> int:
+        """Return the index of the upvalue of the local in the frame's function."""
+        if local.frame == frame - 1:
+            key = (True, local.slot)
+        else:
+            key = (False, self.capture(frame - 1, local))
+
+        upvalues = self.frames[frame].upvalues
+        return upvalues.setdefault(key, len(upvalues))
+
+
+def captured_names(statements: list[Stmt.Statement]) -> set[str]:
+    """The names the functions declared in the statements refer to."""
+    names: set[str] = set()
+    for stmt in statements:
+        match stmt:
+            case Stmt.Function(_, _, body):
+                referenced_names(body, names)
+            case Stmt.Class(_, _, methods):
+                for method in methods:
+                    referenced_names(method.body, names)
+            case Stmt.Block(stmts):
+                names |= captured_names(stmts)
+            case Stmt.If(_, consequence, alternative):
+                names |= captured_names([consequence])
+                if alternative is not None:
+                    names |= captured_names([alternative])
+            case Stmt.While(_, body):
+                names |= captured_names([body])
+    return names
+
+
+def referenced_names(
+    nodes: list[Stmt.Statement] | list[Expr.Expression], names: set[str]
+):
+    for node in nodes:
+        match node:
+            case Expr.Variable(name):
+                names.add(name.lexeme)
+            case Expr.Assignment(name, value):
+                names.add(name.lexeme)
+                referenced_names([value], names)
+            case Expr.Literal():
+                pass
+            case Expr.This():
+                names.add("this")
+            case Expr.Super():
+                names.update(("super", "this"))
+            case Expr.Grouping(expr) | Expr.Unary(_, expr) | Expr.Get(expr):
+                referenced_names([expr], names)
+            case Expr.Binary(_, left, right) | Expr.Logical(_, left, right):
+                referenced_names([left, right], names)
+            case Expr.Set(target, _, value):
+                referenced_names([target, value], names)
+            case Expr.Call(callee, _, args):
+                referenced_names([callee, *args], names)
+            case Stmt.Expression(expr) | Stmt.Print(expr):
+                referenced_names([expr], names)
+            case Stmt.Var(_, initializer) | Stmt.Return(_, initializer):
+                if initializer is not None:
+                    referenced_names([initializer], names)
+            case Stmt.Block(stmts) | Stmt.Function(_, _, stmts):
+                referenced_names(stmts, names)
+            case Stmt.If(condition, consequence, alternative):
+                referenced_names([condition, consequence], names)
+                if alternative is not None:
+                    referenced_names([alternative], names)
+            case Stmt.While(condition, body):
+                referenced_names([condition, body], names)
+            case Stmt.Class(_, superclass, methods):
+                if superclass is not None:
+                    referenced_names([superclass], names)
+                referenced_names(methods, names)
+            case _:
+                raise NotImplementedError
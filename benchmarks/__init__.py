@@ -0,0 +1,26 @@
+# benchmarks
+
+import gc
+import tracemalloc
+
+from analyzer import Analyzer
+from environment import Environment
+from interpreter import Interpreter
+from parser import Parser
+from scanner import Scanner
+
+
+def run_traced(source: str) -> tuple[Interpreter, int]:
+    """Run the program, return the Interpreter and the memory still held."""
+    stmts = Parser(Scanner(source).scan_buffer()).parse()
+    assert stmts is not None
+    Analyzer().analyze(stmts)
+    interpreter = Interpreter(Environment())
+
+    gc.collect()
+    tracemalloc.start()
+    interpreter.interpret(stmts)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return interpreter, retained
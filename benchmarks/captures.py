@@ -0,0 +1,68 @@
+# captures
+
+"""Check that closures don't keep the calls they were made in alive.
+
+    $ python -m benchmarks.captures
+    $ python -m benchmarks.captures --count 1000 --size 1000
+"""
+
+import argparse
+import gc
+
+from benchmarks import run_traced
+from loxinstance import LoxInstance
+
+SOURCE = """
+class Node {{
+  init(next) {{ this.next = next; }}
+}}
+class Link {{
+  init(callback, next) {{ this.callback = callback; this.next = next; }}
+}}
+fun make(id) {{
+  var list = nil;
+  for (var i = 0; i < {size}; i = i + 1) list = Node(list);
+  fun callback() {{ return id; }}
+  return callback;
+}}
+var callbacks = nil;
+for (var i = 0; i < {count}; i = i + 1) callbacks = Link(make(i), callbacks);
+"""
+
+# The closure, its cell and the link keeping it, with room to spare: far
+# below the nodes of a single list
+MAX_PER_CLOSURE = 1024
+
+
+def live_nodes() -> int:
+    return sum(
+        1
+        for o in gc.get_objects()
+        if isinstance(o, LoxInstance) and o.klass.name.lexeme == "Node"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--size", type=int, default=1000)
+    args = parser.parse_args()
+
+    interpreter, retained = run_traced(
+        SOURCE.format(count=args.count, size=args.size)
+    )
+    nodes = live_nodes()
+    print(f"closures         {args.count}")
+    print(f"temporary nodes  {args.size} per closure, {nodes} left")
+    print(
+        f"retained memory  {retained / 1e6:8.2f} MB, "
+        f"{retained / args.count:.0f} B/closure"
+    )
+
+    assert interpreter.globals.values["callbacks"] is not None
+    assert nodes == 0, "Closures keep the lists of their calls"
+    assert retained <= MAX_PER_CLOSURE * args.count, "Closures hold too much"
+
+
+if __name__ == "__main__":
+    main()
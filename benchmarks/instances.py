@@ -0,0 +1,40 @@
+# instances
+
+"""Measure the memory held per instance of small classes.
+
+    $ python -m benchmarks.instances
+    $ python -m benchmarks.instances --count 500000
+"""
+
+import argparse
+
+from benchmarks import run_traced
+
+SOURCE = """
+class Vec {{
+  init(x, y, z) {{ this.x = x; this.y = y; this.z = z; }}
+}}
+class Node {{
+  init(value, next) {{ this.value = value; this.next = next; }}
+}}
+var list = nil;
+for (var i = 0; i < {count}; i = i + 1) list = Node(Vec(i, i, i), list);
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    _, retained = run_traced(SOURCE.format(count=args.count))
+    instances = 2 * args.count
+    print(f"instances        {instances}")
+    print(
+        f"retained memory  {retained / 1e6:8.1f} MB, "
+        f"{retained / instances:.0f} B/instance"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# lookup
+
+"""Measure the cost of reading a variable as declarations before it grow.
+
+    $ python -m benchmarks.lookup
+    $ python -m benchmarks.lookup --declarations 1 100 10000 --iterations 5000
+"""
+
+import argparse
+import time
+
+from analyzer import Analyzer
+from interpreter import Interpreter
+from parser import Parser
+from scanner import Scanner
+
+READS_PER_ITERATION = 10
+
+
+def make_source(declarations: int, iterations: int, local: bool) -> str:
+    lines = [f"var v{i} = {i};" for i in range(declarations)]
+    lines.append("var i = 0;")
+    lines.append(f"while (i < {iterations}) {{")
+    lines.append("  " + "v0; " * READS_PER_ITERATION)
+    lines.append("  i = i + 1;")
+    lines.append("}")
+
+    if local:
+        lines = ["{", *lines, "}"]
+
+    return "\n".join(lines)
+
+
+def measure(declarations: int, iterations: int, local: bool, repeat: int) -> float:
+    """Return the best time per read, in nanoseconds."""
+    source = make_source(declarations, iterations, local)
+    stmts = Parser(Scanner(source).scan_buffer()).parse()
+    assert stmts is not None
+    Analyzer().analyze(stmts)
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Interpreter().interpret(stmts)
+        best = min(best, time.perf_counter() - start)
+
+    return best / (iterations * READS_PER_ITERATION) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--declarations", nargs="+", type=int, default=[1, 10, 100, 1000, 10000]
+    )
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'declarations':>12} {'global ns/read':>16} {'local ns/read':>16}")
+    for n in args.declarations:
+        g = measure(n, args.iterations, False, args.repeat)
+        loc = measure(n, args.iterations, True, args.repeat)
+        print(f"{n:>12} {g:>16.0f} {loc:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# memory
+
+"""Measure the memory taken by the tokens and AST of a large program.
+
+    $ python -m benchmarks.memory
+    $ python -m benchmarks.memory --scale 50
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from pathlib import Path
+
+import statement as Stmt
+from parser import Parser
+from scanner import Scanner
+from tokenbuffer import TokenBuffer
+
+SOURCE = Path(__file__).parent.parent / "tests/cases/limit/loop_too_large.lox"
+
+
+def scan_and_parse(source: str):
+    tokens = Scanner(source).scan_buffer()
+    stmts = Parser(tokens).parse()
+    assert stmts is not None
+    return tokens, stmts
+
+
+def measure_memory(source: str) -> tuple[int, int]:
+    """Return the peak and the retained memory of scanning and parsing."""
+    gc.collect()
+    tracemalloc.start()
+    tokens, stmts = scan_and_parse(source)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tokens, stmts
+    return peak, retained
+
+
+def measure_tokens(source: str) -> dict[str, tuple[int, int]]:
+    """Return the memory and blocks held by the tokens, as a list and a buffer."""
+    results = {}
+    for name, scan in [
+        ("list", lambda: Scanner(source).scan_tokens()),
+        ("buffer", lambda: Scanner(source).scan_buffer()),
+    ]:
+        gc.collect()
+        tracemalloc.start()
+        tokens = scan()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        statistics = snapshot.statistics("filename")
+        results[name] = (
+            sum(stat.size for stat in statistics),
+            sum(stat.count for stat in statistics),
+        )
+        del tokens, snapshot, statistics
+    return results
+
+
+def read_buffer(tokens: TokenBuffer):
+    for kind, line in zip(tokens.kinds, tokens.lines):
+        kind
+        line
+
+
+def measure_access(
+    source: str, repeat: int
+) -> tuple[float, float, float, int]:
+    """Return the best time per attribute read, in ns, and the token count."""
+    buffer, stmts = scan_and_parse(source)
+    tokens = buffer.tokens()
+    expressions = [
+        s.expression
+        for stmt in stmts
+        if isinstance(stmt, Stmt.While)
+        for s in getattr(stmt.body, "statements", [])
+        if isinstance(s, Stmt.Expression)
+    ]
+
+    token_best = buffer_best = expression_best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for token in tokens:
+            token.type
+            token.line
+        token_best = min(token_best, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        read_buffer(buffer)
+        buffer_best = min(buffer_best, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for expression in expressions:
+            expression.value
+            expression.token
+        expression_best = min(expression_best, time.perf_counter() - start)
+
+    return (
+        token_best / (2 * len(tokens)) * 1e9,
+        buffer_best / (2 * len(tokens)) * 1e9,
+        expression_best / (2 * len(expressions)) * 1e9,
+        len(tokens),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    source = SOURCE.read_text() * args.scale
+
+    start = time.perf_counter()
+    scan_and_parse(source)
+    elapsed = time.perf_counter() - start
+
+    peak, retained = measure_memory(source)
+    tokens = measure_tokens(source)
+    token_read, buffer_read, expression_read, count = measure_access(
+        source, args.repeat
+    )
+
+    print(f"source           {len(source) / 1e6:8.2f} MB, {count} tokens")
+    print(f"scan + parse     {elapsed:8.3f} s")
+    print(f"peak memory      {peak / 1e6:8.1f} MB")
+    print(f"retained memory  {retained / 1e6:8.1f} MB, {retained / count:.0f} B/token")
+    for name, (size, blocks) in tokens.items():
+        print(
+            f"tokens ({name + ')':7} {size / 1e6:8.1f} MB, "
+            f"{blocks / count:.2f} allocations/token"
+        )
+    print(f"token read       {token_read:8.1f} ns")
+    print(f"buffer read      {buffer_read:8.1f} ns")
+    print(f"expression read  {expression_read:8.1f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# run
+
+"""Run the Lox benchmarks in this directory on one or more engines.
+
+    $ python -m benchmarks.run
+    $ python -m benchmarks.run fib method_call --engine tree vm --repeat 5
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+import lox
+
+BENCHMARKS_DIR = Path(__file__).parent
+
+
+def find_benchmarks() -> dict[str, Path]:
+    return {path.stem: path for path in sorted(BENCHMARKS_DIR.glob("*.lox"))}
+
+
+def measure(source: str, engine: str, repeat: int) -> tuple[float, str]:
+    lox.engine = engine
+
+    best = float("inf")
+    output = ""
+    for _ in range(repeat):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            start = time.perf_counter()
+            lox.run(source)
+            best = min(best, time.perf_counter() - start)
+        output = out.getvalue()
+
+    return best, output
+
+
+def main():
+    benchmarks = find_benchmarks()
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "names", nargs="*", help="Benchmarks to run. Run all of them if empty"
+    )
+    parser.add_argument("--engine", nargs="+", default=lox.ENGINES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    names = args.names or list(benchmarks)
+    for name in names:
+        if name not in benchmarks:
+            sys.exit(f"Unknown benchmark '{name}'")
+
+    header = f"{'benchmark':<16}" + "".join(f"{engine:>16}" for engine in args.engine)
+    print(header)
+
+    for name in names:
+        source = benchmarks[name].read_text()
+
+        row = f"{name:<16}"
+        reference = None
+        for engine in args.engine:
+            elapsed, output = measure(source, engine, args.repeat)
+            if reference is None:
+                reference = (elapsed, output)
+                row += f"{elapsed:>15.3f}s"
+                continue
+
+            if output != reference[1]:
+                sys.exit(f"{name}: {engine} output differs from {args.engine[0]}")
+            row += f"{elapsed:>8.3f}s {reference[0] / elapsed:>5.1f}x"
+
+        print(row, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# scanner
+
+"""Measure the throughput of the Scanner and the RegexScanner in MB/s.
+
+    $ python -m benchmarks.scanner
+    $ python -m benchmarks.scanner --scale 50
+"""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from scanner import RegexScanner, Scanner, ScannerError
+
+ROOT = Path(__file__).parent.parent
+
+
+def scans(source: str) -> bool:
+    try:
+        Scanner(source).scan_buffer()
+        return True
+    except ScannerError:
+        return False
+
+
+def make_source(scale: int) -> str:
+    files = [*ROOT.glob("benchmarks/*.lox"), *ROOT.glob("tests/cases/**/*.lox")]
+    sources = [path.read_text() for path in sorted(files)]
+
+    logging.disable(logging.ERROR)
+    source = "\n".join(source for source in sources if scans(source))
+    logging.disable(logging.NOTSET)
+
+    return source * scale
+
+
+def measure(scanner: type[Scanner], source: str, repeat: int) -> float:
+    """Return the best throughput scanning the source, in MB/s."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scanner(source).scan_buffer()
+        best = min(best, time.perf_counter() - start)
+    return len(source.encode()) / best / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    source = make_source(args.scale)
+
+    expected = Scanner(source).scan_buffer()
+    actual = RegexScanner(source).scan_buffer()
+    assert (expected.kinds, expected.starts, expected.ends, expected.lines) == (
+        actual.kinds,
+        actual.starts,
+        actual.ends,
+        actual.lines,
+    ), "The scanners disagree"
+
+    print(f"source         {len(source.encode()) / 1e6:8.2f} MB, {len(actual)} tokens")
+    for scanner in (Scanner, RegexScanner):
+        throughput = measure(scanner, source, args.repeat)
+        print(f"{scanner.__name__:14} {throughput:8.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# stream
+
+"""Measure the peak memory of large files, run whole and with --stream.
+
+    $ python -m benchmarks.stream
+    $ python -m benchmarks.stream --sizes 1 10 100
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+DECLARATION = """fun f(a, b) {{
+  var c = a + b * {i};
+  if (c > 100) return c - 1;
+  return c;
+}}
+total = total + f(1, 2);
+"""
+
+
+def generate(path: Path, size: int):
+    """Write about size MB of declarations to path."""
+    with open(path, "w") as file:
+        file.write("var total = 0;\n")
+        written = i = 0
+        while written < size * 1_000_000:
+            written += file.write(DECLARATION.format(i=i))
+            i += 1
+        file.write("print total;\n")
+
+
+def measure(path: Path, stream: bool) -> tuple[float, float, str]:
+    """Return the peak memory in MB, the time taken and the output."""
+    args = [sys.executable, "lox.py", *(["--stream"] if stream else []), str(path)]
+    # Measured from an intermediate process, as the peak usage of children
+    # covers every child run so far
+    code = (
+        "import resource, subprocess, sys; "
+        f"out = subprocess.run({args!r}, capture_output=True, text=True).stdout; "
+        "print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss); "
+        "print(out, end='')"
+    )
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+    peak, _, output = result.stdout.partition("\n")
+    return int(peak) / 1e3, elapsed, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'whole':>16} {'stream':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            path = Path(directory) / f"generated_{size}.lox"
+            generate(path, size)
+
+            whole = measure(path, stream=False)
+            stream = measure(path, stream=True)
+            assert whole[2] == stream[2], "Outputs differ"
+
+            print(
+                f"{size:>4}MB"
+                f" {whole[0]:8.1f}MB {whole[1]:5.1f}s"
+                f" {stream[0]:8.1f}MB {stream[1]:5.1f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# bytecode
+
+# Opcodes. Operands follow the opcode in the code array, one byte each
+# unless noted otherwise.
+(
+    OP_CONSTANT,  # constant index
+    OP_NIL,
+    OP_TRUE,
+    OP_FALSE,
+    OP_POP,
+    OP_GET_LOCAL,  # slot
+    OP_SET_LOCAL,  # slot
+    OP_GET_GLOBAL,  # name constant
+    OP_DEFINE_GLOBAL,  # name constant
+    OP_SET_GLOBAL,  # name constant
+    OP_GET_UPVALUE,  # upvalue index
+    OP_SET_UPVALUE,  # upvalue index
+    OP_GET_PROPERTY,  # name constant
+    OP_SET_PROPERTY,  # name constant
+    OP_GET_SUPER,  # name constant
+    OP_EQUAL,
+    OP_NOT_EQUAL,
+    OP_GREATER,
+    OP_GREATER_EQUAL,
+    OP_LESS,
+    OP_LESS_EQUAL,
+    OP_ADD,
+    OP_SUBTRACT,
+    OP_MULTIPLY,
+    OP_DIVIDE,
+    OP_NOT,
+    OP_NEGATE,
+    OP_PRINT,
+    OP_JUMP,  # 16-bit forward offset
+    OP_JUMP_IF_FALSE,  # 16-bit forward offset
+    OP_LOOP,  # 16-bit backward offset
+    OP_CALL,  # argument count
+    OP_INVOKE,  # name constant, argument count
+    OP_SUPER_INVOKE,  # name constant, argument count
+    OP_CLOSURE,  # function constant, then (is_local, index) per upvalue
+    OP_CLOSE_UPVALUE,
+    OP_RETURN,
+    OP_CLASS,  # name constant
+    OP_INHERIT,
+    OP_METHOD,  # name constant
+) = range(40)
+
+OP_NAMES = {v: k for k, v in list(globals().items()) if k.startswith("OP_")}
+
+# Instructions grouped by the shape of their operands, for the disassembler
+CONSTANT_OPS = {
+    OP_CONSTANT,
+    OP_GET_GLOBAL,
+    OP_DEFINE_GLOBAL,
+    OP_SET_GLOBAL,
+    OP_GET_PROPERTY,
+    OP_SET_PROPERTY,
+    OP_GET_SUPER,
+    OP_CLASS,
+    OP_METHOD,
+}
+BYTE_OPS = {OP_GET_LOCAL, OP_SET_LOCAL, OP_GET_UPVALUE, OP_SET_UPVALUE, OP_CALL}
+JUMP_OPS = {OP_JUMP, OP_JUMP_IF_FALSE, OP_LOOP}
+INVOKE_OPS = {OP_INVOKE, OP_SUPER_INVOKE}
+
+
+class Chunk:
+    """A compiled sequence of instructions, with their lines and constants."""
+
+    def __init__(self):
+        self.code = bytearray()
+        self.lines: list[int] = []
+        self.constants: list[object] = []
+
+    def write(self, byte: int, line: int):
+        self.code.append(byte)
+        self.lines.append(line)
+
+    def add_constant(self, value: object) -> int:
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def disassemble(self, name: str) -> str:
+        lines = [f"== {name} =="]
+        offset = 0
+        while offset < len(self.code):
+            text, offset = self.disassemble_instruction(offset)
+            lines.append(text)
+        return "\n".join(lines)
+
+    def disassemble_instruction(self, offset: int) -> tuple[str, int]:
+        code = self.code
+        op = code[offset]
+        name = OP_NAMES.get(op, f"<unknown {op}>")
+        prefix = f"{offset:04} {self.lines[offset] + 1:4} {name:<16}"
+
+        if op in CONSTANT_OPS:
+            constant = code[offset + 1]
+            return f"{prefix} {constant:4} '{self.constants[constant]}'", offset + 2
+
+        if op in BYTE_OPS:
+            return f"{prefix} {code[offset + 1]:4}", offset + 2
+
+        if op in JUMP_OPS:
+            jump = code[offset + 1] << 8 | code[offset + 2]
+            target = offset + 3 + (-jump if op == OP_LOOP else jump)
+            return f"{prefix} {offset:4} -> {target}", offset + 3
+
+        if op in INVOKE_OPS:
+            constant, argc = code[offset + 1], code[offset + 2]
+            text = f"{prefix} ({argc} args) {constant:4} '{self.constants[constant]}'"
+            return text, offset + 3
+
+        if op == OP_CLOSURE:
+            constant = code[offset + 1]
+            function = self.constants[constant]
+            lines = [f"{prefix} {constant:4} {function}"]
+            offset += 2
+            for _ in range(function.upvalue_count):
+                kind = "local" if code[offset] else "upvalue"
+                lines.append(f"{offset:04}    | {'':16} {kind} {code[offset + 1]}")
+                offset += 2
+            return "\n".join(lines), offset
+
+        return prefix.rstrip(), offset + 1
+
+
+class Function:
+    """A compiled Lox function, or the top-level script when name is None."""
+
+    def __init__(self, name: str | None = None, arity: int = 0):
+        self.name = name
+        self.arity = arity
+        self.upvalue_count = 0
+        self.chunk = Chunk()
+        # The offsets of the top-level statements of a script, and of its
+        # final return: the VM goes on with the next after a runtime error
+        self.statements: list[int] = []
+
+    def __str__(self):
+        return "<script>" if self.name is None else f"<fn {self.name}>"
@@ -0,0 +1,890 @@
+# closurecompiler
+
+import logging
+import math
+from typing import Callable
+
+import expression as Expr
+import statement as Stmt
+from environment import Cell, Frame
+from errors import LoxError, LoxRuntimeError
+from inlinecache import FieldCache, PropertyCache, SuperCache
+from interpreter import Interpreter, InterpreterError
+from loxcallable import LoxCallable
+from loxclass import LoxClass
+from loxfunction import LoxFunction, TailCall
+from loxinstance import LoxInstance
+from loxvalue import is_equal, stringify
+from tokens import Token
+
+# An expression compiles to a function of the current frame returning its
+# value. A statement compiles to a function of the current frame returning
+# None, or a 1-tuple holding the value of a 'return' that must unwind to
+# the enclosing call, or the TailCall of a 'return' of a call.
+Code = Callable[[Frame], object]
+
+
+class CompiledFunction(LoxFunction):
+    """A LoxFunction whose body was compiled by the ClosureCompiler."""
+
+    def __init__(
+        self,
+        declaration: Stmt.Function,
+        upvalues: tuple[Cell, ...],
+        is_initializer: bool,
+        body: Code,
+        receiver: LoxInstance | None = None,
+    ):
+        super().__init__(declaration, upvalues, is_initializer, receiver)
+        self.body = body
+
+    def call(self, interpreter, args):
+        completion = self.body(self.frame(args, self.receiver))
+        if type(completion) is TailCall:
+            completion = completion.complete(interpreter)
+
+        if self.is_initializer:
+            return self.this()
+        return None if completion is None else completion[0]
+
+    def call_method(self, interpreter, this, args):
+        completion = self.body(self.frame(args, this))
+        if type(completion) is TailCall:
+            completion = completion.complete(interpreter)
+
+        if self.is_initializer:
+            return this
+        return None if completion is None else completion[0]
+
+    def execute(self, interpreter, frame):
+        return self.body(frame)
+
+    def bind(self, instance: LoxInstance) -> "CompiledFunction":
+        return CompiledFunction(
+            self.declaration, self.upvalues, self.is_initializer, self.body, instance
+        )
+
+
+class ClosureCompiler:
+    """Compile analyzed Statements into a tree of Python closures."""
+
+    def __init__(self, interpreter: Interpreter, is_repl: bool = False):
+        self.interpreter = interpreter
+        self.is_repl = is_repl
+        self.logger = logging.getLogger("Lox.ClosureCompiler")
+
+    def interpret(self, statements: list[Stmt.Statement]):
+        has_error = False
+        for stmt in statements:
+            try:
+                self.compile_stmt(stmt)(None)
+
+            except LoxError as e:
+                self.logger.error(e)
+                has_error = True
+
+        if has_error:
+            raise LoxError()
+
+    # Compiling Statements
+    def compile_block(self, statements: list[Stmt.Statement]) -> Code:
+        codes = [self.compile_stmt(stmt) for stmt in statements]
+
+        if len(codes) == 1:
+            return codes[0]
+
+        def run_block(frame):
+            for code in codes:
+                completion = code(frame)
+                if completion is not None:
+                    return completion
+
+        return run_block
+
+    def compile_stmt(self, statement: Stmt.Statement) -> Code:
+        match statement:
+            case Stmt.Print(expr):
+                value = self.compile_expr(expr)
+
+                def run_print(frame):
+                    print(stringify(value(frame)))
+
+                return run_print
+
+            case Stmt.Expression(expr):
+                value = self.compile_expr(expr)
+
+                if self.is_repl:
+
+                    def run_repl_expression(frame):
+                        print(stringify(value(frame)))
+
+                    return run_repl_expression
+
+                def run_expression(frame):
+                    value(frame)
+
+                return run_expression
+
+            case Stmt.Var(name, initializer):
+                value = (
+                    self.compile_expr(initializer)
+                    if initializer is not None
+                    else self.compile_expr(Expr.Literal(None))
+                )
+                return self.compile_define(name, statement.slot, value, statement.cell)
+
+            case Stmt.Block(stmts):
+                size = statement.size
+                body = self.compile_block(stmts)
+                if not statement.has_frame:
+                    return body
+
+                script = self.interpreter.script_frame(size)
+
+                def run_block(frame):
+                    return body(script)
+
+                return run_block
+
+            case Stmt.If(cond, conseq, alt):
+                test = self.compile_expr(cond)
+                then = self.compile_stmt(conseq)
+
+                if alt is None:
+
+                    def run_if(frame):
+                        value = test(frame)
+                        if value is not None and value is not False:
+                            return then(frame)
+
+                    return run_if
+
+                otherwise = self.compile_stmt(alt)
+
+                def run_if_else(frame):
+                    value = test(frame)
+                    if value is not None and value is not False:
+                        return then(frame)
+                    return otherwise(frame)
+
+                return run_if_else
+
+            case Stmt.While(cond, body):
+                test = self.compile_expr(cond)
+                loop = self.compile_stmt(body)
+
+                def run_while(frame):
+                    while True:
+                        value = test(frame)
+                        if value is None or value is False:
+                            return None
+                        completion = loop(frame)
+                        if completion is not None:
+                            return completion
+
+                return run_while
+
+            case Stmt.Function():
+                return self.compile_function_declaration(statement)
+
+            case Stmt.Return(_, Expr.Call() as call) if statement.tail:
+                return self.compile_tail_call(call)
+
+            case Stmt.Return(_, value):
+                if value is None:
+                    return lambda frame: (None,)
+
+                result = self.compile_expr(value)
+                return lambda frame: (result(frame),)
+
+            case Stmt.Class(name, superclass_expr, methods):
+                return self.compile_class(statement)
+
+            case _:
+                raise NotImplementedError
+
+    def compile_tail_call(self, expression: Expr.Call) -> Code:
+        paren = expression.paren
+        args = [self.compile_expr(arg) for arg in expression.args]
+        interpreter = self.interpreter
+
+        def complete(function, argv, this=None):
+            check_call(paren, function, len(argv))
+            if not isinstance(function, LoxFunction) or function.is_initializer:
+                if this is None:
+                    return (function.call(interpreter, argv),)
+                return (function.call_method(interpreter, this, argv),)
+            return function.tail_call(argv, this)
+
+        match expression.callee:
+            case Expr.Get(target, name):
+                obj = self.compile_expr(target)
+                cache = PropertyCache(name)
+                get, method_of = cache.get, cache.method_of
+
+                def return_method_call(frame):
+                    instance = obj(frame)
+                    if not isinstance(instance, LoxInstance):
+                        raise LoxRuntimeError(name, "Only instances have properties")
+
+                    method = method_of(instance)
+                    if method is None:
+                        function = get(instance)
+                        return complete(function, [arg(frame) for arg in args])
+                    return complete(method, [arg(frame) for arg in args], instance)
+
+                return return_method_call
+
+            case Expr.Super() as callee:
+                find_super_method = self.compile_find_super_method(callee)
+
+                def return_super_call(frame):
+                    method, instance = find_super_method(frame)
+                    return complete(method, [arg(frame) for arg in args], instance)
+
+                return return_super_call
+
+            case callee:
+                function = self.compile_expr(callee)
+
+                def return_call(frame):
+                    f = function(frame)
+                    return complete(f, [arg(frame) for arg in args])
+
+                return return_call
+
+    def compile_define(
+        self, name: Token, slot: int | None, value: Code, cell: bool = False
+    ) -> Code:
+        if slot is None:
+            values = self.interpreter.globals.values
+            lexeme = name.lexeme
+
+            def define_global(frame):
+                values[lexeme] = value(frame)
+
+            return define_global
+
+        if cell:
+
+            def define_cell(frame):
+                frame.values[slot] = Cell(value(frame))
+
+            return define_cell
+
+        def define_local(frame):
+            frame.values[slot] = value(frame)
+
+        return define_local
+
+    def compile_function_declaration(self, declaration: Stmt.Function) -> Code:
+        body = self.compile_function(declaration)
+        slot = declaration.slot
+        captures = declaration.upvalues
+
+        if slot is None:
+            # Declared outside any function, with nothing to capture
+            values = self.interpreter.globals.values
+            lexeme = declaration.name.lexeme
+
+            def define_global_function(frame):
+                values[lexeme] = CompiledFunction(declaration, (), False, body)
+
+            return define_global_function
+
+        if declaration.cell:
+
+            def define_captured_function(frame):
+                # Made first, as the function may refer to itself
+                cell = frame.values[slot] = Cell()
+                cell.value = CompiledFunction(
+                    declaration, frame.capture(captures), False, body
+                )
+
+            return define_captured_function
+
+        def define_function(frame):
+            frame.values[slot] = CompiledFunction(
+                declaration, frame.capture(captures), False, body
+            )
+
+        return define_function
+
+    def compile_function(self, declaration: Stmt.Function) -> Code:
+        return self.compile_block(declaration.body)
+
+    def compile_class(self, statement: Stmt.Class) -> Code:
+        name = statement.name
+        superclass = (
+            self.compile_expr(statement.superclass) if statement.superclass else None
+        )
+        bodies = [
+            (method, self.compile_function(method)) for method in statement.methods
+        ]
+
+        slot = statement.slot
+        values = self.interpreter.globals.values
+
+        def make_class(frame):
+            base = None
+            if superclass:
+                assert statement.superclass
+                base = superclass(frame)
+                if not isinstance(base, LoxClass):
+                    raise InterpreterError(
+                        statement.superclass.name, "Superclass must be a class"
+                    )
+
+            functions = [
+                CompiledFunction(method, (), method.name.lexeme == "init", body)
+                for method, body in bodies
+            ]
+            methods: dict[str, LoxFunction] = {
+                function.declaration.name.lexeme: function for function in functions
+            }
+
+            klass = LoxClass(name, base, methods)
+            if slot is None:
+                values[name.lexeme] = klass
+            elif statement.cell:
+                frame.values[slot] = Cell(klass)
+            else:
+                frame.values[slot] = klass
+
+            # Once defined, as methods may refer to the class
+            if base:
+                upvalues = frame.capture(statement.upvalues) if frame else ()
+                frame = Frame(1, upvalues)
+                frame.values[0] = Cell(base)
+            if frame:
+                for function in functions:
+                    function.upvalues = frame.capture(function.declaration.upvalues)
+
+        return make_class
+
+    # Compiling Expressions
+    def compile_expr(self, expression: Expr.Expression) -> Code:
+        match expression:
+            case Expr.Literal(value):
+                return lambda frame: value
+
+            case Expr.Grouping(expr):
+                return self.compile_expr(expr)
+
+            case Expr.Unary(operator, right):
+                return self.compile_unary(operator, self.compile_expr(right))
+
+            case Expr.Binary(operator, left, right):
+                return self.compile_binary(operator, left, right)
+
+            case Expr.Logical(operator, left, right):
+                lhs = self.compile_expr(left)
+                rhs = self.compile_expr(right)
+
+                if operator.type == Token.Type.OR:
+
+                    def run_or(frame):
+                        value = lhs(frame)
+                        if value is not None and value is not False:
+                            return value
+                        return rhs(frame)
+
+                    return run_or
+
+                def run_and(frame):
+                    value = lhs(frame)
+                    if value is None or value is False:
+                        return value
+                    return rhs(frame)
+
+                return run_and
+
+            case Expr.Variable(name):
+                return self.compile_get_variable(name, expression)
+
+            case Expr.This(keyword):
+                return self.compile_get_variable(keyword, expression)
+
+            case Expr.Assignment(name, value):
+                return self.compile_set_variable(
+                    name, expression, self.compile_expr(value)
+                )
+
+            case Expr.Call(Expr.Get(target, name), paren, args):
+                return self.compile_method_call(
+                    self.compile_expr(target),
+                    name,
+                    paren,
+                    [self.compile_expr(arg) for arg in args],
+                )
+
+            case Expr.Call(Expr.Super() as callee, paren, args):
+                return self.compile_super_call(
+                    callee, paren, [self.compile_expr(arg) for arg in args]
+                )
+
+            case Expr.Call(callee, paren, args):
+                return self.compile_call(
+                    self.compile_expr(callee),
+                    paren,
+                    [self.compile_expr(arg) for arg in args],
+                )
+
+            case Expr.Get(target, name):
+                obj = self.compile_expr(target)
+                get = PropertyCache(name).get
+
+                def get_property(frame):
+                    instance = obj(frame)
+                    if isinstance(instance, LoxInstance):
+                        return get(instance)
+                    raise LoxRuntimeError(name, "Only instances have properties")
+
+                return get_property
+
+            case Expr.Set(target, name, value):
+                obj = self.compile_expr(target)
+                val = self.compile_expr(value)
+                set_field = FieldCache(name).set
+
+                def set_property(frame):
+                    instance = obj(frame)
+                    if isinstance(instance, LoxInstance):
+                        v = val(frame)
+                        set_field(instance, v)
+                        return v
+                    raise LoxRuntimeError(name, "Only instances have fields")
+
+                return set_property
+
+            case Expr.Super():
+                find_super_method = self.compile_find_super_method(expression)
+
+                def get_super(frame):
+                    resolved, instance = find_super_method(frame)
+                    return resolved.bind(instance)
+
+                return get_super
+
+            case _:
+                raise NotImplementedError
+
+    def compile_get_variable(
+        self, name: Token, expression: Expr.Variable | Expr.This | Expr.Super
+    ) -> Code:
+        slot = expression.slot
+        if expression.depth is None:
+            values = self.interpreter.globals.values
+            lexeme = name.lexeme
+
+            def get_global(frame):
+                try:
+                    return values[lexeme]
+                except KeyError:
+                    raise LoxRuntimeError(
+                        name, f"Undefined variable '{lexeme}'"
+                    ) from None
+
+            return get_global
+
+        if expression.depth:
+            index = expression.upvalue
+            return lambda frame: frame.upvalues[index].value
+
+        if expression.cell:
+            return lambda frame: frame.values[slot].value
+
+        return lambda frame: frame.values[slot]
+
+    def compile_set_variable(
+        self, name: Token, expression: Expr.Assignment, value: Code
+    ) -> Code:
+        slot = expression.slot
+        if expression.depth is None:
+            values = self.interpreter.globals.values
+            lexeme = name.lexeme
+
+            def set_global(frame):
+                v = value(frame)
+                if lexeme not in values:
+                    raise LoxRuntimeError(name, f"Undefined variable '{lexeme}'")
+                values[lexeme] = v
+                return v
+
+            return set_global
+
+        if expression.depth:
+            index = expression.upvalue
+
+            def set_upvalue(frame):
+                v = value(frame)
+                frame.upvalues[index].value = v
+                return v
+
+            return set_upvalue
+
+        if expression.cell:
+
+            def set_cell(frame):
+                v = value(frame)
+                frame.values[slot].value = v
+                return v
+
+            return set_cell
+
+        def set_local(frame):
+            v = value(frame)
+            frame.values[slot] = v
+            return v
+
+        return set_local
+
+    def compile_call(self, callee: Code, paren: Token, args: list[Code]) -> Code:
+        interpreter = self.interpreter
+
+        # Specialise the most common arities to avoid building the
+        # argument list with a comprehension.
+        match args:
+            case []:
+
+                def call0(frame):
+                    function = callee(frame)
+                    check_call(paren, function, 0)
+                    return function.call(interpreter, [])
+
+                return call0
+
+            case [arg0]:
+
+                def call1(frame):
+                    function = callee(frame)
+                    argv = [arg0(frame)]
+                    check_call(paren, function, 1)
+                    return function.call(interpreter, argv)
+
+                return call1
+
+            case [arg0, arg1]:
+
+                def call2(frame):
+                    function = callee(frame)
+                    argv = [arg0(frame), arg1(frame)]
+                    check_call(paren, function, 2)
+                    return function.call(interpreter, argv)
+
+                return call2
+
+            case _:
+
+                def call(frame):
+                    function = callee(frame)
+                    argv = [arg(frame) for arg in args]
+                    check_call(paren, function, len(argv))
+                    return function.call(interpreter, argv)
+
+                return call
+
+    def compile_method_call(
+        self, target: Code, name: Token, paren: Token, args: list[Code]
+    ) -> Code:
+        cache = PropertyCache(name)
+        get, method_of = cache.get, cache.method_of
+        interpreter = self.interpreter
+
+        def call_method(frame):
+            instance = target(frame)
+            if not isinstance(instance, LoxInstance):
+                raise LoxRuntimeError(name, "Only instances have properties")
+
+            method = method_of(instance)
+            if method is None:
+                function = get(instance)
+                argv = [arg(frame) for arg in args]
+                check_call(paren, function, len(argv))
+                return function.call(interpreter, argv)
+
+            argv = [arg(frame) for arg in args]
+            check_call(paren, method, len(argv))
+            return method.call_method(interpreter, instance, argv)
+
+        return call_method
+
+    def compile_super_call(
+        self, callee: Expr.Super, paren: Token, args: list[Code]
+    ) -> Code:
+        find_super_method = self.compile_find_super_method(callee)
+        interpreter = self.interpreter
+
+        def call_super(frame):
+            method, instance = find_super_method(frame)
+            argv = [arg(frame) for arg in args]
+            check_call(paren, method, len(argv))
+            return method.call_method(interpreter, instance, argv)
+
+        return call_super
+
+    def compile_find_super_method(
+        self, expression: Expr.Super
+    ) -> Callable[[Frame], tuple[LoxFunction, LoxInstance]]:
+        method = expression.method
+        assert expression.this
+        get_superclass = self.compile_get_variable(expression.keyword, expression)
+        get_this = self.compile_get_variable(expression.keyword, expression.this)
+        find_method = SuperCache(method).find_method
+
+        def find_super_method(frame):
+            superclass = get_superclass(frame)
+            instance = get_this(frame)
+
+            resolved = find_method(superclass)
+            if not resolved:
+                raise InterpreterError(method, f"Undefined property '{method.lexeme}'")
+            return resolved, instance
+
+        return find_super_method
+
+    def compile_unary(self, operator: Token, right: Code) -> Code:
+        if operator.type == Token.Type.BANG:
+
+            def run_not(frame):
+                value = right(frame)
+                return value is None or value is False
+
+            return run_not
+
+        def negate(frame):
+            value = right(frame)
+            if type(value) is not float:
+                raise LoxRuntimeError(operator, "Operand must be a number")
+            return -value
+
+        return negate
+
+    def compile_binary(
+        self, operator: Token, left: Expr.Expression, right: Expr.Expression
+    ) -> Code:
+        lhs = self.compile_expr(left)
+
+        # An operand that is a number literal is folded into the closure
+        # instead of being called for.
+        if isinstance(right, Expr.Literal) and type(right.value) is float:
+            factory = BINARY_CONSTANT.get(operator.type)
+            if factory:
+                return factory(operator, lhs, right.value)
+
+        return BINARY[operator.type](operator, lhs, self.compile_expr(right))
+
+
+def check_call(paren: Token, function: object, argc: int):
+    if not isinstance(function, LoxCallable):
+        raise InterpreterError(paren, "Can only call functions and classes")
+
+    if argc != function.arity():
+        raise InterpreterError(
+            paren, f"Expected {function.arity()} arguments but got {argc}"
+        )
+
+
+# Binary operators, specialised on the type of the operator. Each factory
+# takes the operator token and the compiled operands and returns the code.
+def number_operands(operator: Token):
+    return LoxRuntimeError(operator, "Operands must be numbers")
+
+
+def add(operator, lhs, rhs):
+    def run_add(frame):
+        left = lhs(frame)
+        right = rhs(frame)
+        if type(left) is float and type(right) is float:
+            return left + right
+        if type(left) is str and type(right) is str:
+            return left + right
+        raise LoxRuntimeError(operator, "Operands must be two numbers or two strings")
+
+    return run_add
+
+
+def subtract(operator, lhs, rhs):
+    def run_subtract(frame):
+        left = lhs(frame)
+        right = rhs(frame)
+        if type(left) is not float or type(right) is not float:
+            raise number_operands(operator)
+        return left - right
+
+    return run_subtract
+
+
+def multiply(operator, lhs, rhs):
+    def run_multiply(frame):
+        left = lhs(frame)
+        right = rhs(frame)
+        if type(left) is not float or type(right) is not float:
+            raise number_operands(operator)
+        return left * right
+
+    return run_multiply
+
+
+def divide(operator, lhs, rhs):
+    def run_divide(frame):
+        left = lhs(frame)
+        right = rhs(frame)
+        if right == 0.0:
+            return math.inf
+        if type(left) is not float or type(right) is not float:
+            raise number_operands(operator)
+        return left / right
+
+    return run_divide
+
+
+def greater(operator, lhs, rhs):
+    def run_greater(frame):
+        left = lhs(frame)
+        right = rhs(frame)
+        if type(left) is not float or type(right) is not float:
+            raise number_operands(operator)
+        return left > right
+
+    return run_greater
+
+
+def greater_equal(operator, lhs, rhs):
+    def run_greater_equal(frame):
+        left = lhs(frame)
+        right = rhs(frame)
+        if type(left) is not float or type(right) is not float:
+            raise number_operands(operator)
+        return left >= right
+
+    return run_greater_equal
+
+
+def less(operator, lhs, rhs):
+    def run_less(frame):
+        left = lhs(frame)
+        right = rhs(frame)
+        if type(left) is not float or type(right) is not float:
+            raise number_operands(operator)
+        return left < right
+
+    return run_less
+
+
+def less_equal(operator, lhs, rhs):
+    def run_less_equal(frame):
+        left = lhs(frame)
+        right = rhs(frame)
+        if type(left) is not float or type(right) is not float:
+            raise number_operands(operator)
+        return left <= right
+
+    return run_less_equal
+
+
+def equal(operator, lhs, rhs):
+    return lambda frame: is_equal(lhs(frame), rhs(frame))
+
+
+def not_equal(operator, lhs, rhs):
+    return lambda frame: not is_equal(lhs(frame), rhs(frame))
+
+
+BINARY = {
+    Token.Type.PLUS: add,
+    Token.Type.MINUS: subtract,
+    Token.Type.STAR: multiply,
+    Token.Type.SLASH: divide,
+    Token.Type.GREATER: greater,
+    Token.Type.GREATER_EQUAL: greater_equal,
+    Token.Type.LESS: less,
+    Token.Type.LESS_EQUAL: less_equal,
+    Token.Type.EQUAL_EQUAL: equal,
+    Token.Type.BANG_EQUAL: not_equal,
+}
+
+
+# The same operators with a number literal on the right
+def add_constant(operator, lhs, right):
+    def run_add_constant(frame):
+        left = lhs(frame)
+        if type(left) is not float:
+            raise LoxRuntimeError(
+                operator, "Operands must be two numbers or two strings"
+            )
+        return left + right
+
+    return run_add_constant
+
+
+def subtract_constant(operator, lhs, right):
+    def run_subtract_constant(frame):
+        left = lhs(frame)
+        if type(left) is not float:
+            raise number_operands(operator)
+        return left - right
+
+    return run_subtract_constant
+
+
+def multiply_constant(operator, lhs, right):
+    def run_multiply_constant(frame):
+        left = lhs(frame)
+        if type(left) is not float:
+            raise number_operands(operator)
+        return left * right
+
+    return run_multiply_constant
+
+
+def less_constant(operator, lhs, right):
+    def run_less_constant(frame):
+        left = lhs(frame)
+        if type(left) is not float:
+            raise number_operands(operator)
+        return left < right
+
+    return run_less_constant
+
+
+def less_equal_constant(operator, lhs, right):
+    def run_less_equal_constant(frame):
+        left = lhs(frame)
+        if type(left) is not float:
+            raise number_operands(operator)
+        return left <= right
+
+    return run_less_equal_constant
+
+
+def greater_constant(operator, lhs, right):
+    def run_greater_constant(frame):
+        left = lhs(frame)
+        if type(left) is not float:
+            raise number_operands(operator)
+        return left > right
+
+    return run_greater_constant
+
+
+def greater_equal_constant(operator, lhs, right):
+    def run_greater_equal_constant(frame):
+        left = lhs(frame)
+        if type(left) is not float:
+            raise number_operands(operator)
+        return left >= right
+
+    return run_greater_equal_constant
+
+
+BINARY_CONSTANT = {
+    Token.Type.PLUS: add_constant,
+    Token.Type.MINUS: subtract_constant,
+    Token.Type.STAR: multiply_constant,
+    Token.Type.GREATER: greater_constant,
+    Token.Type.GREATER_EQUAL: greater_equal_constant,
+    Token.Type.LESS: less_constant,
+    Token.Type.LESS_EQUAL: less_equal_constant,
+}
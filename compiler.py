@@ -0,0 +1,525 @@
+# compiler
+
+import logging
+from dataclasses import dataclass, field
+
+import expression as Expr
+import statement as Stmt
+from analyzer import FunctionType
+from bytecode import (
+    OP_ADD,
+    OP_CALL,
+    OP_CLASS,
+    OP_CLOSE_UPVALUE,
+    OP_CLOSURE,
+    OP_CONSTANT,
+    OP_DEFINE_GLOBAL,
+    OP_DIVIDE,
+    OP_EQUAL,
+    OP_FALSE,
+    OP_GET_GLOBAL,
+    OP_GET_LOCAL,
+    OP_GET_PROPERTY,
+    OP_GET_SUPER,
+    OP_GET_UPVALUE,
+    OP_GREATER,
+    OP_GREATER_EQUAL,
+    OP_INHERIT,
+    OP_INVOKE,
+    OP_JUMP,
+    OP_JUMP_IF_FALSE,
+    OP_LESS,
+    OP_LESS_EQUAL,
+    OP_LOOP,
+    OP_METHOD,
+    OP_MULTIPLY,
+    OP_NEGATE,
+    OP_NIL,
+    OP_NOT,
+    OP_NOT_EQUAL,
+    OP_POP,
+    OP_PRINT,
+    OP_RETURN,
+    OP_SET_GLOBAL,
+    OP_SET_LOCAL,
+    OP_SET_PROPERTY,
+    OP_SET_UPVALUE,
+    OP_SUBTRACT,
+    OP_SUPER_INVOKE,
+    OP_TRUE,
+    Function,
+)
+from errors import LoxError
+from tokens import Token
+
+# Every operand indexing a table is a single byte
+UINT8_COUNT = 256
+# Jump offsets are 16 bits
+MAX_JUMP = 0xFFFF
+
+BINARY_OPS = {
+    Token.Type.PLUS: OP_ADD,
+    Token.Type.MINUS: OP_SUBTRACT,
+    Token.Type.STAR: OP_MULTIPLY,
+    Token.Type.SLASH: OP_DIVIDE,
+    Token.Type.EQUAL_EQUAL: OP_EQUAL,
+    Token.Type.BANG_EQUAL: OP_NOT_EQUAL,
+    Token.Type.GREATER: OP_GREATER,
+    Token.Type.GREATER_EQUAL: OP_GREATER_EQUAL,
+    Token.Type.LESS: OP_LESS,
+    Token.Type.LESS_EQUAL: OP_LESS_EQUAL,
+}
+
+
+class CompilerError(LoxError):
+    def __init__(self, token: Token, message: str):
+        super().__init__(message)
+        self.token = token
+        self.message = message
+
+    def __str__(self):
+        return (
+            f"{self.token.line + 1} | Error at '{self.token.lexeme}': {self.message}."
+        )
+
+
+@dataclass
+class Local:
+    name: str
+    depth: int  # -1 until the variable is initialized
+    is_captured: bool = False
+
+
+@dataclass
+class Upvalue:
+    index: int
+    is_local: bool
+
+
+@dataclass
+class FunctionState:
+    """Compilation state of the function whose code is being emitted."""
+
+    function: Function
+    type: FunctionType
+    enclosing: "FunctionState | None"
+    locals: list[Local] = field(default_factory=list)
+    upvalues: list[Upvalue] = field(default_factory=list)
+    scope_depth: int = 0
+
+
+class Compiler:
+    """Compile analyzed Statements into bytecode for the VM."""
+
+    def __init__(self, is_repl: bool = False):
+        self.is_repl = is_repl
+        self.state: FunctionState
+        self.token: Token | None = None  # Last token seen, for lines and errors
+        self.logger = logging.getLogger("Lox.Compiler")
+
+    def compile(self, statements: list[Stmt.Statement]) -> Function:
+        script = FunctionState(Function(), FunctionType.NONE, None)
+        # Slot 0 holds the function being called
+        script.locals.append(Local("", 0))
+
+        has_error = False
+        for stmt in statements:
+            self.state = script
+            script.function.statements.append(len(self.chunk.code))
+            try:
+                self.compile_stmt(stmt)
+
+            except LoxError as e:
+                self.logger.error(e)
+                has_error = True
+
+        if has_error:
+            raise LoxError()
+
+        self.state = script
+        script.function.statements.append(len(self.chunk.code))
+        self.emit_return()
+        return script.function
+
+    # Emitting bytecode
+    @property
+    def chunk(self):
+        return self.state.function.chunk
+
+    def line(self) -> int:
+        return self.token.line if self.token else 0
+
+    def error(self, message: str, token: Token | None = None) -> CompilerError:
+        token = token or self.token
+        assert token
+        return CompilerError(token, message)
+
+    def emit(self, *bytes: int):
+        line = self.line()
+        for byte in bytes:
+            self.chunk.write(byte, line)
+
+    def make_constant(self, value: object) -> int:
+        constant = self.chunk.add_constant(value)
+        if constant >= UINT8_COUNT:
+            raise self.error("Too many constants in one chunk")
+        return constant
+
+    def emit_constant(self, op: int, value: object):
+        self.emit(op, self.make_constant(value))
+
+    def emit_jump(self, op: int) -> int:
+        self.emit(op, 0xFF, 0xFF)
+        return len(self.chunk.code) - 2
+
+    def patch_jump(self, offset: int):
+        # -2 to adjust for the jump offset itself
+        jump = len(self.chunk.code) - offset - 2
+        if jump > MAX_JUMP:
+            raise self.error("Too much code to jump over")
+
+        self.chunk.code[offset] = (jump >> 8) & 0xFF
+        self.chunk.code[offset + 1] = jump & 0xFF
+
+    def emit_loop(self, start: int):
+        self.emit(OP_LOOP)
+        offset = len(self.chunk.code) - start + 2
+        if offset > MAX_JUMP:
+            raise self.error("Loop body too large")
+
+        self.emit((offset >> 8) & 0xFF, offset & 0xFF)
+
+    def emit_return(self):
+        if self.state.type == FunctionType.INITIALIZER:
+            self.emit(OP_GET_LOCAL, 0)
+        else:
+            self.emit(OP_NIL)
+        self.emit(OP_RETURN)
+
+    # Scopes and variables
+    def begin_scope(self):
+        self.state.scope_depth += 1
+
+    def end_scope(self):
+        state = self.state
+        state.scope_depth -= 1
+
+        while state.locals and state.locals[-1].depth > state.scope_depth:
+            if state.locals[-1].is_captured:
+                self.emit(OP_CLOSE_UPVALUE)
+            else:
+                self.emit(OP_POP)
+            state.locals.pop()
+
+    def add_local(self, name: Token):
+        if len(self.state.locals) == UINT8_COUNT:
+            raise self.error("Too many local variables in function", name)
+
+        self.state.locals.append(Local(name.lexeme, -1))
+
+    def declare(self, name: Token) -> int | None:
+        """Return the constant holding the name of a global, None for a local."""
+        self.token = name
+        if self.state.scope_depth == 0:
+            return self.make_constant(name.lexeme)
+
+        self.add_local(name)
+        return None
+
+    def define(self, global_name: int | None):
+        if global_name is not None:
+            self.emit(OP_DEFINE_GLOBAL, global_name)
+        else:
+            self.state.locals[-1].depth = self.state.scope_depth
+
+    def resolve_local(self, state: FunctionState, name: str) -> int:
+        for i in range(len(state.locals) - 1, -1, -1):
+            if state.locals[i].name == name:
+                return i
+        return -1
+
+    def add_upvalue(self, state: FunctionState, index: int, is_local: bool) -> int:
+        for i, upvalue in enumerate(state.upvalues):
+            if upvalue.index == index and upvalue.is_local == is_local:
+                return i
+
+        if len(state.upvalues) == UINT8_COUNT:
+            raise self.error("Too many closure variables in function")
+
+        state.upvalues.append(Upvalue(index, is_local))
+        state.function.upvalue_count = len(state.upvalues)
+        return len(state.upvalues) - 1
+
+    def resolve_upvalue(self, state: FunctionState, name: str) -> int:
+        if state.enclosing is None:
+            return -1
+
+        local = self.resolve_local(state.enclosing, name)
+        if local != -1:
+            state.enclosing.locals[local].is_captured = True
+            return self.add_upvalue(state, local, True)
+
+        upvalue = self.resolve_upvalue(state.enclosing, name)
+        if upvalue != -1:
+            return self.add_upvalue(state, upvalue, False)
+
+        return -1
+
+    def named_variable(self, name: Token, value: Expr.Expression | None = None):
+        self.token = name
+
+        if (arg := self.resolve_local(self.state, name.lexeme)) != -1:
+            get_op, set_op = OP_GET_LOCAL, OP_SET_LOCAL
+        elif (arg := self.resolve_upvalue(self.state, name.lexeme)) != -1:
+            get_op, set_op = OP_GET_UPVALUE, OP_SET_UPVALUE
+        else:
+            arg = self.make_constant(name.lexeme)
+            get_op, set_op = OP_GET_GLOBAL, OP_SET_GLOBAL
+
+        if value is None:
+            self.emit(get_op, arg)
+        else:
+            self.compile_expr(value)
+            self.token = name
+            self.emit(set_op, arg)
+
+    # Compiling Statements
+    def compile_stmt(self, statement: Stmt.Statement):
+        match statement:
+            case Stmt.Print(expr):
+                self.compile_expr(expr)
+                self.emit(OP_PRINT)
+
+            case Stmt.Expression(expr):
+                self.compile_expr(expr)
+                self.emit(OP_PRINT if self.is_repl else OP_POP)
+
+            case Stmt.Var(name, initializer):
+                global_name = self.declare(name)
+                if initializer is None:
+                    self.emit(OP_NIL)
+                else:
+                    self.compile_expr(initializer)
+                self.define(global_name)
+
+            case Stmt.Block(stmts):
+                self.begin_scope()
+                for stmt in stmts:
+                    self.compile_stmt(stmt)
+                self.end_scope()
+
+            case Stmt.If(cond, conseq, alt):
+                self.compile_expr(cond)
+                then_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+                self.emit(OP_POP)
+                self.compile_stmt(conseq)
+
+                else_jump = self.emit_jump(OP_JUMP)
+                self.patch_jump(then_jump)
+                self.emit(OP_POP)
+
+                if alt is not None:
+                    self.compile_stmt(alt)
+                self.patch_jump(else_jump)
+
+            case Stmt.While(cond, body):
+                loop_start = len(self.chunk.code)
+                self.compile_expr(cond)
+
+                exit_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+                self.emit(OP_POP)
+                self.compile_stmt(body)
+
+                self.token = statement.end or self.token
+                self.emit_loop(loop_start)
+                self.patch_jump(exit_jump)
+                self.emit(OP_POP)
+
+            case Stmt.Function(name, _, _):
+                global_name = self.declare(name)
+                if global_name is None:
+                    # Mark it initialized so the body can refer to it
+                    self.define(None)
+                self.function(statement, FunctionType.FUNCTION)
+                if global_name is not None:
+                    self.define(global_name)
+
+            case Stmt.Return(keyword, value):
+                self.token = keyword
+                if value is None:
+                    self.emit_return()
+                else:
+                    self.compile_expr(value)
+                    self.token = keyword
+                    self.emit(OP_RETURN)
+
+            case Stmt.Class(name, superclass, methods):
+                global_name = self.declare(name)
+                name_constant = (
+                    global_name
+                    if global_name is not None
+                    else self.make_constant(name.lexeme)
+                )
+                self.emit(OP_CLASS, name_constant)
+                self.define(global_name)
+
+                if superclass:
+                    self.named_variable(superclass.name)
+
+                    self.begin_scope()
+                    self.add_local(Token.SUPER(superclass.name.line))
+                    self.define(None)
+
+                    self.named_variable(name)
+                    self.emit(OP_INHERIT)
+
+                self.named_variable(name)
+                for method in methods:
+                    fntype = (
+                        FunctionType.INITIALIZER
+                        if method.name.lexeme == "init"
+                        else FunctionType.METHOD
+                    )
+                    self.function(method, fntype)
+                    self.token = method.name
+                    self.emit_constant(OP_METHOD, method.name.lexeme)
+                self.emit(OP_POP)
+
+                if superclass:
+                    self.end_scope()
+
+            case _:
+                raise NotImplementedError
+
+    def function(self, declaration: Stmt.Function, fntype: FunctionType):
+        state = FunctionState(
+            Function(declaration.name.lexeme, len(declaration.params)),
+            fntype,
+            self.state,
+        )
+        # Slot 0 holds the function itself, or the receiver of a method
+        receiver = "" if fntype == FunctionType.FUNCTION else "this"
+        state.locals.append(Local(receiver, 0))
+        self.state = state
+
+        self.begin_scope()
+        for param in declaration.params:
+            self.define(self.declare(param))
+
+        for stmt in declaration.body:
+            self.compile_stmt(stmt)
+
+        self.emit_return()
+
+        assert state.enclosing
+        self.state = state.enclosing
+
+        self.emit_constant(OP_CLOSURE, state.function)
+        for upvalue in state.upvalues:
+            self.emit(1 if upvalue.is_local else 0, upvalue.index)
+
+    # Compiling Expressions
+    def compile_expr(self, expression: Expr.Expression):
+        match expression:
+            case Expr.Literal(value):
+                self.token = expression.token or self.token
+                if value is None:
+                    self.emit(OP_NIL)
+                elif value is True:
+                    self.emit(OP_TRUE)
+                elif value is False:
+                    self.emit(OP_FALSE)
+                else:
+                    self.emit_constant(OP_CONSTANT, value)
+
+            case Expr.Grouping(expr):
+                self.compile_expr(expr)
+
+            case Expr.Unary(operator, right):
+                self.compile_expr(right)
+                self.token = operator
+                if operator.type == Token.Type.MINUS:
+                    self.emit(OP_NEGATE)
+                else:
+                    self.emit(OP_NOT)
+
+            case Expr.Binary(operator, left, right):
+                self.compile_expr(left)
+                self.compile_expr(right)
+                self.token = operator
+                self.emit(BINARY_OPS[operator.type])
+
+            case Expr.Logical(operator, left, right):
+                self.compile_expr(left)
+                self.token = operator
+                if operator.type == Token.Type.AND:
+                    end_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+                else:
+                    else_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+                    end_jump = self.emit_jump(OP_JUMP)
+                    self.patch_jump(else_jump)
+
+                self.emit(OP_POP)
+                self.compile_expr(right)
+                self.patch_jump(end_jump)
+
+            case Expr.Variable(name):
+                self.named_variable(name)
+
+            case Expr.Assignment(name, value):
+                self.named_variable(name, value)
+
+            case Expr.Call(Expr.Get(target, name), paren, args):
+                # Invoke the method directly instead of creating a bound method
+                self.compile_expr(target)
+                self.token = name
+                name_constant = self.make_constant(name.lexeme)
+                self.compile_args(args)
+                self.token = paren
+                self.emit(OP_INVOKE, name_constant, len(args))
+
+            case Expr.Call(Expr.Super(keyword, method), paren, args):
+                self.named_variable(Token.THIS(keyword.line))
+                self.token = method
+                name_constant = self.make_constant(method.lexeme)
+                self.compile_args(args)
+                self.named_variable(keyword)
+                self.token = paren
+                self.emit(OP_SUPER_INVOKE, name_constant, len(args))
+
+            case Expr.Call(callee, paren, args):
+                self.compile_expr(callee)
+                self.compile_args(args)
+                self.token = paren
+                self.emit(OP_CALL, len(args))
+
+            case Expr.Get(target, name):
+                self.compile_expr(target)
+                self.token = name
+                self.emit_constant(OP_GET_PROPERTY, name.lexeme)
+
+            case Expr.Set(target, name, value):
+                self.compile_expr(target)
+                self.token = name
+                name_constant = self.make_constant(name.lexeme)
+                self.compile_expr(value)
+                self.token = name
+                self.emit(OP_SET_PROPERTY, name_constant)
+
+            case Expr.This(keyword):
+                self.named_variable(keyword)
+
+            case Expr.Super(keyword, method):
+                self.named_variable(Token.THIS(keyword.line))
+                self.token = method
+                name_constant = self.make_constant(method.lexeme)
+                self.named_variable(keyword)
+                self.token = method
+                self.emit(OP_GET_SUPER, name_constant)
+
+            case _:
+                raise NotImplementedError
+
+    def compile_args(self, args: list[Expr.Expression]):
+        for arg in args:
+            self.compile_expr(arg)
@@ -0,0 +1,217 @@
+# constantfolder
+
+import expression as Expr
+import statement as Stmt
+from errors import LoxRuntimeError
+from interpreter import Interpreter
+from loxvalue import is_truthy
+from tokens import Token
+
+
+class ConstantFolder:
+    """Replace the expressions that only depend on literals, and reads of
+    constant variables, by the literal they evaluate to."""
+
+    def __init__(self, is_repl: bool = False):
+        self.is_repl = is_repl
+        self.interpreter = Interpreter()
+        # Frames of the locals in scope, as the Analyzer numbered them: the
+        # declaration in each slot, if it is a var
+        self.scopes: list[dict[int, Stmt.Var | None]] = []
+        # Ids of the vars that are ever assigned
+        self.assigned: set[int] = set()
+        self.assigned_globals: set[str] = set()
+        # Constant globals: the index of the statement declaring them
+        self.globals: dict[str, tuple[int, Stmt.Var]] = {}
+        # Index of the top-level statement being folded
+        self.index = 0
+        self.propagate = False
+
+    def fold(self, statements: list[Stmt.Statement]) -> list[Stmt.Statement]:
+        # Assignments may come after a read, in a loop or a function, so
+        # they are all found by a first walk before any read is replaced.
+        self.propagate = False
+        self.fold_block(statements)
+
+        if not self.is_repl:
+            self.find_constant_globals(statements)
+        self.propagate = True
+        for self.index, stmt in enumerate(statements):
+            self.fold_stmt(stmt)
+
+        return statements
+
+    def find_constant_globals(self, statements: list[Stmt.Statement]):
+        declarations: dict[str, list[tuple[int, Stmt.Statement]]] = {}
+        for index, stmt in enumerate(statements):
+            if isinstance(stmt, (Stmt.Var, Stmt.Function, Stmt.Class)):
+                declarations.setdefault(stmt.name.lexeme, []).append((index, stmt))
+
+        for name, declared in declarations.items():
+            if len(declared) != 1 or name in self.assigned_globals:
+                continue
+            index, stmt = declared[0]
+            if isinstance(stmt, Stmt.Var) and isinstance(
+                stmt.initializer, Expr.Literal
+            ):
+                self.globals[name] = (index, stmt)
+
+    def fold_block(self, statements: list[Stmt.Statement]):
+        for stmt in statements:
+            self.fold_stmt(stmt)
+
+    def fold_stmt(self, stmt: Stmt.Statement):
+        match stmt:
+            case Stmt.Expression(expr):
+                stmt.expression = self.fold_expr(expr)
+
+            case Stmt.Print(expr):
+                stmt.expression = self.fold_expr(expr)
+
+            case Stmt.Var(_, initializer):
+                if initializer is not None:
+                    stmt.initializer = self.fold_expr(initializer)
+                self.declare(stmt)
+
+            case Stmt.Block(statements) if not stmt.has_frame:
+                self.fold_block(statements)
+
+            case Stmt.Block(statements):
+                self.scopes.append({})
+                self.fold_block(statements)
+                self.scopes.pop()
+
+            case Stmt.If(condition, consequence, alternative):
+                stmt.condition = self.fold_expr(condition)
+                self.fold_stmt(consequence)
+                if alternative is not None:
+                    self.fold_stmt(alternative)
+
+            case Stmt.While(condition, body):
+                stmt.condition = self.fold_expr(condition)
+                self.fold_stmt(body)
+
+            case Stmt.Function():
+                self.declare(stmt)
+                self.fold_function(stmt)
+
+            case Stmt.Return(_, value):
+                if value is not None:
+                    stmt.value = self.fold_expr(value)
+
+            case Stmt.Class(_, superclass, methods):
+                self.declare(stmt)
+                # The frame of "super"
+                if superclass:
+                    self.scopes.append({})
+                for method in methods:
+                    self.fold_function(method)
+                if superclass:
+                    self.scopes.pop()
+
+            case _:
+                raise NotImplementedError
+
+    def fold_function(self, function: Stmt.Function):
+        self.scopes.append({})
+        self.fold_block(function.body)
+        self.scopes.pop()
+
+    def declare(self, declaration: Stmt.Var | Stmt.Function | Stmt.Class):
+        # Only variables can be constant, functions and classes are not folded
+        if self.scopes and declaration.slot is not None:
+            self.scopes[-1][declaration.slot] = (
+                declaration if isinstance(declaration, Stmt.Var) else None
+            )
+
+    def declaration(self, depth: int | None, slot: int | None) -> Stmt.Var | None:
+        if depth is None or slot is None:
+            return None
+        return self.scopes[-1 - depth].get(slot)
+
+    def fold_expr(self, expr: Expr.Expression) -> Expr.Expression:
+        match expr:
+            case Expr.Literal():
+                return expr
+
+            case Expr.Grouping(inner):
+                expr.expression = self.fold_expr(inner)
+                if isinstance(expr.expression, Expr.Literal):
+                    return expr.expression
+                return expr
+
+            case Expr.Unary(operator, right):
+                expr.right = self.fold_expr(right)
+                if isinstance(expr.right, Expr.Literal):
+                    return self.evaluate(expr, operator)
+                return expr
+
+            case Expr.Binary(operator, left, right):
+                expr.left = self.fold_expr(left)
+                expr.right = self.fold_expr(right)
+                if isinstance(expr.left, Expr.Literal) and isinstance(
+                    expr.right, Expr.Literal
+                ):
+                    return self.evaluate(expr, operator)
+                return expr
+
+            case Expr.Logical(operator, left, right):
+                expr.left = self.fold_expr(left)
+                expr.right = self.fold_expr(right)
+                if isinstance(expr.left, Expr.Literal):
+                    truthy = is_truthy(expr.left.value)
+                    if truthy == (operator.type == Token.Type.OR):
+                        return expr.left
+                    return expr.right
+                return expr
+
+            case Expr.Variable(name):
+                var = self.declaration(expr.depth, expr.slot)
+                if expr.depth is None and name.lexeme in self.globals:
+                    index, var = self.globals[name.lexeme]
+                    if index >= self.index:
+                        var = None
+
+                if (
+                    self.propagate
+                    and var is not None
+                    and id(var) not in self.assigned
+                    and isinstance(var.initializer, Expr.Literal)
+                ):
+                    return Expr.Literal(var.initializer.value, name)
+                return expr
+
+            case Expr.Assignment(name, value):
+                expr.value = self.fold_expr(value)
+                if expr.depth is None:
+                    self.assigned_globals.add(name.lexeme)
+                var = self.declaration(expr.depth, expr.slot)
+                if var is not None:
+                    self.assigned.add(id(var))
+                return expr
+
+            case Expr.Call(callee, _, args):
+                expr.callee = self.fold_expr(callee)
+                expr.args = [self.fold_expr(arg) for arg in args]
+                return expr
+
+            case Expr.Get(target):
+                expr.target = self.fold_expr(target)
+                return expr
+
+            case Expr.Set(target, _, value):
+                expr.target = self.fold_expr(target)
+                expr.value = self.fold_expr(value)
+                return expr
+
+            case Expr.This() | Expr.Super():
+                return expr
+
+            case _:
+                raise NotImplementedError
+
+    def evaluate(self, expr: Expr.Expression, operator: Token) -> Expr.Expression:
+        try:
+            return Expr.Literal(self.interpreter.evaluate(expr), operator)
+        except LoxRuntimeError:
+            return expr
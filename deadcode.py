@@ -0,0 +1,128 @@
+# deadcode
+
+import expression as Expr
+import statement as Stmt
+from loxvalue import is_truthy
+from tokens import Token
+
+DECLARATIONS = (Stmt.Var, Stmt.Function, Stmt.Class)
+
+
+def is_pure(expression: Expr.Expression) -> bool:
+    """Whether not evaluating the expression changes nothing."""
+    match expression:
+        case Expr.Literal() | Expr.This():
+            return True
+
+        case Expr.Variable():
+            # Reading an undefined global fails
+            return expression.depth is not None
+
+        case Expr.Grouping(expr):
+            return is_pure(expr)
+
+        case Expr.Unary(operator, right):
+            return operator.type == Token.Type.BANG and is_pure(right)
+
+        case Expr.Binary(operator, left, right):
+            return (
+                operator.type in (Token.Type.EQUAL_EQUAL, Token.Type.BANG_EQUAL)
+                and is_pure(left)
+                and is_pure(right)
+            )
+
+        case Expr.Logical(_, left, right):
+            return is_pure(left) and is_pure(right)
+
+        case _:
+            return False
+
+
+class DeadCodeEliminator:
+    """Remove the statements that can't run or can't have an effect. A
+    declaration only goes with the rest of its scope, so slots stay valid."""
+
+    def __init__(self, is_repl: bool = False):
+        self.is_repl = is_repl
+
+    def eliminate(self, statements: list[Stmt.Statement]) -> list[Stmt.Statement]:
+        statements[:] = self.eliminate_block(statements)
+        return statements
+
+    def eliminate_block(
+        self, statements: list[Stmt.Statement]
+    ) -> list[Stmt.Statement]:
+        live = []
+        for stmt in statements:
+            stmt = self.eliminate_stmt(stmt)
+            if stmt is None:
+                continue
+            live.append(stmt)
+            if returns(stmt):
+                # The rest can't run
+                break
+        return live
+
+    def eliminate_stmt(self, stmt: Stmt.Statement) -> Stmt.Statement | None:
+        """Return the statement to run instead, None if nothing is left."""
+        match stmt:
+            case Stmt.Expression(expr):
+                if is_pure(expr) and not self.is_repl:
+                    return None
+                return stmt
+
+            case Stmt.Block(statements):
+                stmt.statements = self.eliminate_block(statements)
+                return stmt
+
+            case Stmt.If(Expr.Literal(value), consequence, alternative):
+                arm = consequence if is_truthy(value) else alternative
+                return self.eliminate_stmt(arm) if arm is not None else None
+
+            case Stmt.If(_, consequence, alternative):
+                stmt.consequence = self.eliminate_stmt(consequence) or Stmt.Block([])
+                if alternative is not None:
+                    stmt.alternative = self.eliminate_stmt(alternative)
+                return stmt
+
+            case Stmt.While(Expr.Literal(value), body) if not is_truthy(value):
+                # A body declaring in the enclosing scope keeps its slot
+                return stmt if isinstance(body, DECLARATIONS) else None
+
+            case Stmt.While(_, body):
+                stmt.body = self.eliminate_stmt(body) or Stmt.Block([])
+                return stmt
+
+            case Stmt.Function():
+                self.eliminate_function(stmt)
+                return stmt
+
+            case Stmt.Class(_, _, methods):
+                for method in methods:
+                    self.eliminate_function(method)
+                return stmt
+
+            case Stmt.Print() | Stmt.Var() | Stmt.Return():
+                return stmt
+
+            case _:
+                raise NotImplementedError
+
+    def eliminate_function(self, function: Stmt.Function):
+        function.body = self.eliminate_block(function.body)
+
+
+def returns(stmt: Stmt.Statement) -> bool:
+    match stmt:
+        case Stmt.Return():
+            return True
+        case Stmt.Block(statements):
+            return any(returns(s) for s in statements)
+        case Stmt.If(_, consequence, alternative):
+            return (
+                alternative is not None
+                and returns(consequence)
+                and returns(alternative)
+            )
+        case _:
+            return False
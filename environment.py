@@ -7,75 +7,71 @@ from tokens import Token
 
 
 class Environment:
-    def __init__(self, other: "Environment|None" = None):
+    """The global scope, looked up by name."""
+
+    def __init__(self):
         self.values: dict[str, object] = {}
-        self.sibling = other
-        self.enclosing = other.enclosing if other else None
 
         self.logger = logging.getLogger("Lox.Environment")
 
     def __contains__(self, item: str):
-        if item in self.values:
-            return True
-
-        if self.sibling is not None:
-            return item in self.sibling
-
-        if self.enclosing is not None:
-            return item in self.enclosing
-
-        return False
+        return item in self.values
 
     def __str__(self):
-        s = str(self.values)
-        if self.sibling:
-            s += f"\n -> {self.sibling}"
+        return str(self.values)
 
-        elif self.enclosing:
-            s += f"\n ->> {self.sibling}"
+    def define(self, name: Token, value: object = None):
+        self.values[name.lexeme] = value
 
-        return s
+    def assign(self, name: Token, value: object):
+        if name.lexeme not in self.values:
+            raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'")
 
-    def define(self, name: Token, value: object = None):
         self.values[name.lexeme] = value
 
-    def define_multiple(self, names: list[Token], values: list[object]):
-        for name, value in zip(names, values):
-            self.values[name.lexeme] = value
+    def get(self, name: Token) -> object:
+        try:
+            return self.values[name.lexeme]
+        except KeyError:
+            raise LoxRuntimeError(
+                name, f"Undefined variable '{name.lexeme}'"
+            ) from None
 
-    def assign(self, name: Token, value: object):
-        if name.lexeme in self.values:
-            self.values[name.lexeme] = value
 
-        elif self.sibling:
-            self.sibling.assign(name, value)
+class Cell:
+    """A captured local, shared by its frame and the functions referring to it."""
 
-        elif self.enclosing:
-            self.enclosing.assign(name, value)
+    __slots__ = ("value",)
 
-        else:
-            raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'")
+    def __init__(self, value: object = None):
+        self.value = value
 
-    def get(self, name: Token) -> object:
-        if name.lexeme in self.values:
-            return self.values[name.lexeme]
+    def __repr__(self):
+        return f"Cell({self.value!r})"
 
-        if self.sibling is not None:
-            return self.sibling.get(name)
 
-        if self.enclosing is not None:
-            return self.enclosing.get(name)
+# The capture of a variable by a function: whether it is a local of the
+# frame the function is declared in, and its slot there, or else the
+# index of the cell among the upvalues of that frame
+Capture = tuple[bool, int]
 
-        raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'")
 
-    def push(self) -> "Environment":
-        env = Environment()
-        env.enclosing = self
-        return env
+class Frame:
+    """The locals of a call, or of a block at the top level, by slot."""
 
-    def split(self) -> "Environment":
-        return Environment(self)
+    __slots__ = ("values", "upvalues")
 
-    def pop(self) -> "Environment":
-        assert self.enclosing
-        return self.enclosing
+    def __init__(self, size: int = 0, upvalues: tuple[Cell, ...] = ()):
+        self.values: list[object] = [None] * size
+        self.upvalues = upvalues
+
+    def __str__(self):
+        return f"{self.values} {list(self.upvalues)}"
+
+    def capture(self, captures: list[Capture]) -> tuple[Cell, ...]:
+        """The upvalues of a function declared in the frame."""
+        values, upvalues = self.values, self.upvalues
+        return tuple(
+            values[index] if is_local else upvalues[index]
+            for is_local, index in captures
+        )
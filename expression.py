@@ -1,82 +1,130 @@
 # expression
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
 
 from tokens import Token
 
+if TYPE_CHECKING:
+    from inlinecache import FieldCache, PropertyCache, SuperCache
+
 
 class Expression:
-    pass
+    __slots__ = ()
+
+
+# Variable, Assignment, This and Super carry the lexical address (depth,
+# slot) computed by the Analyzer: the number of frames out and the slot in
+# that frame. A depth of None means the name is not a local and is looked
+# up by name in the global scope. Locals of the current frame may be held
+# in a Cell, and those of enclosing frames are reached through the cells
+# of the running function, at the index of their upvalue.
+#
+# Get, Set and Super carry the inline cache of their lookup, filled as
+# they run.
+#
+# Expressions that can contain a call carry whether they do, set by the
+# Analyzer: the stack engine only runs those as routines.
 
 
 # -------------------------------------------------------------------------------
-@dataclass
+@dataclass(slots=True)
 class Binary(Expression):
     operator: Token
     left: Expression
     right: Expression
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Grouping(Expression):
     expression: Expression
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Expression):
     value: object
+    token: Token | None = field(default=None, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Unary(Expression):
     operator: Token
     right: Expression
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Variable(Expression):
     name: Token
+    depth: int | None = field(default=None, compare=False)
+    slot: int | None = field(default=None, compare=False)
+    cell: bool = field(default=False, compare=False)
+    upvalue: int | None = field(default=None, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Assignment(Expression):
     name: Token
     value: Expression
+    depth: int | None = field(default=None, compare=False)
+    slot: int | None = field(default=None, compare=False)
+    cell: bool = field(default=False, compare=False)
+    upvalue: int | None = field(default=None, compare=False)
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Logical(Expression):
     operator: Token
     left: Expression
     right: Expression
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Call(Expression):
     callee: Expression
     paren: Token
     args: list[Expression]
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Get(Expression):
     target: Expression
     name: Token
+    cache: "PropertyCache | None" = field(default=None, compare=False)
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Set(Expression):
     target: Expression
     name: Token
     value: Expression
+    cache: "FieldCache | None" = field(default=None, compare=False)
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class This(Expression):
     keyword: Token
+    depth: int | None = field(default=None, compare=False)
+    slot: int | None = field(default=None, compare=False)
+    cell: bool = field(default=False, compare=False)
+    upvalue: int | None = field(default=None, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Super(Expression):
     keyword: Token
     method: Token
+    depth: int | None = field(default=None, compare=False)
+    slot: int | None = field(default=None, compare=False)
+    cell: bool = field(default=False, compare=False)
+    upvalue: int | None = field(default=None, compare=False)
+    # 'this', the instance the method found runs on
+    this: "This | None" = field(default=None, compare=False)
+    cache: "SuperCache | None" = field(default=None, compare=False)
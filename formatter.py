@@ -4,17 +4,62 @@ import expression as Expr
 import statement as Stmt
 from parser import Parser
 from scanner import Scanner
+from tokens import Token
 
 
 class Formatter:
-    def __init__(self, indent=4):
+    def __init__(self, indent=4, analyzed=False):
         self.indent = indent
+        # Whether the Analyzer told reads of globals apart from local ones
+        self.analyzed = analyzed
+        self.scopes: list[dict[str, Token]] = []
+        # Names of locals declared in the scope of a read of a global with
+        # the same name, as after inlining
+        self.shadowing: list[Token] = []
+        self.used: set[str] = set()
+        self.renamed: dict[int, str] = {}
 
     def format(self, statements: list[Stmt.Statement]) -> str:
-        lines = []
-        for stmt in statements:
-            lines.append(self.format_stmt(stmt))
-        return "\n".join(lines)
+        if self.analyzed:
+            # Shadowing locals are found by a first pass, then renamed
+            self.shadowing = []
+            self.used = set()
+            self.renamed = {}
+            self.format_statements(statements)
+            self.rename_shadowing()
+        return "\n".join(self.format_statements(statements))
+
+    def format_statements(self, statements: list[Stmt.Statement]) -> list[str]:
+        return [self.format_stmt(stmt) for stmt in statements]
+
+    def rename_shadowing(self):
+        for token in self.shadowing:
+            if id(token) in self.renamed:
+                continue
+            n = 1
+            while f"{token.lexeme}_{n}" in self.used:
+                n += 1
+            self.renamed[id(token)] = f"{token.lexeme}_{n}"
+            self.used.add(self.renamed[id(token)])
+
+    def declare(self, name: Token, local: bool = True) -> str:
+        self.used.add(name.lexeme)
+        if local and self.scopes:
+            self.scopes[-1][name.lexeme] = name
+        return self.renamed.get(id(name), name.lexeme)
+
+    def variable(self, name: Token, depth: int | None) -> str:
+        self.used.add(name.lexeme)
+        if not self.analyzed:
+            return name.lexeme
+
+        declared = [scope[name.lexeme] for scope in self.scopes if name.lexeme in scope]
+        if depth is None:
+            self.shadowing.extend(declared)
+            return name.lexeme
+        if not declared:
+            return name.lexeme
+        return self.renamed.get(id(declared[-1]), name.lexeme)
 
     def stringify(self, value):
         match value:
@@ -26,9 +71,22 @@ class Formatter:
             case None:
                 return "nil"
 
+            case str():
+                return f'"{value}"'
+
+            case float() if value.is_integer():
+                return f"{value:.0f}"
+
             case _:
                 return value
 
+    def format_body(self, lines: list[str]) -> str:
+        if not lines:
+            return "{}"
+        inner = " " * self.indent
+        lines = [inner + line.replace("\n", "\n" + inner) for line in lines]
+        return "{\n" + "\n".join(lines) + "\n}"
+
     def format_stmt(self, statement: Stmt.Statement) -> str:
         match statement:
             case Stmt.Print(expr):
@@ -37,19 +95,64 @@ class Formatter:
             case Stmt.Expression(expr):
                 return f"{self.format_expr(expr)};"
 
+            case Stmt.Var(name, None):
+                return f"var {self.declare(name, statement.slot is not None)};"
+
             case Stmt.Var(name, initializer):
-                return (
-                    f"var {name.lexeme};"
-                    if initializer is None
-                    else f"var {name} = {self.format_expr(initializer)}"
+                value = self.format_expr(initializer)
+                declared = self.declare(name, statement.slot is not None)
+                return f"var {declared} = {value};"
+
+            case Stmt.Block(statements):
+                self.scopes.append({})
+                lines = self.format_statements(statements)
+                self.scopes.pop()
+                return self.format_body(lines)
+
+            case Stmt.If(condition, consequence, alternative):
+                text = (
+                    f"if ({self.format_expr(condition)}) "
+                    f"{self.format_stmt(consequence)}"
                 )
+                if alternative is not None:
+                    text += f" else {self.format_stmt(alternative)}"
+                return text
+
+            case Stmt.While(condition, body):
+                return f"while ({self.format_expr(condition)}) {self.format_stmt(body)}"
+
+            case Stmt.Function(name):
+                declared = self.declare(name, statement.slot is not None)
+                return f"fun {self.format_function(statement, declared)}"
+
+            case Stmt.Return(_, value):
+                if value is None:
+                    return "return;"
+                return f"return {self.format_expr(value)};"
+
+            case Stmt.Class(name, superclass, methods):
+                text = f"class {self.declare(name, statement.slot is not None)}"
+                if superclass is not None:
+                    text += f" < {self.format_expr(superclass)}"
+                body = [
+                    self.format_function(method, method.name.lexeme)
+                    for method in methods
+                ]
+                return f"{text} {self.format_body(body)}"
 
             case _:
                 raise NotImplementedError
 
+    def format_function(self, function: Stmt.Function, name: str) -> str:
+        self.scopes.append({})
+        params = ", ".join(self.declare(param) for param in function.params)
+        body = self.format_body(self.format_statements(function.body))
+        self.scopes.pop()
+        return f"{name}({params}) {body}"
+
     def format_expr(self, expression: Expr.Expression) -> str:
         match expression:
-            case Expr.Binary(op, left, right):
+            case Expr.Binary(op, left, right) | Expr.Logical(op, left, right):
                 return f"{self.format_expr(left)} {op.lexeme} {self.format_expr(right)}"
 
             case Expr.Grouping(expr):
@@ -61,6 +164,32 @@ class Formatter:
             case Expr.Unary(op, right):
                 return f"{op.lexeme}{self.format_expr(right)}"
 
+            case Expr.Variable(name):
+                return self.variable(name, expression.depth)
+
+            case Expr.Assignment(name, value):
+                value = self.format_expr(value)
+                return f"{self.variable(name, expression.depth)} = {value}"
+
+            case Expr.Call(callee, _, args):
+                arguments = ", ".join(self.format_expr(arg) for arg in args)
+                return f"{self.format_expr(callee)}({arguments})"
+
+            case Expr.Get(target, name):
+                return f"{self.format_expr(target)}.{name.lexeme}"
+
+            case Expr.Set(target, name, value):
+                return (
+                    f"{self.format_expr(target)}.{name.lexeme} = "
+                    f"{self.format_expr(value)}"
+                )
+
+            case Expr.This():
+                return "this"
+
+            case Expr.Super(_, method):
+                return f"super.{method.lexeme}"
+
             case _:
                 raise NotImplementedError
 
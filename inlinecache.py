@@ -0,0 +1,120 @@
+# inlinecache
+
+from typing import TYPE_CHECKING
+
+from errors import LoxRuntimeError
+from loxinstance import LoxInstance, Shape
+from tokens import Token
+
+if TYPE_CHECKING:
+    from loxclass import LoxClass
+    from loxfunction import LoxFunction
+
+# Shapes a site caches the lookup of before it stops caching
+POLYMORPHIC_LIMIT = 4
+
+# Where a name lives in instances of a shape: the slot of the field, or
+# None and the method of the class, None if there's neither
+Lookup = tuple[int | None, "LoxFunction | None"]
+
+
+class PropertyCache:
+    """The inline cache of a read site like obj.name, by shape."""
+
+    __slots__ = ("name", "lexeme", "shape", "lookup", "shapes")
+
+    def __init__(self, name: Token):
+        self.name = name
+        self.lexeme = name.lexeme
+        # The first shape seen, and where the name lives in it
+        self.shape: Shape | None = None
+        self.lookup: Lookup = (None, None)
+        # Where the name lives in the other shapes seen, None once
+        # megamorphic
+        self.shapes: dict[Shape, Lookup] | None = {}
+
+    def get(self, instance: LoxInstance) -> object:
+        shape = instance.shape
+        slot, method = self.lookup if shape is self.shape else self.find(shape)
+        if slot is not None:
+            return instance.values[slot]
+
+        if method is None:
+            raise self.undefined()
+        return method.bind(instance)
+
+    def method_of(self, instance: LoxInstance) -> "LoxFunction | None":
+        shape = instance.shape
+        slot, method = self.lookup if shape is self.shape else self.find(shape)
+        if slot is None and method is None:
+            raise self.undefined()
+        return method
+
+    def undefined(self) -> LoxRuntimeError:
+        return LoxRuntimeError(self.name, f"Undefined property '{self.lexeme}'")
+
+    def find(self, shape: Shape) -> Lookup:
+        shapes = self.shapes
+        if shapes is not None and shape in shapes:
+            return shapes[shape]
+
+        slot = shape.slots.get(self.lexeme)
+        method = shape.klass.find_method(self.lexeme) if slot is None else None
+        lookup = (slot, method)
+
+        if self.shape is None:
+            self.shape = shape
+            self.lookup = lookup
+        elif shapes is not None:
+            if len(shapes) + 1 < POLYMORPHIC_LIMIT:
+                shapes[shape] = lookup
+            else:
+                self.shapes = None
+        return lookup
+
+
+class FieldCache:
+    """The inline cache of a write site like obj.name = value."""
+
+    __slots__ = ("lexeme", "shape", "slot", "transition")
+
+    def __init__(self, name: Token):
+        self.lexeme = name.lexeme
+        self.shape: Shape | None = None
+        self.slot = 0
+        # The shape with the field added, None if the shape has it
+        self.transition: Shape | None = None
+
+    def set(self, instance: LoxInstance, value: object):
+        shape = instance.shape
+        if shape is not self.shape:
+            self.shape = shape
+            slot = shape.slots.get(self.lexeme)
+            if slot is None:
+                self.transition = shape.add(self.lexeme)
+            else:
+                self.slot = slot
+                self.transition = None
+
+        if self.transition is None:
+            instance.values[self.slot] = value
+        else:
+            instance.shape = self.transition
+            instance.values.append(value)
+
+
+class SuperCache:
+    """The inline cache of a super.method site, by superclass."""
+
+    __slots__ = ("lexeme", "superclass", "method")
+
+    def __init__(self, method: Token):
+        self.lexeme = method.lexeme
+        self.superclass: "LoxClass | None" = None
+        self.method: "LoxFunction | None" = None
+
+    def find_method(self, superclass: "LoxClass") -> "LoxFunction | None":
+        if superclass is not self.superclass:
+            self.superclass = superclass
+            self.method = superclass.find_method(self.lexeme)
+        return self.method
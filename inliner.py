@@ -0,0 +1,289 @@
+# inliner
+
+import expression as Expr
+import statement as Stmt
+from deadcode import DECLARATIONS, is_pure
+
+# Functions returning an expression of more nodes aren't inlined
+MAX_SIZE = 16
+
+
+class Inliner:
+    """Replace calls to small top-level functions by the expression they
+    return, with the arguments in place of the parameters."""
+
+    def __init__(self, is_repl: bool = False):
+        self.is_repl = is_repl
+        self.assigned_globals: set[str] = set()
+        # Inlinable functions: the index of the statement declaring them
+        self.functions: dict[str, tuple[int, Stmt.Function]] = {}
+        # Index of the top-level statement being inlined
+        self.index = 0
+        self.substitute = False
+
+    def inline(self, statements: list[Stmt.Statement]) -> list[Stmt.Statement]:
+        if self.is_repl:
+            return statements
+
+        # Assignments to a function may come after calls, so they are all
+        # found by a first walk before any call is replaced.
+        self.substitute = False
+        self.inline_block(statements)
+
+        self.find_inlinable(statements)
+        if not self.functions:
+            return statements
+
+        self.substitute = True
+        for self.index, stmt in enumerate(statements):
+            self.inline_stmt(stmt)
+
+        return statements
+
+    def find_inlinable(self, statements: list[Stmt.Statement]):
+        declarations: dict[str, list[tuple[int, Stmt.Statement]]] = {}
+        for index, stmt in enumerate(statements):
+            if isinstance(stmt, DECLARATIONS):
+                declarations.setdefault(stmt.name.lexeme, []).append((index, stmt))
+
+        for name, declared in declarations.items():
+            if len(declared) != 1 or name in self.assigned_globals:
+                continue
+            index, stmt = declared[0]
+            if isinstance(stmt, Stmt.Function) and is_inlinable(stmt):
+                self.functions[name] = (index, stmt)
+
+    def inline_block(self, statements: list[Stmt.Statement]):
+        for stmt in statements:
+            self.inline_stmt(stmt)
+
+    def inline_stmt(self, stmt: Stmt.Statement):
+        match stmt:
+            case Stmt.Expression(expr) | Stmt.Print(expr):
+                stmt.expression = self.inline_expr(expr)
+
+            case Stmt.Var(_, initializer):
+                if initializer is not None:
+                    stmt.initializer = self.inline_expr(initializer)
+
+            case Stmt.Block(statements):
+                self.inline_block(statements)
+
+            case Stmt.If(condition, consequence, alternative):
+                stmt.condition = self.inline_expr(condition)
+                self.inline_stmt(consequence)
+                if alternative is not None:
+                    self.inline_stmt(alternative)
+
+            case Stmt.While(condition, body):
+                stmt.condition = self.inline_expr(condition)
+                self.inline_stmt(body)
+
+            case Stmt.Function(_, _, body):
+                self.inline_block(body)
+
+            case Stmt.Return(_, value):
+                if value is not None:
+                    stmt.value = self.inline_expr(value)
+                    # Unless the call was inlined
+                    stmt.tail = isinstance(stmt.value, Expr.Call)
+
+            case Stmt.Class(_, _, methods):
+                for method in methods:
+                    self.inline_block(method.body)
+
+            case _:
+                raise NotImplementedError
+
+    def inline_expr(self, expr: Expr.Expression) -> Expr.Expression:
+        match expr:
+            case Expr.Literal() | Expr.Variable() | Expr.This() | Expr.Super():
+                return expr
+
+            case Expr.Grouping(inner):
+                expr.expression = self.inline_expr(inner)
+                return expr
+
+            case Expr.Unary(_, right):
+                expr.right = self.inline_expr(right)
+                return expr
+
+            case Expr.Binary(_, left, right) | Expr.Logical(_, left, right):
+                expr.left = self.inline_expr(left)
+                expr.right = self.inline_expr(right)
+                return expr
+
+            case Expr.Assignment(name, value):
+                expr.value = self.inline_expr(value)
+                if expr.depth is None:
+                    self.assigned_globals.add(name.lexeme)
+                return expr
+
+            case Expr.Call(callee, _, args):
+                expr.callee = self.inline_expr(callee)
+                expr.args = [self.inline_expr(arg) for arg in args]
+                return self.inline_call(expr) if self.substitute else expr
+
+            case Expr.Get(target):
+                expr.target = self.inline_expr(target)
+                return expr
+
+            case Expr.Set(target, _, value):
+                expr.target = self.inline_expr(target)
+                expr.value = self.inline_expr(value)
+                return expr
+
+            case _:
+                raise NotImplementedError
+
+    def inline_call(self, call: Expr.Call) -> Expr.Expression:
+        """Return the expression to evaluate instead of the call."""
+        match call.callee:
+            case Expr.Variable(name) if call.callee.depth is None:
+                index, function = self.functions.get(name.lexeme, (None, None))
+            case _:
+                return call
+
+        if function is None or index >= self.index:
+            return call
+
+        if len(call.args) != len(function.params):
+            # Let it fail at run time
+            return call
+
+        if not function.body or function.body[0].value is None:
+            if not all(is_pure(arg) for arg in call.args):
+                return call
+            return Expr.Literal(None, call.paren)
+
+        value = function.body[0].value
+        runs_code = any(
+            isinstance(e, (Expr.Call, Expr.Set)) for e in subexpressions(value)
+        )
+        if not all(
+            isinstance(arg, Expr.Literal) if runs_code else is_pure(arg)
+            for arg in call.args
+        ):
+            return call
+
+        inlined = substitute(value, call.args)
+        if isinstance(inlined, (Expr.Binary, Expr.Logical, Expr.Unary)):
+            # Keeps the precedence when printed
+            return Expr.Grouping(inlined, calls=inlined.calls)
+        return inlined
+
+
+def is_inlinable(function: Stmt.Function) -> bool:
+    match function.body:
+        case []:
+            return True
+
+        case [Stmt.Return(_, None)]:
+            return True
+
+        case [Stmt.Return(_, value)]:
+            nodes = list(subexpressions(value))
+            return len(nodes) <= MAX_SIZE and not any(
+                isinstance(e, Expr.Assignment)
+                or isinstance(e, Expr.Variable)
+                and e.depth is None
+                and e.name.lexeme == function.name.lexeme
+                for e in nodes
+            )
+
+        case _:
+            return False
+
+
+def subexpressions(expr: Expr.Expression):
+    """The expression and all the expressions it's made of."""
+    yield expr
+    match expr:
+        case Expr.Grouping(inner):
+            yield from subexpressions(inner)
+
+        case Expr.Unary(_, right):
+            yield from subexpressions(right)
+
+        case Expr.Binary(_, left, right) | Expr.Logical(_, left, right):
+            yield from subexpressions(left)
+            yield from subexpressions(right)
+
+        case Expr.Assignment(_, value):
+            yield from subexpressions(value)
+
+        case Expr.Call(callee, _, args):
+            yield from subexpressions(callee)
+            for arg in args:
+                yield from subexpressions(arg)
+
+        case Expr.Get(target):
+            yield from subexpressions(target)
+
+        case Expr.Set(target, _, value):
+            yield from subexpressions(target)
+            yield from subexpressions(value)
+
+
+def substitute(
+    expr: Expr.Expression, args: list[Expr.Expression] | None = None
+) -> Expr.Expression:
+    """A copy of the returned expression with the arguments in place of the
+    parameters, or of expr when args is None."""
+    match expr:
+        case Expr.Variable(name) if args is not None and expr.depth is not None:
+            assert expr.slot is not None
+            return substitute(args[expr.slot])
+
+        case Expr.Variable(name):
+            return Expr.Variable(name, expr.depth, expr.slot, expr.cell, expr.upvalue)
+
+        case Expr.Literal(value, token):
+            return Expr.Literal(value, token)
+
+        case Expr.This(keyword):
+            return Expr.This(keyword, expr.depth, expr.slot, expr.cell, expr.upvalue)
+
+        case Expr.Grouping(inner):
+            return Expr.Grouping(substitute(inner, args), calls=expr.calls)
+
+        case Expr.Unary(operator, right):
+            return Expr.Unary(operator, substitute(right, args), calls=expr.calls)
+
+        case Expr.Binary(operator, left, right):
+            return Expr.Binary(
+                operator,
+                substitute(left, args),
+                substitute(right, args),
+                calls=expr.calls,
+            )
+
+        case Expr.Logical(operator, left, right):
+            return Expr.Logical(
+                operator,
+                substitute(left, args),
+                substitute(right, args),
+                calls=expr.calls,
+            )
+
+        case Expr.Call(callee, paren, call_args):
+            return Expr.Call(
+                substitute(callee, args),
+                paren,
+                [substitute(arg, args) for arg in call_args],
+                calls=True,
+            )
+
+        case Expr.Get(target, name):
+            return Expr.Get(substitute(target, args), name, calls=expr.calls)
+
+        case Expr.Set(target, name, value):
+            return Expr.Set(
+                substitute(target, args),
+                name,
+                substitute(value, args),
+                calls=expr.calls,
+            )
+
+        case _:
+            raise NotImplementedError
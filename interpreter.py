@@ -3,17 +3,29 @@
 import logging
 import math
 import time
+from typing import TYPE_CHECKING
 
 import expression as Expr
 import statement as Stmt
-from environment import Environment
+from environment import Capture, Cell, Environment, Frame
 from errors import LoxError, LoxRuntimeError
-from loxcallable import LoxCallable, Return
+from inlinecache import FieldCache, PropertyCache, SuperCache
+from loxcallable import LoxCallable
 from loxclass import LoxClass
-from loxfunction import LoxFunction
+from loxfunction import LoxFunction, TailCall
 from loxinstance import LoxInstance
+from loxvalue import is_equal, is_truthy, stringify
 from tokens import Token
 
+if TYPE_CHECKING:
+    from jit import JIT
+
+# Executing a statement returns None, or a 1-tuple holding the value of a
+# 'return' that must unwind to the enclosing call: returns don't raise, so
+# they cost no more than any other statement. A 'return' of a call to a
+# Lox function unwinds with the TailCall instead, made by that call.
+Completion = tuple[object] | TailCall | None
+
 
 # Native functions
 class Clock(LoxCallable):
@@ -42,7 +54,11 @@ class Interpreter:
         self.globals = environment if environment else Environment()
         self.globals.define(Token.IDENTIFIER("clock"), Clock())
 
-        self.environment = self.globals
+        self.frame: Frame | None = None
+        # Lent to the blocks run outside any function, which never nest
+        self.script = Frame()
+        # Set to promote hot functions to compiled code
+        self.jit: "JIT | None" = None
         self.logger = logging.getLogger("Lox.Interpreter")
 
     def interpret(self, statements: list[Stmt.Statement]):
@@ -58,315 +74,448 @@ class Interpreter:
         if has_error:
             raise LoxError()
 
-    def is_truthy(self, obj: object) -> bool:
-        match obj:
-            case None:
-                return False
-
-            case bool():
-                return obj
-
-            case _:
-                return True
-
-    def is_equal(self, left, right) -> bool:
-        match [left, right]:
-            case [bool(), bool()]:
-                return left == right
-
-            case [bool(), _] | [_, bool()]:
-                return False
-
-            case [_, math.inf] | [math.inf, _]:
-                return False
-
-            case _:
-                return left == right
-
     def check_number_operand(self, operator: Token, operand: object):
-        if not isinstance(operand, float):
+        if type(operand) is not float:
             raise LoxRuntimeError(operator, "Operand must be a number")
 
     def check_number_operands(self, operator: Token, left: object, right: object):
-        if not (isinstance(left, float) and isinstance(right, float)):
+        if type(left) is not float or type(right) is not float:
             raise LoxRuntimeError(operator, "Operands must be numbers")
 
-    def stringify(self, value: object):
-        match value:
-            case True:
-                return "true"
-            case False:
-                return "false"
+    # Variables
+    def look_up(
+        self, name: Token, expression: Expr.Variable | Expr.This | Expr.Super
+    ) -> object:
+        depth = expression.depth
+        if depth is None:
+            return self.globals.get(name)
+
+        assert self.frame
+        if depth:
+            return self.frame.upvalues[expression.upvalue].value
+        value = self.frame.values[expression.slot]
+        return value.value if expression.cell else value
+
+    def assign(self, expression: Expr.Assignment, value: object):
+        depth = expression.depth
+        if depth is None:
+            self.globals.assign(expression.name, value)
+            return
+
+        assert self.frame
+        if depth:
+            self.frame.upvalues[expression.upvalue].value = value
+        elif expression.cell:
+            self.frame.values[expression.slot].value = value
+        else:
+            self.frame.values[expression.slot] = value
+
+    def define(
+        self, name: Token, slot: int | None, value: object = None, cell: bool = False
+    ):
+        if slot is None:
+            self.globals.define(name, value)
+        else:
+            assert self.frame
+            self.frame.values[slot] = Cell(value) if cell else value
 
-            case None:
-                return "nil"
+    def capture(self, captures: list[Capture]) -> tuple[Cell, ...]:
+        return self.frame.capture(captures) if self.frame else ()
 
-            case float():
-                return f"{value:g}"
-            case _:
-                return value
+    def script_frame(self, size: int) -> Frame:
+        values = self.script.values
+        if len(values) < size:
+            values.extend([None] * (size - len(values)))
+        return self.script
 
     # Interpreting Expressions
+    #
+    # Nodes are dispatched on their type, and binary operators on their
+    # token type, through the tables below, so the cost of dispatch doesn't
+    # depend on the kind of node.
     def evaluate(self, expression: Expr.Expression):
-        match expression:
-            case Expr.Literal():
-                return expression.value
-
-            case Expr.Unary(Token(Token.Type.BANG), right):
-                return not self.is_truthy(self.evaluate(right))
-
-            case Expr.Unary(Token(Token.Type.MINUS), right):
-                rv = self.evaluate(right)
-                self.check_number_operand(expression.operator, rv)
-                return -float(rv)
-
-            case Expr.Binary(Token(Token.Type.MINUS), left, right):
-                lv = self.evaluate(left)
-                rv = self.evaluate(right)
-                self.check_number_operands(expression.operator, lv, rv)
-
-                return float(lv) - float(rv)
-
-            case Expr.Binary(Token(Token.Type.PLUS), left, right):
-                lv = self.evaluate(left)
-                rv = self.evaluate(right)
-
-                if isinstance(lv, str) and isinstance(rv, str):
-                    return str(lv) + str(rv)
+        try:
+            evaluator = EXPRESSIONS[type(expression)]
+        except KeyError:
+            raise NotImplementedError from None
+        return evaluator(self, expression)
+
+    def evaluate_literal(self, expression: Expr.Literal):
+        return expression.value
+
+    def evaluate_grouping(self, expression: Expr.Grouping):
+        return self.evaluate(expression.expression)
+
+    def evaluate_unary(self, expression: Expr.Unary):
+        rv = self.evaluate(expression.right)
+        if expression.operator.type == Token.Type.BANG:
+            return not is_truthy(rv)
+
+        self.check_number_operand(expression.operator, rv)
+        return -rv
+
+    def evaluate_binary(self, expression: Expr.Binary):
+        lv = self.evaluate(expression.left)
+        rv = self.evaluate(expression.right)
+        return BINARY_OPERATORS[expression.operator.type](
+            self, expression.operator, lv, rv
+        )
+
+    def subtract(self, operator: Token, lv: object, rv: object):
+        self.check_number_operands(operator, lv, rv)
+        return lv - rv
+
+    def add(self, operator: Token, lv: object, rv: object):
+        if type(lv) is float and type(rv) is float:
+            return lv + rv
+
+        if type(lv) is str and type(rv) is str:
+            return lv + rv
+
+        raise LoxRuntimeError(operator, "Operands must be two numbers or two strings")
+
+    def multiply(self, operator: Token, lv: object, rv: object):
+        self.check_number_operands(operator, lv, rv)
+        return lv * rv
+
+    def divide(self, operator: Token, lv: object, rv: object):
+        # Python throws an exception when dividing by zero.
+        # Unlike java on top of which Lox is implemented. We
+        # want the same behavior so we have to handle this
+        # case specifically.
+        if rv == 0.0:
+            return math.inf
+
+        self.check_number_operands(operator, lv, rv)
+        return lv / rv
+
+    def greater(self, operator: Token, lv: object, rv: object):
+        self.check_number_operands(operator, lv, rv)
+        return lv > rv
+
+    def greater_equal(self, operator: Token, lv: object, rv: object):
+        self.check_number_operands(operator, lv, rv)
+        return lv >= rv
+
+    def less(self, operator: Token, lv: object, rv: object):
+        self.check_number_operands(operator, lv, rv)
+        return lv < rv
+
+    def less_equal(self, operator: Token, lv: object, rv: object):
+        self.check_number_operands(operator, lv, rv)
+        return lv <= rv
+
+    def equal(self, operator: Token, lv: object, rv: object):
+        return is_equal(lv, rv)
+
+    def not_equal(self, operator: Token, lv: object, rv: object):
+        return not is_equal(lv, rv)
+
+    def evaluate_variable(self, expression: Expr.Variable):
+        return self.look_up(expression.name, expression)
+
+    def evaluate_assignment(self, expression: Expr.Assignment):
+        val = self.evaluate(expression.value)
+        self.assign(expression, val)
+        return val
+
+    def evaluate_logical(self, expression: Expr.Logical):
+        lv = self.evaluate(expression.left)
+        if expression.operator.type == Token.Type.OR:
+            if is_truthy(lv):
+                return lv
+        elif not is_truthy(lv):
+            return lv
+        return self.evaluate(expression.right)
+
+    def evaluate_call(self, expression: Expr.Call):
+        # Methods called right away run on their instance without being
+        # bound first
+        callee = expression.callee
+        if type(callee) is Expr.Get:
+            obj = self.evaluate(callee.target)
+            if isinstance(obj, LoxInstance):
+                method = self.property_cache(callee).method_of(obj)
+                if method is not None:
+                    return self.call_method(expression, method, obj)
+            cv = self.get_property(callee, obj)
+
+        elif type(callee) is Expr.Super:
+            method, obj = self.find_super_method(callee)
+            return self.call_method(expression, method, obj)
 
-                if isinstance(lv, float) and isinstance(rv, float):
-                    return float(lv) + float(rv)
+        else:
+            cv = self.evaluate(callee)
+
+        argv = [self.evaluate(arg) for arg in expression.args]
+
+        if not isinstance(cv, LoxCallable):
+            raise InterpreterError(
+                expression.paren, "Can only call functions and classes"
+            )
+
+        if len(argv) != cv.arity():
+            raise InterpreterError(
+                expression.paren,
+                f"Expected {cv.arity()} arguments but got {len(argv)}",
+            )
+        return cv.call(self, argv)
+
+    def call_method(
+        self, expression: Expr.Call, method: LoxFunction, obj: LoxInstance
+    ):
+        argv = [self.evaluate(arg) for arg in expression.args]
+
+        if len(argv) != method.arity():
+            raise InterpreterError(
+                expression.paren,
+                f"Expected {method.arity()} arguments but got {len(argv)}",
+            )
+        return method.call_method(self, obj, argv)
+
+    def evaluate_get(self, expression: Expr.Get):
+        return self.get_property(expression, self.evaluate(expression.target))
+
+    def get_property(self, expression: Expr.Get, obj: object) -> object:
+        if isinstance(obj, LoxInstance):
+            return self.property_cache(expression).get(obj)
+        raise LoxRuntimeError(expression.name, "Only instances have properties")
+
+    def property_cache(self, expression: Expr.Get) -> PropertyCache:
+        cache = expression.cache
+        if cache is None:
+            cache = expression.cache = PropertyCache(expression.name)
+        return cache
+
+    def evaluate_set(self, expression: Expr.Set):
+        obj = self.evaluate(expression.target)
+
+        if isinstance(obj, LoxInstance):
+            v = self.evaluate(expression.value)
+            self.field_cache(expression).set(obj, v)
+            return v
+        raise LoxRuntimeError(expression.name, "Only instances have fields")
+
+    def field_cache(self, expression: Expr.Set) -> FieldCache:
+        cache = expression.cache
+        if cache is None:
+            cache = expression.cache = FieldCache(expression.name)
+        return cache
+
+    def evaluate_this(self, expression: Expr.This):
+        return self.look_up(expression.keyword, expression)
+
+    def evaluate_super(self, expression: Expr.Super):
+        method, obj = self.find_super_method(expression)
+        return method.bind(obj)
+
+    def find_super_method(
+        self, expression: Expr.Super
+    ) -> tuple[LoxFunction, LoxInstance]:
+        """The method of the superclass and the instance to run it on."""
+        superclass = self.look_up(expression.keyword, expression)
+        assert isinstance(superclass, LoxClass)
+
+        assert expression.this
+        obj = self.look_up(expression.keyword, expression.this)
+        assert isinstance(obj, LoxInstance)
+
+        method = expression.method
+        cache = expression.cache
+        if cache is None:
+            cache = expression.cache = SuperCache(method)
+        resolved_method = cache.find_method(superclass)
+        if not resolved_method:
+            raise InterpreterError(method, f"Undefined property '{method.lexeme}'")
+
+        return resolved_method, obj
 
-                raise LoxRuntimeError(
-                    expression.operator, "Operands must be two numbers or two strings"
+    # Executing Statements
+    def execute(self, statement: Stmt.Statement) -> Completion:
+        try:
+            executor = STATEMENTS[type(statement)]
+        except KeyError:
+            raise NotImplementedError from None
+        return executor(self, statement)
+
+    def execute_print(self, statement: Stmt.Print):
+        print(stringify(self.evaluate(statement.expression)))
+
+    def execute_expression(self, statement: Stmt.Expression):
+        self.evaluate(statement.expression)
+
+    def execute_function(self, statement: Stmt.Function):
+        function = LoxFunction(statement)
+        self.define(statement.name, statement.slot, function, statement.cell)
+        # Once defined, as the function may refer to itself
+        function.upvalues = self.capture(statement.upvalues)
+
+    def execute_class(self, statement: Stmt.Class):
+        name = statement.name
+        superclass = None
+        if statement.superclass:
+            superclass = self.evaluate(statement.superclass)
+            if not isinstance(superclass, LoxClass):
+                raise InterpreterError(
+                    statement.superclass.name, "Superclass must be a class"
                 )
 
-            case Expr.Binary(Token(Token.Type.STAR), left, right):
-                lv = self.evaluate(left)
-                rv = self.evaluate(right)
-                self.check_number_operands(expression.operator, lv, rv)
-
-                return float(lv) * float(rv)
-
-            case Expr.Binary(Token(Token.Type.SLASH), left, right):
-                lv = self.evaluate(left)
-                rv = self.evaluate(right)
-
-                # Python throws an exception when dividing by zero.
-                # Unlike java on top of which Lox is implemented. We
-                # want the same behavior so we have to handle this
-                # case specifically.
-                if rv == 0.0:
-                    return math.inf
-
-                self.check_number_operands(expression.operator, lv, rv)
-
-                return float(lv) / float(rv)
-
-            case Expr.Binary(Token(Token.Type.GREATER), left, right):
-                lv = self.evaluate(left)
-                rv = self.evaluate(right)
-                self.check_number_operands(expression.operator, lv, rv)
-                return float(lv) > float(rv)
-
-            case Expr.Binary(Token(Token.Type.GREATER_EQUAL), left, right):
-                lv = self.evaluate(left)
-                rv = self.evaluate(right)
-                self.check_number_operands(expression.operator, lv, rv)
+        functions = [
+            LoxFunction(method, is_initializer=method.name.lexeme == "init")
+            for method in statement.methods
+        ]
+        methods = {function.declaration.name.lexeme: function for function in functions}
+
+        klass = LoxClass(name, superclass, methods)
+        self.define(name, statement.slot, klass, statement.cell)
+
+        # Once defined, as methods may refer to the class
+        frame = self.frame
+        if superclass:
+            frame = Frame(1, self.capture(statement.upvalues))
+            frame.values[0] = Cell(superclass)
+        if frame:
+            for function in functions:
+                function.upvalues = frame.capture(function.declaration.upvalues)
+
+    def execute_var(self, statement: Stmt.Var):
+        value = None
+        if statement.initializer is not None:
+            value = self.evaluate(statement.initializer)
+
+        self.define(statement.name, statement.slot, value, statement.cell)
+
+    def execute_block_statement(self, statement: Stmt.Block) -> Completion:
+        if not statement.has_frame:
+            return self.execute_statements(statement.statements)
+        return self.execute_block(
+            statement.statements, self.script_frame(statement.size)
+        )
+
+    def execute_if(self, statement: Stmt.If) -> Completion:
+        if is_truthy(self.evaluate(statement.condition)):
+            return self.execute(statement.consequence)
+        elif statement.alternative is not None:
+            return self.execute(statement.alternative)
+        return None
+
+    def execute_while(self, statement: Stmt.While) -> Completion:
+        while is_truthy(self.evaluate(statement.condition)):
+            completion = self.execute(statement.body)
+            if completion is not None:
+                return completion
+        return None
+
+    def execute_return(self, statement: Stmt.Return) -> Completion:
+        value = statement.value
+        if statement.tail:
+            return self.tail_call(value)
+        return (None if value is None else self.evaluate(value),)
+
+    def tail_call(self, expression: Expr.Call) -> Completion:
+        """Return the TailCall of a call to a Lox function, call others now."""
+        callee = expression.callee
+        this = None
+        if type(callee) is Expr.Get:
+            obj = self.evaluate(callee.target)
+            method = None
+            if isinstance(obj, LoxInstance):
+                method = self.property_cache(callee).method_of(obj)
+            if method is None:
+                cv = self.get_property(callee, obj)
+            else:
+                cv, this = method, obj
+
+        elif type(callee) is Expr.Super:
+            cv, this = self.find_super_method(callee)
 
-                return float(lv) >= float(rv)
-
-            case Expr.Binary(Token(Token.Type.LESS), left, right):
-                lv = self.evaluate(left)
-                rv = self.evaluate(right)
-                self.check_number_operands(expression.operator, lv, rv)
-
-                return float(lv) < float(rv)
-
-            case Expr.Binary(Token(Token.Type.LESS_EQUAL), left, right):
-                lv = self.evaluate(left)
-                rv = self.evaluate(right)
-                self.check_number_operands(expression.operator, lv, rv)
-
-                return float(lv) <= float(rv)
-
-            case Expr.Binary(Token(Token.Type.EQUAL_EQUAL), left, right):
-                return self.is_equal(self.evaluate(left), self.evaluate(right))
-
-            case Expr.Binary(Token(Token.Type.BANG_EQUAL), left, right):
-                return not self.is_equal(self.evaluate(left), self.evaluate(right))
-
-            case Expr.Grouping(expr):
-                return self.evaluate(expr)
-
-            case Expr.Variable(name):
-                return self.environment.get(name)
-
-            case Expr.Assignment(name, value):
-                val = self.evaluate(value)
-                self.environment.assign(name, val)
-                return val
-
-            case Expr.Logical(Token(Token.Type.OR), left, right):
-                lv = self.evaluate(left)
-                if self.is_truthy(lv):
-                    return lv
-                return self.evaluate(right)
-
-            case Expr.Logical(Token(Token.Type.AND), left, right):
-                lv = self.evaluate(left)
-                if not self.is_truthy(lv):
-                    return lv
-                return self.evaluate(right)
-
-            case Expr.Call(callee, paren, args):
-                cv = self.evaluate(callee)
-                argv = [self.evaluate(arg) for arg in args]
-
-                if not isinstance(cv, LoxCallable):
-                    raise InterpreterError(paren, "Can only call functions and classes")
-
-                if len(argv) != cv.arity():
-                    raise InterpreterError(
-                        paren,
-                        f"Expected {cv.arity()} arguments but got {len(argv)}",
-                    )
-                return cv.call(self, argv)
-
-            case Expr.Get(target, name):
-                obj = self.evaluate(target)
-
-                if isinstance(obj, LoxInstance):
-                    return obj.get(name)
-                raise LoxRuntimeError(name, "Only instances have properties")
-
-            case Expr.Set(target, name, value):
-                obj = self.evaluate(target)
-
-                if isinstance(obj, LoxInstance):
-                    v = self.evaluate(value)
-                    obj.set(name, v)
-                    return v
-                raise LoxRuntimeError(name, "Only instances have fields")
-
-            case Expr.This(keyword):
-                return self.environment.get(keyword)
-
-            case Expr.Super(keyword, method):
-                superclass = self.environment.get(keyword)
-                assert isinstance(superclass, LoxClass)
-
-                obj = self.environment.get(Token.THIS())
-                assert isinstance(obj, LoxInstance)
-
-                resolved_method = superclass.find_method(method.lexeme)
-                if not resolved_method:
-                    raise InterpreterError(
-                        method, f"Undefined property '{method.lexeme}'"
-                    )
-
-                return resolved_method.bind(obj)
-
-            case _:
-                raise NotImplementedError
-
-    # Executing Statements
-    def execute(self, statement: Stmt.Statement):
-        match statement:
-            case Stmt.Print(expr):
-                print(self.stringify(self.evaluate(expr)))
-
-            case Stmt.Expression(expr):
-                self.evaluate(expr)
-
-            case Stmt.Function(name, _, _):
-                # In the global scope, function declarations are
-                # different, they're visible to the whole scope. This
-                # enables mutual recursion, but only in the global
-                # scope.
-                env = self.globals
-                if self.environment.enclosing:
-                    self.environment = self.environment.split()
-                    env = self.environment
-
-                env.define(name)
-                function = LoxFunction(statement, self.environment)
-                env.assign(name, function)
-
-            case Stmt.Class(name, _, _):
-                superclass = None
-                if statement.superclass:
-                    superclass = self.evaluate(statement.superclass)
-                    if not isinstance(superclass, LoxClass):
-                        raise InterpreterError(
-                            statement.superclass.name, "Superclass must be a class"
-                        )
-
-                self.environment.define(name)
-
-                if superclass:
-                    self.environment = self.environment.push()
-                    self.environment.define(Token.SUPER(name.line), superclass)
-
-                methods: dict[str, LoxFunction] = {}
-                for method in statement.methods:
-                    methods[method.name.lexeme] = LoxFunction(
-                        method, self.environment, method.name.lexeme == "init"
-                    )
-
-                klass = LoxClass(statement.name, superclass, methods)
-
-                if superclass:
-                    self.environment = self.environment.pop()
-
-                self.environment.assign(name, klass)
-
-            case Stmt.Var(name, initializer):
-                value = None
-                if initializer is not None:
-                    value = self.evaluate(initializer)
-
-                self.environment = Environment(self.environment)
-                self.environment.define(name, value)
-
-            case Stmt.Block(stmts):
-                self.execute_block(stmts, self.environment.push())
-
-            case Stmt.If(cond, conseq, alt):
-                if self.is_truthy(self.evaluate(cond)):
-                    self.execute(conseq)
-                elif alt is not None:
-                    self.execute(alt)
-
-            case Stmt.While(cond, body):
-                while self.is_truthy(self.evaluate(cond)):
-                    self.execute(body)
-
-            case Stmt.Return(_, value):
-                raise Return(None if value is None else self.evaluate(value))
-
-            case _:
-                raise NotImplementedError
-
-    def execute_block(self, statements: list[Stmt.Statement], environment: Environment):
-        previous = self.environment
+        else:
+            cv = self.evaluate(callee)
+
+        argv = [self.evaluate(arg) for arg in expression.args]
+
+        if not isinstance(cv, LoxCallable):
+            raise InterpreterError(
+                expression.paren, "Can only call functions and classes"
+            )
+
+        if len(argv) != cv.arity():
+            raise InterpreterError(
+                expression.paren,
+                f"Expected {cv.arity()} arguments but got {len(argv)}",
+            )
+
+        if not isinstance(cv, LoxFunction) or cv.is_initializer:
+            if this is None:
+                return (cv.call(self, argv),)
+            return (cv.call_method(self, this, argv),)
+        return cv.tail_call(argv, this)
+
+    def execute_block(
+        self, statements: list[Stmt.Statement], frame: Frame
+    ) -> Completion:
+        previous = self.frame
         try:
-            self.environment = environment
-            self.execute_statements(statements)
+            self.frame = frame
+            return self.execute_statements(statements)
         finally:
-            self.environment = previous
+            self.frame = previous
 
-    def execute_statements(self, statements: list[Stmt.Statement]):
+    def execute_statements(self, statements: list[Stmt.Statement]) -> Completion:
         for stmt in statements:
-            self.execute(stmt)
+            completion = self.execute(stmt)
+            if completion is not None:
+                return completion
+        return None
+
+
+EXPRESSIONS = {
+    Expr.Literal: Interpreter.evaluate_literal,
+    Expr.Grouping: Interpreter.evaluate_grouping,
+    Expr.Unary: Interpreter.evaluate_unary,
+    Expr.Binary: Interpreter.evaluate_binary,
+    Expr.Variable: Interpreter.evaluate_variable,
+    Expr.Assignment: Interpreter.evaluate_assignment,
+    Expr.Logical: Interpreter.evaluate_logical,
+    Expr.Call: Interpreter.evaluate_call,
+    Expr.Get: Interpreter.evaluate_get,
+    Expr.Set: Interpreter.evaluate_set,
+    Expr.This: Interpreter.evaluate_this,
+    Expr.Super: Interpreter.evaluate_super,
+}
+
+BINARY_OPERATORS = {
+    Token.Type.MINUS: Interpreter.subtract,
+    Token.Type.PLUS: Interpreter.add,
+    Token.Type.STAR: Interpreter.multiply,
+    Token.Type.SLASH: Interpreter.divide,
+    Token.Type.GREATER: Interpreter.greater,
+    Token.Type.GREATER_EQUAL: Interpreter.greater_equal,
+    Token.Type.LESS: Interpreter.less,
+    Token.Type.LESS_EQUAL: Interpreter.less_equal,
+    Token.Type.EQUAL_EQUAL: Interpreter.equal,
+    Token.Type.BANG_EQUAL: Interpreter.not_equal,
+}
+
+STATEMENTS = {
+    Stmt.Print: Interpreter.execute_print,
+    Stmt.Expression: Interpreter.execute_expression,
+    Stmt.Function: Interpreter.execute_function,
+    Stmt.Class: Interpreter.execute_class,
+    Stmt.Var: Interpreter.execute_var,
+    Stmt.Block: Interpreter.execute_block_statement,
+    Stmt.If: Interpreter.execute_if,
+    Stmt.While: Interpreter.execute_while,
+    Stmt.Return: Interpreter.execute_return,
+}
 
 
 class REPLInterpreter(Interpreter):
-    def execute(self, statement: Stmt.Statement):
+    def execute(self, statement: Stmt.Statement) -> Completion:
         if isinstance(statement, Stmt.Expression):
-            print(self.stringify(self.evaluate(statement.expression)))
-        else:
-            super().execute(statement)
+            print(stringify(self.evaluate(statement.expression)))
+            return None
+        return super().execute(statement)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+# jit
+
+import weakref
+from dataclasses import dataclass
+
+import statement as Stmt
+from closurecompiler import ClosureCompiler, Code
+from interpreter import Interpreter
+from tokens import Token
+
+
+@dataclass
+class Profile:
+    name: Token
+    calls: int = 0
+    # Calls made before the function was promoted
+    promoted_after: int | None = None
+    body: Code | None = None
+
+
+class JIT:
+    """Compile functions with the ClosureCompiler once called threshold times."""
+
+    def __init__(self, interpreter: Interpreter, threshold: int):
+        self.threshold = threshold
+        self.compiler = ClosureCompiler(interpreter)
+        # Keyed by id since declarations are unhashable dataclasses
+        self.profiles: dict[int, Profile] = {}
+        # Profiles of declarations since freed, whose ids may be reused
+        self.retired: list[Profile] = []
+
+    def body(self, declaration: Stmt.Function) -> Code | None:
+        """Count a call, and return the compiled body once promoted."""
+        profile = self.profiles.get(id(declaration))
+        if profile is None:
+            profile = self.profiles[id(declaration)] = Profile(declaration.name)
+            weakref.finalize(declaration, self.retire, id(declaration))
+
+        profile.calls += 1
+        if profile.body is None and profile.calls > self.threshold:
+            profile.promoted_after = profile.calls - 1
+            profile.body = self.compiler.compile_function(declaration)
+
+        return profile.body
+
+    def retire(self, key: int):
+        self.retired.append(self.profiles.pop(key))
+
+    def report(self) -> list[str]:
+        """Describe the functions that were promoted."""
+        profiles = [*self.retired, *self.profiles.values()]
+        promoted = [p for p in profiles if p.body is not None]
+        lines = [f"JIT: {len(promoted)} of {len(profiles)} functions promoted"]
+        for profile in sorted(promoted, key=lambda p: -p.calls):
+            name = profile.name
+            lines.append(
+                f"  {name.lexeme} (line {name.line + 1}): "
+                f"{profile.calls} calls, promoted after {profile.promoted_after}"
+            )
+        return lines
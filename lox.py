@@ -1,27 +1,148 @@
 # lox
 
+import argparse
 import logging
+import mmap
 import sys
 
 from analyzer import Analyzer
+from closurecompiler import ClosureCompiler
+from compiler import Compiler
 from environment import Environment
 from errors import LoxError, LoxRuntimeError
 from interpreter import Interpreter, REPLInterpreter
+from jit import JIT
+from loxcache import Cache
+from optimizer import DEFAULT_LEVEL, LEVELS, PassManager
 from parser import Parser
-from scanner import Scanner
+from pyruntime import execute
+from scanner import RegexScanner, stream_tokens
+from stackinterpreter import DEFAULT_MAX_DEPTH, StackInterpreter
+from tokenbuffer import TokenStream
+from transpiler import Transpiler
+from vm import VM
 
+# Execution engines: the tree-walking Interpreter, the ClosureCompiler, the
+# bytecode VM, Python source generated by the Transpiler or the
+# StackInterpreter
+ENGINES = ["tree", "closure", "vm", "python", "stack"]
+
+engine = "tree"
+# Calls after which the tree engine compiles a function, None to never
+jit_threshold: int | None = None
 global_environment = Environment()
+global_vm = VM()
+global_stack_interpreter = StackInterpreter(global_environment, is_repl=True)
+# Calls in progress past which the stack engine overflows
+max_depth = DEFAULT_MAX_DEPTH
+global_namespace: dict = {"__name__": "lox"}
+# Optimization level, and whether to print the statements after each pass
+optimization_level = DEFAULT_LEVEL
+dump_passes = False
+# Cache of analyzed programs used by run, None to always analyze
+cache: Cache | None = None
 has_error = False
 has_runtime_error = False
 
 
 def main(argv):
     logging.basicConfig(format="%(name)s %(levelname)s: %(message)s")
-    if len(argv) > 2:
-        sys.exit("Usage lox.py filename")
 
-    if len(argv) == 2:
-        run_file(argv[1])
+    parser = argparse.ArgumentParser(prog="lox.py", description="Lox interpreter")
+    parser.add_argument("filename", nargs="?", help="Run this file instead of a REPL")
+    parser.add_argument(
+        "--engine", choices=ENGINES, default="tree", help="Execution engine to use"
+    )
+    parser.add_argument(
+        "--emit-python",
+        action="store_true",
+        help="Print the file translated to Python instead of running it",
+    )
+    parser.add_argument(
+        "--jit-threshold",
+        type=int,
+        metavar="N",
+        help="Compile functions of the tree engine after N calls and "
+        "report which ones were",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=DEFAULT_MAX_DEPTH,
+        metavar="N",
+        help="Fail with a stack overflow past N calls in progress, with "
+        "the stack engine",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Cache the analyzed program in a .loxcache directory next to "
+        "the file, and reuse it while the file is unchanged",
+    )
+    parser.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="Report the hits, misses and size of the cache after the run",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Scan, parse and run the file one top-level declaration at a "
+        "time, with the tree, closure or stack engine",
+    )
+    parser.add_argument(
+        "-O",
+        type=int,
+        choices=LEVELS,
+        default=DEFAULT_LEVEL,
+        dest="level",
+        help="Optimization level: 0 for none, 1 to fold constants and "
+        "remove dead code, 2 to also inline small functions",
+    )
+    parser.add_argument(
+        "--dump-passes",
+        action="store_true",
+        help="Print the program to stderr after each optimization pass",
+    )
+    args = parser.parse_args(argv[1:])
+
+    global engine
+    engine = args.engine
+
+    global optimization_level
+    optimization_level = args.level
+
+    global dump_passes
+    dump_passes = args.dump_passes
+
+    global jit_threshold
+    jit_threshold = args.jit_threshold
+
+    global max_depth
+    max_depth = args.max_depth
+
+    global cache
+
+    if args.emit_python:
+        if not args.filename:
+            parser.error("--emit-python needs a file")
+        emit_python(args.filename)
+
+    elif args.stream:
+        if not args.filename or engine not in ("tree", "closure", "stack"):
+            parser.error(
+                "--stream needs a file and the tree, closure or stack engine"
+            )
+        stream_file(args.filename)
+
+    elif args.filename:
+        if args.cache or args.cache_stats:
+            cache = Cache.for_file(args.filename)
+        try:
+            run_file(args.filename)
+        finally:
+            if cache and args.cache_stats:
+                print("\n".join(cache.report()), file=sys.stderr)
 
     else:
         run_prompt()
@@ -43,6 +164,91 @@ def run_file(path):
             sys.exit(70)
 
 
+def stream_file(path):
+    """Run a file without ever holding all of its tokens or its AST."""
+    with open(path, "rb") as file:
+        if file.seek(0, 2) == 0:
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            stream_source(source)
+
+
+def stream_source(source: bytes):
+    global has_error
+    has_error = False
+
+    tokens = stream_tokens(source)
+    parser = Parser(TokenStream(tokens))
+    analyzer = Analyzer()
+    optimizer = passes().run
+    interpreter = (
+        StackInterpreter(Environment(), max_depth)
+        if engine == "stack"
+        else Interpreter(Environment())
+    )
+    if engine == "closure":
+        run_statements = ClosureCompiler(interpreter).interpret
+    else:
+        run_statements = interpreter.interpret
+    if engine == "tree" and jit_threshold is not None:
+        interpreter.jit = JIT(interpreter, jit_threshold)
+
+    # Runtime errors, as in run_file, don't stop later declarations
+    has_compile_error = False
+    try:
+        for stmt in parser.declarations():
+            # Errors may be nested in a declaration that parsed
+            if parser.has_error:
+                has_compile_error = True
+                continue
+
+            try:
+                analyzer.analyze([stmt])
+            except LoxError:
+                has_compile_error = True
+
+            if has_compile_error:
+                continue
+
+            optimizer([stmt])
+
+            try:
+                run_statements([stmt])
+            except LoxError:
+                has_error = True
+
+    except LoxError:
+        # A scanning error ends the stream
+        has_compile_error = True
+
+    finally:
+        # Release the source, which the scanner may still be reading
+        tokens.close()
+
+    if interpreter.jit is not None:
+        print("\n".join(interpreter.jit.report()), file=sys.stderr)
+
+    if has_error or has_compile_error:
+        sys.exit(65)
+
+
+def emit_python(path):
+    with open(path) as file:
+        stmts = Parser(RegexScanner(file.read()).scan_buffer()).parse()
+
+    if stmts is None:
+        sys.exit(65)
+
+    try:
+        Analyzer().analyze(stmts)
+    except LoxError:
+        sys.exit(65)
+
+    passes().run(stmts)
+    print(Transpiler().transpile(stmts), end="")
+
+
 def run_prompt():
     print("Lox Interpreter")
     while True:
@@ -69,23 +275,68 @@ def run_catch_errors(source: str, is_repl: bool = False):
         has_error = True
 
 
-def run(source: str, is_repl: bool = False):
+def passes(is_repl: bool = False) -> PassManager:
+    dump = sys.stderr if dump_passes else None
+    return PassManager(optimization_level, is_repl, engine, dump)
+
 
-    scanner = Scanner(source)
-    parser = Parser(scanner.scan_tokens())
-    stmts = parser.parse()
+def run(source: str, is_repl: bool = False):
+    optimizer = passes(is_repl)
+    stmts = cache.load(source, optimizer.variant) if cache and not is_repl else None
 
     if stmts is None:
-        global has_error
-        has_error = True
-        return
+        scanner = RegexScanner(source)
+        parser = Parser(scanner.scan_buffer())
+        stmts = parser.parse()
+
+        if stmts is None:
+            global has_error
+            has_error = True
+            return
 
-    Analyzer().analyze(stmts)
+        Analyzer().analyze(stmts)
+        optimizer.run(stmts)
+
+        if cache and not is_repl:
+            cache.store(source, stmts, optimizer.variant)
+
+    if engine == "vm":
+        function = Compiler(is_repl).compile(stmts)
+        (global_vm if is_repl else VM()).interpret(function)
+
+    elif engine == "python":
+        source = Transpiler(is_repl).transpile(stmts)
+        execute(source, global_namespace if is_repl else {"__name__": "lox"})
+
+    elif engine == "closure":
+        interpreter = Interpreter(global_environment if is_repl else Environment())
+        ClosureCompiler(interpreter, is_repl).interpret(stmts)
+
+    elif engine == "stack":
+        interpreter = (
+            global_stack_interpreter
+            if is_repl
+            else StackInterpreter(Environment(), max_depth)
+        )
+        interpreter.max_depth = max_depth
+        interpreter.interpret(stmts)
 
-    if is_repl:
-        REPLInterpreter(global_environment).interpret(stmts)
     else:
-        Interpreter(Environment()).interpret(stmts)
+        interpreter = (
+            REPLInterpreter(global_environment)
+            if is_repl
+            else Interpreter(Environment())
+        )
+        if jit_threshold is None:
+            interpreter.interpret(stmts)
+            return
+
+        interpreter.jit = JIT(interpreter, jit_threshold)
+        try:
+            interpreter.interpret(stmts)
+        finally:
+            if not is_repl:
+                print("\n".join(interpreter.jit.report()), file=sys.stderr)
 
 
 if __name__ == "__main__":
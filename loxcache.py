@@ -0,0 +1,183 @@
+# loxcache
+
+"""An on-disk cache of analyzed programs, like __pycache__."""
+
+import gc
+import hashlib
+import json
+import logging
+import os
+import pickle
+from pathlib import Path
+
+import statement as Stmt
+
+DIRECTORY = ".loxcache"
+STATISTICS = "statistics.json"
+SUFFIX = ".ast"
+MAX_SIZE = 64 * 1024 * 1024
+
+# Modules the cached trees depend on: their classes are pickled, the
+# annotations are computed by the Analyzer, and they are optimized, with
+# constants folded by the semantics of the Interpreter.
+FRONT_END = [
+    "tokens.py",
+    "scanner.py",
+    "parser.py",
+    "expression.py",
+    "statement.py",
+    "analyzer.py",
+    "constantfolder.py",
+    "deadcode.py",
+    "inliner.py",
+    "optimizer.py",
+    "interpreter.py",
+    "loxvalue.py",
+]
+
+
+def front_end_version() -> str:
+    digest = hashlib.sha256()
+    for name in FRONT_END:
+        digest.update((Path(__file__).parent / name).read_bytes())
+    digest.update(str(pickle.HIGHEST_PROTOCOL).encode())
+    return digest.hexdigest()[:16]
+
+
+VERSION = front_end_version()
+
+
+def unpickle(data: bytes) -> list[Stmt.Statement]:
+    # Unpickling allocates nothing but the tree, which can't hold cycles
+    # to collect, yet would trigger many collections walking all of it.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(data)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class Cache:
+    def __init__(self, directory: Path, max_size: int = MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.logger = logging.getLogger("Lox.Cache")
+
+    @classmethod
+    def for_file(cls, path: str, max_size: int = MAX_SIZE) -> "Cache":
+        """The cache of the directory a source file is in."""
+        return cls(Path(path).parent / DIRECTORY, max_size)
+
+    @staticmethod
+    def key(source: str, variant: str = "") -> str:
+        key = f"{VERSION}\0{variant}\0{source}"
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def entry(self, key: str) -> Path:
+        return self.directory / f"{key}{SUFFIX}"
+
+    def load(self, source: str, variant: str = "") -> list[Stmt.Statement] | None:
+        """The cached statements of the source for variant, None on a miss."""
+        entry = self.entry(self.key(source, variant))
+        try:
+            with open(entry, "rb") as file:
+                data = file.read()
+            stmts = unpickle(data)
+            # Mark the entry as recently used, for eviction
+            os.utime(entry)
+
+        except FileNotFoundError:
+            self.count("misses")
+            return None
+
+        except (OSError, EOFError, pickle.UnpicklingError, RecursionError) as e:
+            self.logger.warning(f"Ignoring unreadable {entry}: {e}")
+            self.count("misses")
+            return None
+
+        self.count("hits")
+        return stmts
+
+    def store(self, source: str, stmts: list[Stmt.Statement], variant: str = ""):
+        """Cache the statements of the source for variant, evicting old entries."""
+        try:
+            data = pickle.dumps(stmts, pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # Too deeply nested for pickle, leave it uncached
+            return
+
+        try:
+            self.directory.mkdir(exist_ok=True)
+            entry = self.entry(self.key(source, variant))
+            # Written aside then renamed, so concurrent runs never read
+            # half an entry.
+            partial = entry.with_suffix(f".{os.getpid()}.tmp")
+            partial.write_bytes(data)
+            partial.replace(entry)
+            self.evict()
+
+        except OSError as e:
+            self.logger.warning(f"Can't write to {self.directory}: {e}")
+
+    def evict(self):
+        entries = [
+            (stat.st_mtime, stat.st_size, path)
+            for path in self.directory.glob(f"*{SUFFIX}")
+            for stat in [path.stat()]
+        ]
+        size = sum(size for _, size, _ in entries)
+
+        evicted = 0
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+            evicted += 1
+
+        if evicted:
+            self.count("evictions", evicted)
+
+    # Statistics
+    def counters(self) -> dict[str, int]:
+        """The hits, misses and evictions counted so far."""
+        try:
+            counters = json.loads((self.directory / STATISTICS).read_text())
+        except (OSError, ValueError):
+            counters = {}
+
+        return {
+            name: counters.get(name, 0) for name in ("hits", "misses", "evictions")
+        }
+
+    def statistics(self) -> dict[str, int]:
+        entries = list(self.directory.glob(f"*{SUFFIX}"))
+        return {
+            **self.counters(),
+            "entries": len(entries),
+            "size": sum(entry.stat().st_size for entry in entries),
+        }
+
+    def count(self, name: str, increment: int = 1):
+        # Counting is best effort: concurrent runs may lose increments
+        counters = self.counters()
+        counters[name] += increment
+        try:
+            self.directory.mkdir(exist_ok=True)
+            (self.directory / STATISTICS).write_text(json.dumps(counters))
+        except OSError:
+            pass
+
+    def report(self) -> list[str]:
+        statistics = self.statistics()
+        lookups = statistics["hits"] + statistics["misses"]
+        rate = statistics["hits"] / lookups if lookups else 0
+        return [
+            f"Cache {self.directory}: {statistics['hits']} hits, "
+            f"{statistics['misses']} misses ({rate:.0%} hit rate), "
+            f"{statistics['evictions']} evictions",
+            f"  {statistics['entries']} entries, "
+            f"{statistics['size'] / 1024:.0f} of {self.max_size / 1024:.0f} KiB",
+        ]
@@ -6,11 +6,6 @@ if TYPE_CHECKING:
     from interpreter import Interpreter
 
 
-class Return(Exception):
-    def __init__(self, value: object):
-        self.value = value
-
-
 class LoxCallable:
     def arity(self) -> int:
         raise NotImplementedError
@@ -2,7 +2,7 @@
 
 from loxcallable import LoxCallable
 from loxfunction import LoxFunction
-from loxinstance import LoxInstance
+from loxinstance import LoxInstance, Shape
 from tokens import Token
 
 
@@ -15,30 +15,28 @@ class LoxClass(LoxCallable):
     ):
         self.name = name
         self.superclass = superclass
-        self.methods = methods
+        # Classes can't change once declared so inherited methods are
+        # copied in, and finding a method is a single lookup.
+        self.methods = {**superclass.methods, **methods} if superclass else methods
+        # The shape of new instances, which have no fields
+        self.shape = Shape(self)
+        # Resolved once, as every call constructs an instance through them
+        self.initializer = self.methods.get("init")
+        self.initializer_arity = self.initializer.arity() if self.initializer else 0
 
     def __str__(self):
         return f"{self.name.lexeme}"
 
     def arity(self):
-        initializer = self.find_method("init")
-        if initializer:
-            return initializer.arity()
-        return 0
+        return self.initializer_arity
 
     def call(self, interpreter, args):
         instance = LoxInstance(self)
 
-        initializer = self.find_method("init")
-        if initializer:
-            initializer.bind(instance).call(interpreter, args)
+        if self.initializer:
+            # Runs on the instance without binding it
+            self.initializer.call_method(interpreter, instance, args)
         return instance
 
     def find_method(self, name: str) -> LoxFunction | None:
-        if name in self.methods:
-            return self.methods[name]
-
-        if self.superclass:
-            return self.superclass.find_method(name)
-
-        return None
+        return self.methods.get(name)
@@ -3,25 +3,28 @@
 from typing import TYPE_CHECKING
 
 import statement as Stmt
-from environment import Environment
-from loxcallable import LoxCallable, Return
+from environment import Cell, Frame
+from loxcallable import LoxCallable
 from loxinstance import LoxInstance
-from tokens import Token
 
 if TYPE_CHECKING:
-    from interpreter import Interpreter
+    from interpreter import Completion, Interpreter
 
 
 class LoxFunction(LoxCallable):
     def __init__(
         self,
         declaration: Stmt.Function,
-        closure: Environment,
+        upvalues: tuple[Cell, ...] = (),
         is_initializer: bool = False,
+        receiver: LoxInstance | None = None,
     ):
         self.declaration = declaration
-        self.closure = closure
+        # The cells of the variables of enclosing functions it refers to
+        self.upvalues = upvalues
         self.is_initializer = is_initializer
+        # The instance of a bound method
+        self.receiver = receiver
 
     def __str__(self):
         return f"<fn {self.declaration.name.lexeme}>"
@@ -30,21 +33,77 @@ class LoxFunction(LoxCallable):
         return len(self.declaration.params)
 
     def call(self, interpreter: "Interpreter", args: list[object]):
-        env = self.closure.push()
-        env.define_multiple(self.declaration.params, args)
-
-        try:
-            interpreter.execute_block(self.declaration.body, env)
-        except Return as e:
-            if self.is_initializer:
-                return env.get(Token.THIS())
-            return e.value
+        value = self.run(interpreter, self.frame(args, self.receiver))
+        if self.is_initializer:
+            return self.this()
+        return value
 
+    def call_method(
+        self, interpreter: "Interpreter", this: LoxInstance, args: list[object]
+    ):
+        """Like bind(this).call(...) without allocating the bound method."""
+        value = self.run(interpreter, self.frame(args, this))
         if self.is_initializer:
-            return env.get(Token.THIS())
+            return this
+        return value
+
+    def frame(self, args: list[object], this: LoxInstance | None = None) -> Frame:
+        """The frame of a call with the arguments, on this for methods."""
+        declaration = self.declaration
+        frame = Frame(declaration.size, self.upvalues)
+        values = frame.values
+        if this is None:
+            values[: len(args)] = args
+        else:
+            values[0] = this
+            values[1 : len(args) + 1] = args
+
+        for slot in declaration.cells:
+            values[slot] = Cell(values[slot])
+        return frame
+
+    def run(self, interpreter: "Interpreter", frame: Frame) -> object:
+        """Run the body, and the calls it returns in turn, return its value."""
+        completion = self.execute(interpreter, frame)
+        if type(completion) is TailCall:
+            completion = completion.complete(interpreter)
+        return None if completion is None else completion[0]
+
+    def execute(self, interpreter: "Interpreter", frame: Frame) -> "Completion":
+        if interpreter.jit:
+            body = interpreter.jit.body(self.declaration)
+            if body:
+                return body(frame)
+
+        return interpreter.execute_block(self.declaration.body, frame)
+
+    def tail_call(
+        self, args: list[object], this: LoxInstance | None = None
+    ) -> "TailCall":
+        if this is None:
+            this = self.receiver
+        return TailCall(self, self.frame(args, this))
 
     def bind(self, instance: LoxInstance) -> "LoxFunction":
-        env = self.closure.push()
-        env.define(Token.THIS(), instance)
+        return LoxFunction(
+            self.declaration, self.upvalues, self.is_initializer, instance
+        )
+
+    def this(self) -> object:
+        return self.receiver
+
+
+class TailCall:
+    """The call a 'return' leaves to the caller, made once its frame is gone."""
+
+    __slots__ = ("function", "frame")
+
+    def __init__(self, function: LoxFunction, frame: Frame):
+        self.function = function
+        self.frame = frame
 
-        return LoxFunction(self.declaration, env, self.is_initializer)
+    def complete(self, interpreter: "Interpreter") -> "Completion":
+        completion: "Completion" = self
+        while type(completion) is TailCall:
+            completion = completion.function.execute(interpreter, completion.frame)
+        return completion
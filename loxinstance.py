@@ -9,17 +9,43 @@ if TYPE_CHECKING:
     from loxclass import LoxClass
 
 
+class Shape:
+    """The slots of the fields of instances, shared by those adding the same
+    fields in the same order."""
+
+    __slots__ = ("klass", "slots", "transitions")
+
+    def __init__(self, klass: "LoxClass", slots: dict[str, int] | None = None):
+        self.klass = klass
+        self.slots: dict[str, int] = slots if slots is not None else {}
+        # The shapes reached by adding a field
+        self.transitions: dict[str, Shape] = {}
+
+    def add(self, name: str) -> "Shape":
+        """The shape with a field added."""
+        shape = self.transitions.get(name)
+        if shape is None:
+            shape = Shape(self.klass, {**self.slots, name: len(self.slots)})
+            self.transitions[name] = shape
+        return shape
+
+
 class LoxInstance:
+    __slots__ = ("klass", "shape", "values")
+
     def __init__(self, klass: "LoxClass"):
         self.klass = klass
-        self.fields: dict[str, object] = {}
+        self.shape: Shape = klass.shape
+        # The values of the fields, by the slots of the shape
+        self.values: list[object] = []
 
     def __str__(self):
         return f"{str(self.klass)} instance"
 
     def get(self, name: Token) -> object:
-        if name.lexeme in self.fields:
-            return self.fields[name.lexeme]
+        slot = self.shape.slots.get(name.lexeme)
+        if slot is not None:
+            return self.values[slot]
 
         method = self.klass.find_method(name.lexeme)
         if method:
@@ -28,4 +54,9 @@ class LoxInstance:
         raise LoxRuntimeError(name, f"Undefined property '{name.lexeme}'")
 
     def set(self, name: Token, value: object):
-        self.fields[name.lexeme] = value
+        slot = self.shape.slots.get(name.lexeme)
+        if slot is not None:
+            self.values[slot] = value
+        else:
+            self.shape = self.shape.add(name.lexeme)
+            self.values.append(value)
@@ -0,0 +1,29 @@
+# loxvalue
+
+import math
+
+
+def is_truthy(value: object) -> bool:
+    return not (value is None or value is False)
+
+
+def is_equal(left: object, right: object) -> bool:
+    if type(left) is bool or type(right) is bool:
+        return left is right
+
+    if left == math.inf or right == math.inf:
+        return False
+
+    return left == right
+
+
+def stringify(value: object) -> str:
+    if value is None:
+        return "nil"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if type(value) is float:
+        return f"{value:g}"
+    return str(value)
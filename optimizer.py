@@ -0,0 +1,62 @@
+# optimizer
+
+from dataclasses import dataclass
+from typing import Callable, TextIO
+
+import statement as Stmt
+from constantfolder import ConstantFolder
+from deadcode import DeadCodeEliminator
+from formatter import Formatter
+from inliner import Inliner
+
+LEVELS = [0, 1, 2]
+DEFAULT_LEVEL = 1
+
+
+@dataclass
+class Pass:
+    name: str
+    # Run the pass over the statements, in place
+    run: Callable[[list[Stmt.Statement]], object]
+
+
+class PassManager:
+    """The optimization passes run over analyzed statements, by level."""
+
+    def __init__(
+        self,
+        level: int = DEFAULT_LEVEL,
+        is_repl: bool = False,
+        engine: str = "tree",
+        dump: TextIO | None = None,
+    ):
+        self.level = level
+        self.is_repl = is_repl
+        self.engine = engine
+        self.dump = dump
+        self.passes: list[Pass] = []
+        # What the optimized statements depend on, besides the source
+        self.variant = f"O{level}-vm" if engine == "vm" else f"O{level}"
+
+        if level >= 1:
+            self.add("fold", lambda stmts: ConstantFolder(is_repl).fold(stmts))
+        if level >= 2 and engine != "vm":
+            self.add("inline", lambda stmts: Inliner(is_repl).inline(stmts))
+            self.add("fold", lambda stmts: ConstantFolder(is_repl).fold(stmts))
+        if level >= 1 and engine != "vm":
+            self.add(
+                "dead-code",
+                lambda stmts: DeadCodeEliminator(is_repl).eliminate(stmts),
+            )
+
+    def add(self, name: str, run: Callable[[list[Stmt.Statement]], object]):
+        self.passes.append(Pass(name, run))
+
+    def run(self, statements: list[Stmt.Statement]) -> list[Stmt.Statement]:
+        for optimization in self.passes:
+            optimization.run(statements)
+            if self.dump is not None:
+                print(f"-- after {optimization.name}", file=self.dump)
+                print(Formatter(analyzed=True).format(statements), file=self.dump)
+
+        return statements
@@ -1,11 +1,12 @@
 # parser.py
 
 import logging
-from typing import Optional
+from typing import Iterator, Optional
 
 import expression as Expr
 import statement as Stmt
 from errors import LoxError
+from tokenbuffer import TokenBuffer, TokenStream
 from tokens import Token
 
 
@@ -27,8 +28,13 @@ class Parser:
     """Parse a list of AST Tokens and returns a corresponding
     list of Statements"""
 
-    def __init__(self, tokens: list[Token]):
-        self.tokens = tokens
+    def __init__(self, tokens: list[Token] | TokenBuffer | TokenStream):
+        if isinstance(tokens, (TokenBuffer, TokenStream)):
+            self.kinds = tokens.kinds
+            self.token = tokens.token
+        else:
+            self.kinds = [token.type for token in tokens]
+            self.token = tokens.__getitem__
         self.current = 0
         self.has_error = False
         self.logger = logging.getLogger("Lox.Parser")
@@ -45,6 +51,11 @@ class Parser:
 
         return statements
 
+    def declarations(self) -> Iterator[Stmt.Statement | None]:
+        """Parse top-level declarations one at a time, None for those with errors."""
+        while not self.is_at_end():
+            yield self.declaration()
+
     def expression(self) -> Expr.Expression:
         return self.assignment()
 
@@ -53,10 +64,10 @@ class Parser:
         self.advance()
 
         while not self.is_at_end():
-            if self.previous().type == Token.Type.SEMICOLON:
+            if self.kinds[self.current - 1] == Token.Type.SEMICOLON:
                 return
 
-            if self.peek().type in [
+            if self.kinds[self.current] in [
                 Token.Type.CLASS,
                 Token.Type.FOR,
                 Token.Type.FUN,
@@ -70,24 +81,32 @@ class Parser:
             self.advance()
 
     # Look for specific token types
+    def check(self, token: Token.Type) -> bool:
+        return self.kinds[self.current] == token
+
     def match(self, token: Token.Type) -> bool:
-        if self.peek().type == token:
+        if self.kinds[self.current] == token:
             self.advance()
             return True
 
         return False
 
     def match_any(self, tokens: list[Token.Type]):
-        if self.peek().type in tokens:
+        if self.kinds[self.current] in tokens:
             self.advance()
             return True
 
         return False
 
-    def expect(self, token: Token.Type, message: str):
-        if self.peek().type == token:
+    def expect(self, token: Token.Type, message: str) -> Token:
+        self.consume(token, message)
+        return self.previous()
+
+    def consume(self, token: Token.Type, message: str):
+        """Like expect, without materialising the Token."""
+        if self.kinds[self.current] == token:
             self.advance()
-            return self.previous()
+            return
 
         raise ParseError(self.peek(), message)
 
@@ -97,13 +116,13 @@ class Parser:
             self.current += 1
 
     def previous(self) -> Token:
-        return self.tokens[self.current - 1]
+        return self.token(self.current - 1)
 
     def peek(self) -> Token:
-        return self.tokens[self.current]
+        return self.token(self.current)
 
     def is_at_end(self) -> bool:
-        return self.peek().type == Token.Type.EOF
+        return self.kinds[self.current] == Token.Type.EOF
 
     # Parse Expressions
     def assignment(self) -> Expr.Expression:
@@ -218,7 +237,7 @@ class Parser:
 
     def read_call(self, callee: Expr.Expression) -> Expr.Call:
         args = []
-        if not self.peek().type == Token.Type.RIGHT_PAREN:
+        if not self.check(Token.Type.RIGHT_PAREN):
             while True:
                 if len(args) > 254:
                     raise ParseError(self.peek(), "Can't have more than 255 arguments")
@@ -232,20 +251,21 @@ class Parser:
 
     def primary(self) -> Expr.Expression:
         if self.match(Token.Type.FALSE):
-            return Expr.Literal(False)
+            return Expr.Literal(False, self.previous())
 
         if self.match(Token.Type.TRUE):
-            return Expr.Literal(True)
+            return Expr.Literal(True, self.previous())
 
         if self.match(Token.Type.NIL):
-            return Expr.Literal(None)
+            return Expr.Literal(None, self.previous())
 
         if self.match_any([Token.Type.NUMBER, Token.Type.STRING]):
-            return Expr.Literal(self.previous().literal)
+            token = self.previous()
+            return Expr.Literal(token.literal, token)
 
         if self.match(Token.Type.LEFT_PAREN):
             expr = self.expression()
-            self.expect(Token.Type.RIGHT_PAREN, "Expect ')' after expression")
+            self.consume(Token.Type.RIGHT_PAREN, "Expect ')' after expression")
             return Expr.Grouping(expr)
 
         if self.match(Token.Type.THIS):
@@ -256,7 +276,7 @@ class Parser:
 
         if self.match(Token.Type.SUPER):
             keyword = self.previous()
-            self.expect(Token.Type.DOT, "Expect '.' after 'super'")
+            self.consume(Token.Type.DOT, "Expect '.' after 'super'")
             method = self.expect(Token.Type.IDENTIFIER, "Expect superclass method name")
 
             return Expr.Super(keyword, method)
@@ -304,27 +324,27 @@ class Parser:
         name = self.expect(Token.Type.IDENTIFIER, "Expect class name")
 
         superclass = None
-        if self.peek().type == Token.Type.LESS:
+        if self.check(Token.Type.LESS):
             self.advance()
-            self.expect(Token.Type.IDENTIFIER, "Expect superclass name")
+            self.consume(Token.Type.IDENTIFIER, "Expect superclass name")
             superclass = Expr.Variable(self.previous())
 
-        self.expect(Token.Type.LEFT_BRACE, "Expect '{' before class body")
+        self.consume(Token.Type.LEFT_BRACE, "Expect '{' before class body")
 
         methods = []
-        while not self.peek().type == Token.Type.RIGHT_BRACE and not self.is_at_end():
+        while not self.check(Token.Type.RIGHT_BRACE) and not self.is_at_end():
             methods.append(self.fun_decl("method"))
 
-        self.expect(Token.Type.RIGHT_BRACE, "Expect '}' after class body")
+        self.consume(Token.Type.RIGHT_BRACE, "Expect '}' after class body")
 
         return Stmt.Class(name, superclass, methods)
 
     def fun_decl(self, kind: str):
         name = self.expect(Token.Type.IDENTIFIER, f"Expect {kind} name")
-        self.expect(Token.Type.LEFT_PAREN, "Expect '(' after function name")
+        self.consume(Token.Type.LEFT_PAREN, "Expect '(' after function name")
 
         params = []
-        if not self.peek().type == Token.Type.RIGHT_PAREN:
+        if not self.check(Token.Type.RIGHT_PAREN):
             while True:
                 if len(params) > 254:
                     raise ParseError(self.peek(), "Can't have more than 255 parameters")
@@ -333,8 +353,8 @@ class Parser:
                 )
                 if not self.match(Token.Type.COMMA):
                     break
-        self.expect(Token.Type.RIGHT_PAREN, "Expect ')' after arguments")
-        self.expect(Token.Type.LEFT_BRACE, f"Expect '{{' before {kind} body")
+        self.consume(Token.Type.RIGHT_PAREN, "Expect ')' after arguments")
+        self.consume(Token.Type.LEFT_BRACE, f"Expect '{{' before {kind} body")
         body = self.block()
 
         return Stmt.Function(name, params, body)
@@ -346,11 +366,11 @@ class Parser:
         if self.match(Token.Type.EQUAL):
             initializer = self.expression()
 
-        self.expect(Token.Type.SEMICOLON, "Expect ';' after variable declaration")
+        self.consume(Token.Type.SEMICOLON, "Expect ';' after variable declaration")
         return Stmt.Var(name, initializer)
 
     def for_stmt(self) -> Stmt.Statement:
-        self.expect(Token.Type.LEFT_PAREN, "Expect '(' after for")
+        self.consume(Token.Type.LEFT_PAREN, "Expect '(' after for")
 
         initializer = None
         if self.match(Token.Type.SEMICOLON):
@@ -362,14 +382,14 @@ class Parser:
         # Statement eats the next ';'
 
         cond = None
-        if not self.peek().type == Token.Type.SEMICOLON:
+        if not self.check(Token.Type.SEMICOLON):
             cond = self.expression()
-        self.expect(Token.Type.SEMICOLON, "Expect ';' after condition")
+        self.consume(Token.Type.SEMICOLON, "Expect ';' after condition")
 
         inc = None
-        if not self.peek().type == Token.Type.RIGHT_PAREN:
+        if not self.check(Token.Type.RIGHT_PAREN):
             inc = self.expression()
-        self.expect(Token.Type.RIGHT_PAREN, "Expect ')' after for clauses")
+        self.consume(Token.Type.RIGHT_PAREN, "Expect ')' after for clauses")
 
         # Build the while-loop
         loop = Stmt.While(
@@ -379,6 +399,7 @@ class Parser:
                 if inc is None
                 else Stmt.Block([self.statement(), Stmt.Expression(inc)])
             ),
+            self.previous(),
         )
 
         if initializer is None:
@@ -387,9 +408,9 @@ class Parser:
         return Stmt.Block([initializer, loop])
 
     def if_stmt(self) -> Stmt.If:
-        self.expect(Token.Type.LEFT_PAREN, "Expect '(' after if")
+        self.consume(Token.Type.LEFT_PAREN, "Expect '(' after if")
         condition = self.expression()
-        self.expect(Token.Type.RIGHT_PAREN, "Expect ')' after condition")
+        self.consume(Token.Type.RIGHT_PAREN, "Expect ')' after condition")
 
         consequence = self.statement()
         alternative = None
@@ -400,41 +421,41 @@ class Parser:
 
     def print_stmt(self) -> Stmt.Print:
         expr = self.expression()
-        self.expect(Token.Type.SEMICOLON, "Expect ';' after value")
+        self.consume(Token.Type.SEMICOLON, "Expect ';' after value")
         return Stmt.Print(expr)
 
     def while_stmt(self) -> Stmt.While:
-        self.expect(Token.Type.LEFT_PAREN, "Expect '(' after while")
+        self.consume(Token.Type.LEFT_PAREN, "Expect '(' after while")
         cond = self.expression()
-        self.expect(Token.Type.RIGHT_PAREN, "Expect ')' after condition")
+        self.consume(Token.Type.RIGHT_PAREN, "Expect ')' after condition")
 
         body = self.declaration()
         assert body is not None
 
-        return Stmt.While(cond, body)
+        return Stmt.While(cond, body, self.previous())
 
     def block(self) -> list[Stmt.Statement]:
         stmts = []
 
-        while not self.peek().type == Token.Type.RIGHT_BRACE and not self.is_at_end():
+        while not self.check(Token.Type.RIGHT_BRACE) and not self.is_at_end():
             stmts.append(self.declaration())
 
-        self.expect(Token.Type.RIGHT_BRACE, "Expect '}' after block")
+        self.consume(Token.Type.RIGHT_BRACE, "Expect '}' after block")
 
         return stmts
 
     def expression_stmt(self) -> Stmt.Expression:
         expr = self.expression()
-        self.expect(Token.Type.SEMICOLON, "Expect ';' after expression")
+        self.consume(Token.Type.SEMICOLON, "Expect ';' after expression")
         return Stmt.Expression(expr)
 
     def return_stmt(self) -> Stmt.Return:
         token = self.previous()
         value = None
 
-        if self.peek().type != Token.Type.SEMICOLON:
+        if not self.check(Token.Type.SEMICOLON):
             value = self.expression()
 
-        self.expect(Token.Type.SEMICOLON, "Expect ';' after return value")
+        self.consume(Token.Type.SEMICOLON, "Expect ';' after return value")
 
         return Stmt.Return(token, value)
@@ -0,0 +1,257 @@
+# pyruntime
+
+"""Runtime support for the Python code generated by the Transpiler."""
+
+import itertools
+import linecache
+import logging
+import math
+import sys
+from types import FunctionType
+
+import loxvalue
+from errors import LoxError, LoxRuntimeError
+from interpreter import Clock, InterpreterError
+from loxcallable import LoxCallable
+from loxvalue import is_equal
+from tokens import Token
+
+__all__ = [
+    "ADDABLE",
+    "INF",
+    "BoundMethod",
+    "Class",
+    "FunctionType",
+    "Instance",
+    "bind_super",
+    "call",
+    "check_superclass",
+    "defined",
+    "fail",
+    "g_clock",
+    "get_property",
+    "is_equal",
+    "main",
+    "run",
+    "set_field",
+    "store",
+    "stringify",
+]
+
+INF = math.inf
+ADDABLE = (float, str)
+
+# Generated code refers to Lox globals with a "g_" prefix
+g_clock = Clock()
+
+
+class Class:
+    __slots__ = ("name", "methods", "initializer")
+
+    def __init__(
+        self, name: str, superclass: "Class | None", methods: dict[str, FunctionType]
+    ):
+        self.name = name
+        self.methods = {**superclass.methods, **methods} if superclass else methods
+        self.initializer = self.methods.get("init")
+
+    def __str__(self):
+        return self.name
+
+
+class Instance:
+    __slots__ = ("klass", "fields")
+
+    def __init__(self, klass: Class):
+        self.klass = klass
+        self.fields: dict[str, object] = {}
+
+    def __str__(self):
+        return f"{self.klass.name} instance"
+
+
+class BoundMethod:
+    __slots__ = ("function", "this")
+
+    def __init__(self, function: FunctionType, this: Instance):
+        self.function = function
+        self.this = this
+
+
+def lox_name(function: FunctionType) -> str:
+    # Generated functions are named "g_name" or "l<n>_name"
+    return function.__name__.partition("_")[2]
+
+
+def stringify(value: object) -> str:
+    if type(value) is FunctionType:
+        return f"<fn {lox_name(value)}>"
+    if type(value) is BoundMethod:
+        return f"<fn {lox_name(value.function)}>"
+    return loxvalue.stringify(value)
+
+
+# Errors. Lines are 1-based, as in the messages.
+def fail(line: int, message: str):
+    raise LoxRuntimeError(Token(Token.Type.EOF, line=line - 1), message)
+
+
+def call_error(line: int, message: str):
+    raise InterpreterError(Token(Token.Type.EOF, line=line - 1), message)
+
+
+# Calls
+def arity(callee: object) -> int | None:
+    if type(callee) is FunctionType:
+        return callee.__code__.co_argcount
+    if type(callee) is BoundMethod:
+        return callee.function.__code__.co_argcount - 1
+    if type(callee) is Class:
+        if callee.initializer:
+            return callee.initializer.__code__.co_argcount - 1
+        return 0
+    if isinstance(callee, LoxCallable):
+        return callee.arity()
+    return None
+
+
+def call(callee: object, args: tuple, line: int) -> object:
+    """Call anything but a Lox function, which the generated code calls directly."""
+    expected = arity(callee)
+    if expected is None:
+        call_error(line, "Can only call functions and classes")
+
+    if len(args) != expected:
+        call_error(line, f"Expected {expected} arguments but got {len(args)}")
+
+    if type(callee) is FunctionType:
+        return callee(*args)
+
+    if type(callee) is BoundMethod:
+        return callee.function(callee.this, *args)
+
+    if type(callee) is Class:
+        instance = Instance(callee)
+        if callee.initializer:
+            callee.initializer(instance, *args)
+        return instance
+
+    assert isinstance(callee, LoxCallable)
+    return callee.call(None, list(args))
+
+
+# Properties
+def get_property(obj: object, name: str, line: int) -> object:
+    if type(obj) is not Instance:
+        fail(line, "Only instances have properties")
+
+    if name in obj.fields:
+        return obj.fields[name]
+
+    method = obj.klass.methods.get(name)
+    if method is None:
+        fail(line, f"Undefined property '{name}'")
+
+    return BoundMethod(method, obj)
+
+
+def set_field(instance: Instance, name: str, value: object) -> object:
+    instance.fields[name] = value
+    return value
+
+
+def check_superclass(superclass: object, line: int) -> Class:
+    if type(superclass) is not Class:
+        call_error(line, "Superclass must be a class")
+    return superclass
+
+
+def bind_super(superclass: Class, this: Instance, name: str, line: int) -> object:
+    method = superclass.methods.get(name)
+    if method is None:
+        call_error(line, f"Undefined property '{name}'")
+    return BoundMethod(method, this)
+
+
+# Variables
+def store(box: list, value: object) -> object:
+    box[0] = value
+    return value
+
+
+def defined(namespace: dict, name: str, value: object, line: int) -> object:
+    if name not in namespace:
+        fail(line, f"Undefined variable '{name[2:]}'")
+    return value
+
+
+def undefined_variable(error: NameError) -> LoxRuntimeError | None:
+    """Translate reading an undefined global into a Lox runtime error, with
+    the line from the "# a@3" comment ending the generated line."""
+    if not error.name or not error.name.startswith("g_"):
+        return None
+    name = error.name[2:]
+
+    tb = error.__traceback__
+    while tb and tb.tb_next:
+        tb = tb.tb_next
+
+    line = 0
+    if tb:
+        text = linecache.getline(tb.tb_frame.f_code.co_filename, tb.tb_lineno)
+        for read in text.rpartition("  # ")[2].split():
+            read_name, _, read_line = read.partition("@")
+            if read_name == name:
+                line = int(read_line)
+                break
+
+    return LoxRuntimeError(
+        Token(Token.Type.EOF, line=line - 1), f"Undefined variable '{name}'"
+    )
+
+
+# Running
+def run(statements: list[FunctionType]):
+    """Run the top-level statements, reporting errors like the Interpreter."""
+    logger = logging.getLogger("Lox.Python")
+
+    has_error = False
+    for statement in statements:
+        try:
+            statement()
+
+        except NameError as e:
+            error = undefined_variable(e)
+            if error is None:
+                raise
+            logger.error(error)
+            has_error = True
+
+        except LoxError as e:
+            logger.error(e)
+            has_error = True
+
+    if has_error:
+        raise LoxError()
+
+
+counter = itertools.count(1)
+
+
+def execute(source: str, namespace: dict):
+    # Register the source so tracebacks, and undefined_variable, can
+    # read its lines.
+    filename = f"<lox-{next(counter)}>"
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+
+    exec(compile(source, filename, "exec"), namespace)
+    run(namespace["STATEMENTS"])
+
+
+def main(statements: list[FunctionType]):
+    """Entry point of a generated program run as a script."""
+    logging.basicConfig(format="%(name)s %(levelname)s: %(message)s")
+    try:
+        run(statements)
+    except LoxError:
+        sys.exit(70)
@@ -1,8 +1,11 @@
 # scanner
 
 import logging
+import re
+from typing import Iterator
 
 from errors import LoxError
+from tokenbuffer import TokenBuffer
 from tokens import Token
 
 
@@ -42,10 +45,13 @@ class Scanner:
         self.start = 0  # Index of the first char in the current lexeme.
         self.current = 0  # Index of the char being scanned.
         self.line = 0
-        self.tokens = []
+        self.buffer = TokenBuffer(source)
         self.logger = logging.getLogger("Lox.Scanner")
 
-    def scan_tokens(self):
+    def scan_tokens(self) -> list[Token]:
+        return self.scan_buffer().tokens()
+
+    def scan_buffer(self) -> TokenBuffer:
         try:
             while not self.is_at_end():
                 self.start = self.current
@@ -56,9 +62,9 @@ class Scanner:
             raise e
 
         # End of file
-        self.tokens.append(Token(Token.Type.EOF, "", None, self.line))
+        self.buffer.append(Token.Type.EOF, self.current, self.current, self.line)
 
-        return self.tokens
+        return self.buffer
 
     def scan_token(self):
         c = self.advance()
@@ -158,8 +164,7 @@ class Scanner:
 
         self.advance()  # Consume closing quote
 
-        str = self.source[self.start + 1 : self.current - 1]
-        self.add_token(Token.Type.STRING, str)
+        self.add_token(Token.Type.STRING)
 
     def add_number(self):
         while self.peek().isdigit():
@@ -171,7 +176,7 @@ class Scanner:
             while self.peek().isdigit():
                 self.advance()
 
-        self.add_token(Token.Type.NUMBER, float(self.source[self.start : self.current]))
+        self.add_token(Token.Type.NUMBER)
 
     def add_identifier(self):
         while self.peek().isalnum() or self.peek() == "_":
@@ -184,9 +189,9 @@ class Scanner:
         else:
             self.add_token(self.keywords[str])
 
-    def add_token(self, type: Token.Type, literal=None):
-        lexeme = self.source[self.start : self.current]
-        self.tokens.append(Token(type, lexeme, literal, self.line))
+    def add_token(self, type: Token.Type):
+        # Literals are read from the lexeme when the token is materialised
+        self.buffer.append(type, self.start, self.current, self.line)
 
     def is_at_end(self) -> bool:
         return self.current >= len(self.source)
@@ -217,3 +222,169 @@ class Scanner:
         return (
             self.source[self.current + 1] if self.current + 1 < len(self.source) else ""
         )
+
+
+class RegexScanner(Scanner):
+    """A Scanner matching whole ASCII tokens with a single compiled regex."""
+
+    # Every match skips the whitespace before a token. Any other character
+    # matches the last group, so no character is skipped silently.
+    pattern = re.compile(
+        r"""
+        [ \t\r]*
+        (?:
+          ([A-Za-z_][A-Za-z0-9_]*          # 1 word: keyword, identifier
+          |[!=<>]=?|[(){},.\-+;*/](?!/))   #   or operator
+        | (\n)                            # 2 newline
+        | ([0-9]+(?:\.[0-9]+)?)             # 3 number
+        | (//[^\n]*)                       # 4 comment
+        | ("[^"]*")                        # 5 string
+        | (.)                              # 6 anything else
+        )
+        """,
+        re.VERBOSE | re.DOTALL,
+    )
+
+    # The types of the words that aren't identifiers
+    words = {
+        "(": Token.Type.LEFT_PAREN,
+        ")": Token.Type.RIGHT_PAREN,
+        "{": Token.Type.LEFT_BRACE,
+        "}": Token.Type.RIGHT_BRACE,
+        ",": Token.Type.COMMA,
+        ".": Token.Type.DOT,
+        "-": Token.Type.MINUS,
+        "+": Token.Type.PLUS,
+        ";": Token.Type.SEMICOLON,
+        "*": Token.Type.STAR,
+        "/": Token.Type.SLASH,
+        "!": Token.Type.BANG,
+        "!=": Token.Type.BANG_EQUAL,
+        "=": Token.Type.EQUAL,
+        "==": Token.Type.EQUAL_EQUAL,
+        "<": Token.Type.LESS,
+        "<=": Token.Type.LESS_EQUAL,
+        ">": Token.Type.GREATER,
+        ">=": Token.Type.GREATER_EQUAL,
+        **Scanner.keywords,
+    }
+
+    def scan_buffer(self) -> TokenBuffer:
+        source = self.source
+        kinds = self.buffer.kinds.append
+        starts = self.buffer.starts.append
+        ends = self.buffer.ends.append
+        lines = self.buffer.lines.append
+        words = self.words
+        IDENTIFIER = Token.Type.IDENTIFIER
+        NUMBER = Token.Type.NUMBER
+        # Identifiers and numbers go on with non-ASCII letters and digits,
+        # which only scan_token knows about.
+        is_ascii = source.isascii()
+
+        position = 0
+        line = 0
+        try:
+            while position < len(source):
+                for m in self.pattern.finditer(source, position):
+                    group = m.lastindex
+                    start, end = m.span(group)
+
+                    if group == 6 or (
+                        group != 2
+                        and not is_ascii
+                        and not source[end : end + 2].isascii()
+                    ):
+                        self.start = self.current = start
+                        self.line = line
+                        self.scan_token()
+                        position, line = self.current, self.line
+                        break
+
+                    if group == 1:
+                        kinds(words.get(m.group(1), IDENTIFIER))
+                    elif group == 2:
+                        line += 1
+                        continue
+                    elif group == 3:
+                        kinds(NUMBER)
+                    elif group == 4:
+                        continue
+                    else:
+                        line += source.count("\n", start, end)
+                        kinds(Token.Type.STRING)
+                    starts(start)
+                    ends(end)
+                    lines(line)
+                else:
+                    position = len(source)
+
+        except ScannerError as e:
+            self.logger.error(e)
+            raise e
+
+        self.current, self.line = position, line
+        self.buffer.append(Token.Type.EOF, position, position, line)
+
+        return self.buffer
+
+
+def stream_tokens(source: bytes) -> Iterator[Token]:
+    """Scan UTF-8 bytes, such as a memory-mapped file, yielding Tokens."""
+    logger = logging.getLogger("Lox.Scanner")
+    pattern = re.compile(
+        RegexScanner.pattern.pattern.encode(), re.VERBOSE | re.DOTALL
+    )
+    words = {word.encode(): type for word, type in RegexScanner.words.items()}
+
+    position = 0
+    line = 0
+    try:
+        while position < len(source):
+            for m in pattern.finditer(source, position):
+                group = m.lastindex
+                start, end = m.span(group)
+
+                if group == 6 and source[start] == ord('"'):
+                    # Scanning an unterminated string runs to the end
+                    line += source[start:].count(b"\n")
+                    raise ScannerError(line, "EOF", "Unterminated string")
+
+                if group == 6 or (
+                    (group == 1 or group == 3)
+                    and not source[end : end + 2].isascii()
+                ):
+                    # Non-ASCII tokens and unexpected characters never span
+                    # lines, so the rest of the line is enough to scan them.
+                    line_end = source.find(b"\n", start)
+                    rest = source[start : line_end if line_end >= 0 else None]
+                    scanner = Scanner(rest.decode())
+                    scanner.line = line
+                    scanner.scan_token()
+                    yield from scanner.buffer.tokens()
+                    position = start + len(rest.decode()[: scanner.current].encode())
+                    break
+
+                if group == 2:
+                    line += 1
+                    continue
+                if group == 4:
+                    continue
+
+                lexeme = m.group(group).decode()
+                if group == 1:
+                    type = words.get(m.group(1), Token.Type.IDENTIFIER)
+                    yield Token(type, lexeme, None, line)
+                elif group == 3:
+                    yield Token(Token.Type.NUMBER, lexeme, float(lexeme), line)
+                else:
+                    line += lexeme.count("\n")
+                    yield Token(Token.Type.STRING, lexeme, lexeme[1:-1], line)
+            else:
+                position = len(source)
+
+    except ScannerError as e:
+        logger.error(e)
+        raise e
+
+    yield Token(Token.Type.EOF, "", None, line)
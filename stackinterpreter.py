@@ -0,0 +1,338 @@
+# stackinterpreter
+
+from typing import Callable, Generator
+
+import expression as Expr
+import statement as Stmt
+from environment import Environment, Frame
+from errors import LoxError, LoxRuntimeError
+from interpreter import BINARY_OPERATORS, Completion, Interpreter, InterpreterError
+from loxcallable import LoxCallable
+from loxclass import LoxClass
+from loxfunction import LoxFunction, TailCall
+from loxinstance import LoxInstance
+from loxvalue import is_truthy, stringify
+from tokens import Token
+
+# Calls in progress past which a call fails with a stack overflow
+DEFAULT_MAX_DEPTH = 200_000
+
+# The code of a call in progress. It yields the routine of each call it
+# makes, is sent back the value the call returned, and returns with its
+# own value.
+Routine = Generator["Routine", object, object]
+
+
+class StackInterpreter(Interpreter):
+    """An Interpreter keeping the calls in progress on a stack of its own,
+    so the depth of Lox recursion isn't bound by the Python stack."""
+
+    def __init__(
+        self,
+        environment: Environment | None = None,
+        max_depth: int = DEFAULT_MAX_DEPTH,
+        is_repl: bool = False,
+    ):
+        super().__init__(environment)
+        self.max_depth = max_depth
+        self.is_repl = is_repl
+        # The routines of the calls in progress, innermost last
+        self.stack: list[Routine] = []
+
+    def interpret(self, statements: list[Stmt.Statement]):
+        has_error = False
+        for stmt in statements:
+            try:
+                if self.is_repl and isinstance(stmt, Stmt.Expression):
+                    print(stringify(self.run(self.resume(stmt.expression))))
+                else:
+                    self.run(self.resume_statement(stmt))
+
+            except LoxError as e:
+                self.logger.error(e)
+                has_error = True
+
+        if has_error:
+            raise LoxError()
+
+    def run(self, routine: Routine) -> object:
+        """Drive the routine and those of the calls it makes, return its value."""
+        stack = self.stack
+        frame = self.frame
+        stack.append(routine)
+        value = None
+        try:
+            while True:
+                try:
+                    callee = stack[-1].send(value)
+                except StopIteration as e:
+                    stack.pop()
+                    if not stack:
+                        return e.value
+                    value = e.value
+                else:
+                    stack.append(callee)
+                    value = None
+        finally:
+            # Only left early by errors, which end the whole statement
+            stack.clear()
+            self.frame = frame
+
+    # Routines of expressions
+    def resume(self, expression: Expr.Expression) -> Routine:
+        routine = ROUTINES.get(type(expression))
+        if routine is None or not expression.calls:
+            return self.evaluate(expression)
+        return (yield from routine(self, expression))
+
+    def resume_grouping(self, expression: Expr.Grouping) -> Routine:
+        return (yield from self.resume(expression.expression))
+
+    def resume_unary(self, expression: Expr.Unary) -> Routine:
+        rv = yield from self.resume(expression.right)
+        if expression.operator.type == Token.Type.BANG:
+            return not is_truthy(rv)
+
+        self.check_number_operand(expression.operator, rv)
+        return -rv
+
+    def resume_binary(self, expression: Expr.Binary) -> Routine:
+        lv = yield from self.resume(expression.left)
+        rv = yield from self.resume(expression.right)
+        return BINARY_OPERATORS[expression.operator.type](
+            self, expression.operator, lv, rv
+        )
+
+    def resume_assignment(self, expression: Expr.Assignment) -> Routine:
+        val = yield from self.resume(expression.value)
+        self.assign(expression, val)
+        return val
+
+    def resume_logical(self, expression: Expr.Logical) -> Routine:
+        lv = yield from self.resume(expression.left)
+        if expression.operator.type == Token.Type.OR:
+            if is_truthy(lv):
+                return lv
+        elif not is_truthy(lv):
+            return lv
+        return (yield from self.resume(expression.right))
+
+    def resume_get(self, expression: Expr.Get) -> Routine:
+        obj = yield from self.resume(expression.target)
+        return self.get_property(expression, obj)
+
+    def resume_set(self, expression: Expr.Set) -> Routine:
+        obj = yield from self.resume(expression.target)
+
+        if isinstance(obj, LoxInstance):
+            v = yield from self.resume(expression.value)
+            self.field_cache(expression).set(obj, v)
+            return v
+        raise LoxRuntimeError(expression.name, "Only instances have fields")
+
+    def resume_call(self, expression: Expr.Call) -> Routine:
+        callee = expression.callee
+        if type(callee) is Expr.Get:
+            obj = yield from self.resume(callee.target)
+            if isinstance(obj, LoxInstance):
+                method = self.property_cache(callee).method_of(obj)
+                if method is not None:
+                    argv = yield from self.resume_arguments(expression, method)
+                    return (yield self.invoke(expression.paren, method, argv, obj))
+            cv = self.get_property(callee, obj)
+
+        elif type(callee) is Expr.Super:
+            method, obj = self.find_super_method(callee)
+            argv = yield from self.resume_arguments(expression, method)
+            return (yield self.invoke(expression.paren, method, argv, obj))
+
+        else:
+            cv = yield from self.resume(callee)
+
+        if not isinstance(cv, LoxCallable):
+            # Arguments are still evaluated first
+            yield from self.resume_arguments(expression, None)
+            raise InterpreterError(
+                expression.paren, "Can only call functions and classes"
+            )
+
+        argv = yield from self.resume_arguments(expression, cv)
+
+        if isinstance(cv, LoxFunction):
+            return (yield self.invoke(expression.paren, cv, argv))
+
+        if isinstance(cv, LoxClass):
+            instance = LoxInstance(cv)
+            if cv.initializer:
+                yield self.invoke(expression.paren, cv.initializer, argv, instance)
+            return instance
+
+        return cv.call(self, argv)
+
+    def resume_arguments(
+        self, expression: Expr.Call, function: LoxCallable | None
+    ) -> Generator[Routine, object, list[object]]:
+        argv = []
+        for arg in expression.args:
+            argv.append((yield from self.resume(arg)))
+
+        if function is not None and len(argv) != function.arity():
+            raise InterpreterError(
+                expression.paren,
+                f"Expected {function.arity()} arguments but got {len(argv)}",
+            )
+        return argv
+
+    def invoke(
+        self,
+        paren: Token,
+        function: LoxFunction,
+        args: list[object],
+        this: LoxInstance | None = None,
+    ) -> Routine:
+        if len(self.stack) >= self.max_depth:
+            raise LoxRuntimeError(paren, "Stack overflow")
+
+        if this is None:
+            this = function.receiver
+        return self.resume_function(function, function.frame(args, this), this)
+
+    def resume_function(
+        self, function: LoxFunction, frame: Frame, this: LoxInstance | None
+    ) -> Routine:
+        previous = self.frame
+        while True:
+            self.frame = frame
+            completion = yield from self.resume_statements(function.declaration.body)
+            if type(completion) is not TailCall:
+                break
+            # Made in place of the call that returned it
+            function, frame = completion.function, completion.frame
+        self.frame = previous
+
+        if function.is_initializer:
+            return this
+        return None if completion is None else completion[0]
+
+    # Routines of statements
+    def resume_statement(
+        self, statement: Stmt.Statement
+    ) -> Generator[Routine, object, Completion]:
+        routine = STATEMENT_ROUTINES.get(type(statement))
+        if routine is None or not statement.calls:
+            return self.execute(statement)
+        return (yield from routine(self, statement))
+
+    def resume_statements(
+        self, statements: list[Stmt.Statement]
+    ) -> Generator[Routine, object, Completion]:
+        for stmt in statements:
+            completion = yield from self.resume_statement(stmt)
+            if completion is not None:
+                return completion
+        return None
+
+    def resume_print(self, statement: Stmt.Print) -> Routine:
+        print(stringify((yield from self.resume(statement.expression))))
+
+    def resume_expression(self, statement: Stmt.Expression) -> Routine:
+        yield from self.resume(statement.expression)
+
+    def resume_var(self, statement: Stmt.Var) -> Routine:
+        value = None
+        if statement.initializer is not None:
+            value = yield from self.resume(statement.initializer)
+
+        self.define(statement.name, statement.slot, value, statement.cell)
+
+    def resume_block(self, statement: Stmt.Block) -> Routine:
+        if not statement.has_frame:
+            return (yield from self.resume_statements(statement.statements))
+
+        previous = self.frame
+        self.frame = self.script_frame(statement.size)
+        completion = yield from self.resume_statements(statement.statements)
+        self.frame = previous
+        return completion
+
+    def resume_if(self, statement: Stmt.If) -> Routine:
+        if is_truthy((yield from self.resume(statement.condition))):
+            return (yield from self.resume_statement(statement.consequence))
+        elif statement.alternative is not None:
+            return (yield from self.resume_statement(statement.alternative))
+        return None
+
+    def resume_while(self, statement: Stmt.While) -> Routine:
+        while is_truthy((yield from self.resume(statement.condition))):
+            completion = yield from self.resume_statement(statement.body)
+            if completion is not None:
+                return completion
+        return None
+
+    def resume_return(self, statement: Stmt.Return) -> Routine:
+        value = statement.value
+        if statement.tail:
+            return (yield from self.resume_tail_call(value))
+        return (None if value is None else (yield from self.resume(value)),)
+
+    def resume_tail_call(self, expression: Expr.Call) -> Routine:
+        callee = expression.callee
+        this = None
+        if type(callee) is Expr.Get:
+            obj = yield from self.resume(callee.target)
+            method = None
+            if isinstance(obj, LoxInstance):
+                method = self.property_cache(callee).method_of(obj)
+            if method is None:
+                cv = self.get_property(callee, obj)
+            else:
+                cv, this = method, obj
+
+        elif type(callee) is Expr.Super:
+            cv, this = self.find_super_method(callee)
+
+        else:
+            cv = yield from self.resume(callee)
+
+        if not isinstance(cv, LoxCallable):
+            yield from self.resume_arguments(expression, None)
+            raise InterpreterError(
+                expression.paren, "Can only call functions and classes"
+            )
+
+        argv = yield from self.resume_arguments(expression, cv)
+
+        if isinstance(cv, LoxFunction):
+            if not cv.is_initializer:
+                return cv.tail_call(argv, this)
+            return ((yield self.invoke(expression.paren, cv, argv, this)),)
+
+        if isinstance(cv, LoxClass):
+            instance = LoxInstance(cv)
+            if cv.initializer:
+                yield self.invoke(expression.paren, cv.initializer, argv, instance)
+            return (instance,)
+
+        return (cv.call(self, argv),)
+
+
+ROUTINES: dict[type, Callable[..., Routine]] = {
+    Expr.Grouping: StackInterpreter.resume_grouping,
+    Expr.Unary: StackInterpreter.resume_unary,
+    Expr.Binary: StackInterpreter.resume_binary,
+    Expr.Assignment: StackInterpreter.resume_assignment,
+    Expr.Logical: StackInterpreter.resume_logical,
+    Expr.Call: StackInterpreter.resume_call,
+    Expr.Get: StackInterpreter.resume_get,
+    Expr.Set: StackInterpreter.resume_set,
+}
+
+STATEMENT_ROUTINES: dict[type, Callable[..., Routine]] = {
+    Stmt.Print: StackInterpreter.resume_print,
+    Stmt.Expression: StackInterpreter.resume_expression,
+    Stmt.Var: StackInterpreter.resume_var,
+    Stmt.Block: StackInterpreter.resume_block,
+    Stmt.If: StackInterpreter.resume_if,
+    Stmt.While: StackInterpreter.resume_while,
+    Stmt.Return: StackInterpreter.resume_return,
+}
@@ -1,65 +1,104 @@
 # statement
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import expression as Expr
+from environment import Capture
 from tokens import Token
 
 
 class Statement:
-    pass
+    __slots__ = ()
+
+
+# Declarations carry the slot the Analyzer assigned to the declared name
+# (None in the global scope), and whether functions capture it so that it
+# is held in a Cell. Scopes carry the number of slots their frame needs,
+# and functions the variables of enclosing frames they capture. Like
+# expressions, statements that can contain a call carry whether they do.
 
 
 # -------------------------------------------------------------------------------
-@dataclass
+@dataclass(slots=True)
 class Expression(Statement):
     expression: Expr.Expression
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Print(Statement):
     expression: Expr.Expression
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Var(Statement):
     name: Token
     initializer: Expr.Expression | None
+    slot: int | None = field(default=None, compare=False)
+    cell: bool = field(default=False, compare=False)
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Block(Statement):
     statements: list[Statement]
+    size: int = field(default=0, compare=False)
+    # Whether it opens a frame: only blocks run outside of any function
+    # and declaring locals do, and all of them share one, others keep their
+    # locals in the enclosing frame
+    has_frame: bool = field(default=False, compare=False)
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class If(Statement):
     condition: Expr.Expression
     consequence: Statement
     alternative: Statement | None
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class While(Statement):
     condition: Expr.Expression
     body: Statement
+    # Last token of the loop, used to report errors about the loop as a whole
+    end: Token | None = field(default=None, compare=False)
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+# Weakly referenced by the JIT, which profiles calls to them
+@dataclass(slots=True, weakref_slot=True)
 class Function(Statement):
     name: Token
     params: list[Token]
     body: list[Statement]
+    slot: int | None = field(default=None, compare=False)
+    cell: bool = field(default=False, compare=False)
+    size: int = field(default=0, compare=False)
+    upvalues: list[Capture] = field(default_factory=list, compare=False)
+    # Slots of the parameters, and of 'this' in methods, that functions
+    # declared in the body capture
+    cells: list[int] = field(default_factory=list, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Return(Statement):
     keyword: Token
     value: Expr.Expression | None
+    # Whether the value is a call, which can then run in place of the
+    # function returning it
+    tail: bool = field(default=False, compare=False)
+    calls: bool = field(default=False, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class Class(Statement):
     name: Token
     superclass: Expr.Variable | None
     methods: list[Function]
+    slot: int | None = field(default=None, compare=False)
+    cell: bool = field(default=False, compare=False)
+    # Captured by the frame holding 'super' for the methods
+    upvalues: list[Capture] = field(default_factory=list, compare=False)
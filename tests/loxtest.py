@@ -9,6 +9,16 @@ EXPECT_OUTPUT_PATTERN = re.compile("// expect: ?(.*)")
 EXPECT_ERROR_PATTERN = re.compile(r"// Error at ['\"](.+?)['\"]:\s+(.*)")
 EXPECT_RUNTIME_ERROR_PATTERN = re.compile("// expect runtime error: (.+)")
 
+# The limits of the bytecode format, which the stack engine doesn't have
+COMPILE_LIMITS = [
+    "limit/loop_too_large.lox",
+    "limit/no_reuse_constants.lox",
+    "limit/too_many_constants.lox",
+    "limit/too_many_locals.lox",
+    "limit/too_many_upvalues.lox",
+    "function/too_many_parameters.lox",
+]
+
 ALIASES = {
     "ControlFlow": [
         "block/empty.lox",
@@ -64,15 +74,12 @@ ALIASES = {
         "regression/394.lox",
         "super",
     ],
-    "Limits": [
-        "limit/loop_too_large.lox",
-        "limit/no_reuse_constants.lox",
-        "limit/too_many_constants.lox",
-        "limit/too_many_locals.lox",
-        "limit/too_many_upvalues.lox",
-        "limit/stack_overflow.lox",
-        "function/too_many_parameters.lox",
-    ],
+    "Limits": [*COMPILE_LIMITS, "limit/stack_overflow.lox"],
+    "CompileLimits": COMPILE_LIMITS,
+    # Recursion only the engines making tail calls run in constant stack
+    "TailCalls": ["return/deep_tail_call.lox"],
+    # Recursion only the stack engine runs deeper than the Python stack
+    "DeepRecursion": ["function/deep_recursion.lox"],
 }
 
 
@@ -238,7 +245,16 @@ def filter_tests(
     return filtered
 
 
-def run_tests(targets: list[str], skip: list[str], verbosity: int):
+def run_tests(
+    targets: list[str], skip: list[str], verbosity: int, engine: str, level: int
+):
+    # The generated tests go through lox.run_file, which runs the module-wide
+    # engine, at the module-wide optimization level.
+    import lox
+
+    lox.engine = engine
+    lox.optimization_level = level
+
     loader = unittest.TestLoader()
     all_tests = loader.discover(".", "test*.py")
 
@@ -286,6 +302,12 @@ def main():
         "targets", nargs="*", help="Tests to run. Run all tests if empty"
     )
     run_parser.add_argument("--skip", nargs="+", help="Tests to skip")
+    run_parser.add_argument(
+        "--engine", default="tree", help="Execution engine to run the tests with"
+    )
+    run_parser.add_argument(
+        "-O", type=int, default=1, dest="level", help="Optimization level to run at"
+    )
 
     # Parser for listing tests
     list_parser = subparsers.add_parser("list", help="List all the unit tests found")
@@ -302,7 +324,7 @@ def main():
     elif args.command == "run":
         if args.skip is None:
             args.skip = []
-        run_tests(args.targets, args.skip, args.verbose)
+        run_tests(args.targets, args.skip, args.verbose, args.engine, args.level)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+# tokenbuffer
+
+from array import array
+from collections import deque
+from typing import Iterator
+
+from tokens import TYPES, Token
+
+
+class TokenBuffer:
+    """The tokens of a source as parallel arrays of kinds, offsets and lines."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.kinds = array("B")
+        self.starts = array("I")
+        self.ends = array("I")
+        self.lines = array("I")
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def append(self, type: Token.Type, start: int, end: int, line: int):
+        self.kinds.append(type)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+
+    def lexeme(self, index: int) -> str:
+        return self.source[self.starts[index] : self.ends[index]]
+
+    def token(self, index: int) -> Token:
+        type = TYPES[self.kinds[index]]
+        lexeme = self.lexeme(index)
+
+        literal = None
+        if type == Token.Type.NUMBER:
+            literal = float(lexeme)
+        elif type == Token.Type.STRING:
+            literal = lexeme[1:-1]
+
+        return Token(type, lexeme, literal, self.lines[index])
+
+    def tokens(self) -> list[Token]:
+        return [self.token(i) for i in range(len(self))]
+
+
+class TokenStream:
+    """Tokens pulled from an iterator as the Parser reaches them."""
+
+    window = 3
+
+    def __init__(self, tokens: Iterator[Token]):
+        self.tokens = tokens
+        self.buffered: deque[Token] = deque(maxlen=self.window)
+        # Index of the first buffered token
+        self.first = 0
+        self.kinds = StreamKinds(self)
+
+    def token(self, index: int) -> Token:
+        while index >= self.first + len(self.buffered):
+            if len(self.buffered) == self.window:
+                self.first += 1
+            self.buffered.append(next(self.tokens))
+
+        if index < self.first:
+            raise IndexError(f"Token {index} is no longer buffered")
+
+        return self.buffered[index - self.first]
+
+
+class StreamKinds:
+    """The kinds of the tokens of a TokenStream, indexed like an array."""
+
+    def __init__(self, stream: TokenStream):
+        self.stream = stream
+
+    def __getitem__(self, index: int) -> Token.Type:
+        return self.stream.token(index).type
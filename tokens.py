@@ -1,58 +1,62 @@
 # tokens.py
 
 from dataclasses import dataclass
-from enum import Enum, auto
+from enum import Enum, IntEnum, auto
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Token:
-    class Type(Enum):
+    class Type(IntEnum):
+        # Types are small ints so they can be stored in a TokenBuffer, and
+        # compare and hash as fast as ints.
+        __str__ = Enum.__str__
+
         # Single-character tokens
-        LEFT_PAREN = (auto(),)
-        RIGHT_PAREN = (auto(),)
-        LEFT_BRACE = (auto(),)
-        RIGHT_BRACE = (auto(),)
-        COMMA = (auto(),)
-        DOT = (auto(),)
-        MINUS = (auto(),)
-        PLUS = (auto(),)
-        SEMICOLON = (auto(),)
-        SLASH = (auto(),)
-        STAR = (auto(),)
+        LEFT_PAREN = auto()
+        RIGHT_PAREN = auto()
+        LEFT_BRACE = auto()
+        RIGHT_BRACE = auto()
+        COMMA = auto()
+        DOT = auto()
+        MINUS = auto()
+        PLUS = auto()
+        SEMICOLON = auto()
+        SLASH = auto()
+        STAR = auto()
 
         # One or two characters tokens
-        BANG = (auto(),)
-        BANG_EQUAL = (auto(),)
-        EQUAL = (auto(),)
-        EQUAL_EQUAL = (auto(),)
+        BANG = auto()
+        BANG_EQUAL = auto()
+        EQUAL = auto()
+        EQUAL_EQUAL = auto()
 
-        GREATER = (auto(),)
-        GREATER_EQUAL = (auto(),)
-        LESS = (auto(),)
-        LESS_EQUAL = (auto(),)
+        GREATER = auto()
+        GREATER_EQUAL = auto()
+        LESS = auto()
+        LESS_EQUAL = auto()
 
         # Literals
-        IDENTIFIER = (auto(),)
-        STRING = (auto(),)
-        NUMBER = (auto(),)
+        IDENTIFIER = auto()
+        STRING = auto()
+        NUMBER = auto()
 
         # Keywords
-        AND = (auto(),)
-        CLASS = (auto(),)
-        ELSE = (auto(),)
-        FALSE = (auto(),)
-        FUN = (auto(),)
-        FOR = (auto(),)
-        IF = (auto(),)
-        NIL = (auto(),)
-        OR = (auto(),)
-        PRINT = (auto(),)
-        RETURN = (auto(),)
-        SUPER = (auto(),)
-        THIS = (auto(),)
-        TRUE = (auto(),)
-        VAR = (auto(),)
-        WHILE = (auto(),)
+        AND = auto()
+        CLASS = auto()
+        ELSE = auto()
+        FALSE = auto()
+        FUN = auto()
+        FOR = auto()
+        IF = auto()
+        NIL = auto()
+        OR = auto()
+        PRINT = auto()
+        RETURN = auto()
+        SUPER = auto()
+        THIS = auto()
+        TRUE = auto()
+        VAR = auto()
+        WHILE = auto()
 
         EOF = auto()
 
@@ -61,6 +65,11 @@ class Token:
     literal: object = None
     line: int = 0
 
+    def __reduce__(self):
+        # Pickled as the value of its type, which unpickles much faster
+        # than the enum and the state of a frozen dataclass.
+        return (make_token, (int(self.type), self.lexeme, self.literal, self.line))
+
     def __str__(self):
         if self.literal:
             return f"'{self.lexeme}' {self.type} | {self.literal}"
@@ -79,3 +88,11 @@ class Token:
     @classmethod
     def IDENTIFIER(cls, name: str, line: int = 0):
         return Token(Token.Type.IDENTIFIER, name, line)
+
+
+# Token types by value, to turn a stored kind back into its Token.Type
+TYPES = {int(type): type for type in Token.Type}
+
+
+def make_token(type: int, lexeme: str, literal: object, line: int) -> Token:
+    return Token(TYPES[type], lexeme, literal, line)
@@ -0,0 +1,727 @@
+# transpiler
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Callable
+
+import expression as Expr
+import statement as Stmt
+from analyzer import FunctionType
+from tokens import Token
+
+HEADER = """\
+# Generated by lox.py --emit-python
+
+from pyruntime import *
+
+G = globals()
+"""
+
+FOOTER = """
+if __name__ == "__main__":
+    main(STATEMENTS)
+"""
+
+# Variables are emitted as placeholders and only named once the whole
+# program is seen, since whether a variable needs a box depends on code
+# that comes after its declaration.
+PLACEHOLDER = re.compile("\0([A-Z])([0-9]+)\0")
+
+
+@dataclass(eq=False)
+class Binding:
+    """A local variable, boxed in a one element list when a closure captures
+    it in a loop."""
+
+    id: int
+    name: str
+    function: "FunctionState"
+    in_loop: bool
+    is_captured: bool = False
+
+    @property
+    def is_boxed(self) -> bool:
+        return self.in_loop and self.is_captured
+
+    @property
+    def pyname(self) -> str:
+        return f"{'b' if self.is_boxed else 'l'}{self.id}_{self.name}"
+
+
+@dataclass(eq=False)
+class FunctionState:
+    """Emission state of the Python function being generated."""
+
+    id: int
+    type: FunctionType
+    enclosing: "FunctionState | None"
+    this: Binding | None = None
+    loop_depth: int = 0
+    globals: list[str] = field(default_factory=list)
+    nonlocals: list[Binding] = field(default_factory=list)
+    # Boxed variables of enclosing functions used here or in a nested
+    # function, passed in as keyword-only arguments.
+    boxes: list[Binding] = field(default_factory=list)
+
+
+Line = tuple[int, str | Callable[[], list[str]], dict[str, int]]
+
+NUMBER_OPERATORS = {
+    Token.Type.MINUS: "-",
+    Token.Type.STAR: "*",
+    Token.Type.GREATER: ">",
+    Token.Type.GREATER_EQUAL: ">=",
+    Token.Type.LESS: "<",
+    Token.Type.LESS_EQUAL: "<=",
+}
+
+BOOLEAN_OPERATORS = {
+    Token.Type.GREATER,
+    Token.Type.GREATER_EQUAL,
+    Token.Type.LESS,
+    Token.Type.LESS_EQUAL,
+    Token.Type.EQUAL_EQUAL,
+    Token.Type.BANG_EQUAL,
+}
+
+
+def literal(value: object) -> str:
+    if value == float("inf"):
+        return "INF"
+    if type(value) is float and not math.isfinite(value):
+        # Folded constants can be -inf or nan
+        return f'float("{value}")'
+    return repr(value)
+
+
+def is_pure(expression: Expr.Expression) -> bool:
+    """Whether evaluating the expression twice is the same as once."""
+    match expression:
+        case Expr.Grouping(expr):
+            return is_pure(expr)
+        case Expr.Literal() | Expr.Variable() | Expr.This():
+            return True
+        case _:
+            return False
+
+
+def is_boolean(expression: Expr.Expression) -> bool:
+    """Whether the expression always evaluates to true or false."""
+    match expression:
+        case Expr.Grouping(expr):
+            return is_boolean(expr)
+        case Expr.Literal(value):
+            return type(value) is bool
+        case Expr.Unary(operator):
+            return operator.type == Token.Type.BANG
+        case Expr.Binary(operator):
+            return operator.type in BOOLEAN_OPERATORS
+        case Expr.Logical(_, left, right):
+            return is_boolean(left) and is_boolean(right)
+        case _:
+            return False
+
+
+class Transpiler:
+    """Translate an analyzed list of Statements into Python source."""
+
+    def __init__(self, is_repl: bool = False):
+        self.is_repl = is_repl
+        self.lines: list[Line] = []
+        self.indent = 0
+        # Globals read by the expressions of the line being emitted
+        self.reads: dict[str, int] = {}
+
+        # Locals in scope by frame, as the Analyzer numbered them, keyed by
+        # slot since blocks may keep theirs in the frame enclosing them
+        self.scopes: list[dict[int, Binding]] = []
+        self.bindings: dict[int, Binding] = {}
+        self.functions: dict[int, FunctionState] = {}
+        self.function: FunctionState | None = None
+        self.ids = 0
+
+    def transpile(self, statements: list[Stmt.Statement]) -> str:
+        names = []
+        for i, stmt in enumerate(statements):
+            name = f"statement_{i + 1}"
+            names.append(name)
+
+            self.emit("")
+            function = self.begin_function(FunctionType.NONE)
+            self.emit(f"def {name}():")
+            self.body([stmt], function)
+            self.end_function()
+
+        self.emit("")
+        self.emit(f"STATEMENTS = [{', '.join(names)}]")
+
+        return HEADER + self.render() + FOOTER
+
+    # Emitting
+    def next_id(self) -> int:
+        self.ids += 1
+        return self.ids
+
+    def emit(self, text: str | Callable[[], list[str]]):
+        self.lines.append((self.indent, text, self.reads))
+        self.reads = {}
+
+    def body(
+        self,
+        statements: list[Stmt.Statement],
+        function: FunctionState | None = None,
+    ):
+        self.indent += 1
+        start = len(self.lines)
+
+        if function:
+            self.emit(lambda: self.declarations(function))
+
+        for stmt in statements:
+            self.statement(stmt)
+
+        if all(callable(text) for _, text, _ in self.lines[start:]):
+            self.emit("pass")
+        self.indent -= 1
+
+    def render(self) -> str:
+        def substitute(match: re.Match) -> str:
+            kind, id = match.group(1), int(match.group(2))
+            if kind == "K":
+                return self.keyword_arguments(self.functions[id], ", ")
+            if kind == "J":
+                return self.keyword_arguments(self.functions[id], "")
+
+            binding = self.bindings[id]
+            boxed = binding.is_boxed
+            match kind:
+                case "V":
+                    return binding.pyname
+                case "R":
+                    return f"{binding.pyname}[0]" if boxed else binding.pyname
+                case "O":
+                    return "[" if boxed else ""
+                case "C":
+                    return "]" if boxed else ""
+                case "A":
+                    return (
+                        f"store({binding.pyname}, "
+                        if boxed
+                        else f"({binding.pyname} := "
+                    )
+                case _:
+                    raise NotImplementedError
+
+        out = []
+        for indent, text, reads in self.lines:
+            texts = text() if callable(text) else [PLACEHOLDER.sub(substitute, text)]
+            for line in texts:
+                line = "    " * indent + line if line else ""
+                if reads:
+                    line += "  # " + " ".join(f"{n}@{l}" for n, l in reads.items())
+                out.append(line)
+
+        return "\n".join(out) + "\n"
+
+    def declarations(self, function: FunctionState) -> list[str]:
+        lines = []
+        if function.globals:
+            lines.append(f"global {', '.join(function.globals)}")
+
+        nonlocals = [b.pyname for b in function.nonlocals if not b.is_boxed]
+        if nonlocals:
+            lines.append(f"nonlocal {', '.join(nonlocals)}")
+        return lines
+
+    def keyword_arguments(self, function: FunctionState, separator: str) -> str:
+        if not function.boxes:
+            return ""
+        boxes = ", ".join(f"{b.pyname}={b.pyname}" for b in function.boxes)
+        return f"{separator}*, {boxes}"
+
+    # Scopes and variables
+    def begin_function(self, type: FunctionType) -> FunctionState:
+        function = FunctionState(self.next_id(), type, self.function)
+        self.functions[function.id] = function
+        self.function = function
+        return function
+
+    def end_function(self):
+        assert self.function
+        self.function = self.function.enclosing
+
+    def declare(self, name: str, slot: int) -> Binding:
+        assert self.function
+        binding = Binding(
+            self.next_id(), name, self.function, self.function.loop_depth > 0
+        )
+        self.bindings[binding.id] = binding
+        self.scopes[-1][slot] = binding
+        return binding
+
+    def declare_global(self, name: Token) -> str:
+        assert self.function
+        pyname = f"g_{name.lexeme}"
+        if pyname not in self.function.globals:
+            self.function.globals.append(pyname)
+        return pyname
+
+    def resolve(self, depth: int, slot: int, is_assignment: bool = False) -> Binding:
+        binding = self.scopes[-1 - depth][slot]
+
+        function = self.function
+        assert function
+        if binding.function is not function:
+            binding.is_captured = True
+            if is_assignment and binding not in function.nonlocals:
+                function.nonlocals.append(binding)
+
+            if binding.in_loop:
+                enclosing = function
+                while enclosing is not binding.function:
+                    assert enclosing
+                    if binding not in enclosing.boxes:
+                        enclosing.boxes.append(binding)
+                    enclosing = enclosing.enclosing
+
+        return binding
+
+    def read(self, name: Token, depth: int | None, slot: int | None) -> str:
+        if depth is None:
+            self.reads.setdefault(name.lexeme, name.line + 1)
+            return f"g_{name.lexeme}"
+
+        assert slot is not None
+        return f"\0R{self.resolve(depth, slot).id}\0"
+
+    # Statements
+    def statement(self, statement: Stmt.Statement):
+        match statement:
+            case Stmt.Print(expr):
+                self.emit(f"print(stringify({self.expression(expr)}))")
+
+            case Stmt.Expression(expr):
+                if self.is_repl:
+                    self.emit(f"print(stringify({self.expression(expr)}))")
+                else:
+                    self.expression_statement(expr)
+
+            case Stmt.Var(name, initializer):
+                value = (
+                    "None" if initializer is None else self.expression(initializer)
+                )
+                if statement.slot is None:
+                    self.emit(f"{self.declare_global(name)} = {value}")
+                else:
+                    binding = self.declare(name.lexeme, statement.slot)
+                    id = binding.id
+                    self.emit(f"\0V{id}\0 = \0O{id}\0{value}\0C{id}\0")
+
+            case Stmt.Block(stmts) if not statement.has_frame:
+                for stmt in stmts:
+                    self.statement(stmt)
+
+            case Stmt.Block(stmts):
+                self.scopes.append({})
+                for stmt in stmts:
+                    self.statement(stmt)
+                self.scopes.pop()
+
+            case Stmt.If(cond, conseq, alt):
+                self.emit(f"if {self.condition(cond)}:")
+                self.body([conseq])
+                if alt is not None:
+                    self.emit("else:")
+                    self.body([alt])
+
+            case Stmt.While(cond, body):
+                assert self.function
+                self.emit(f"while {self.condition(cond)}:")
+                self.function.loop_depth += 1
+                self.body([body])
+                self.function.loop_depth -= 1
+
+            case Stmt.Function(name, _, _):
+                self.function_declaration(statement)
+
+            case Stmt.Return(_, value):
+                assert self.function
+                if self.function.type == FunctionType.INITIALIZER:
+                    assert self.function.this
+                    self.emit(f"return \0V{self.function.this.id}\0")
+                elif value is None:
+                    self.emit("return None")
+                else:
+                    self.emit(f"return {self.expression(value)}")
+
+            case Stmt.Class(name, _, _):
+                self.class_declaration(statement)
+
+            case _:
+                raise NotImplementedError
+
+    def expression_statement(self, expr: Expr.Expression):
+        match expr:
+            case Expr.Assignment(name, value) if expr.depth is None:
+                pyname = self.declare_global(name)
+                self.emit(f"_a0 = {self.expression(value, 1)}")
+                self.emit(
+                    f'{pyname} = _a0 if "{pyname}" in G else '
+                    f"fail({name.line + 1}, \"Undefined variable '{name.lexeme}'\")"
+                )
+
+            case Expr.Assignment(name, value):
+                assert expr.depth is not None and expr.slot is not None
+                binding = self.resolve(expr.depth, expr.slot, True)
+                self.emit(f"\0R{binding.id}\0 = {self.expression(value)}")
+
+            case Expr.Set(target, name, value):
+                self.emit(
+                    f"if type(_o0 := {self.expression(target, 1)}) is not Instance: "
+                    f'fail({name.line + 1}, "Only instances have fields")'
+                )
+                self.emit(f"_o0.fields[{name.lexeme!r}] = {self.expression(value, 1)}")
+
+            case _:
+                self.emit(self.expression(expr))
+
+    def function_declaration(self, declaration: Stmt.Function):
+        if declaration.slot is None:
+            pyname = self.declare_global(declaration.name)
+            self.function_definition(pyname, declaration, FunctionType.FUNCTION)
+            return
+
+        binding = self.declare(declaration.name.lexeme, declaration.slot)
+        id = binding.id
+        defname = f"l{id}_{declaration.name.lexeme}"
+
+        # A boxed function must have its box before it is defined, in case
+        # it captures itself.
+        self.emit(lambda: [f"{binding.pyname} = [None]"] if binding.is_boxed else [])
+        self.function_definition(defname, declaration, FunctionType.FUNCTION)
+        self.emit(
+            lambda: [f"{binding.pyname}[0] = {defname}"] if binding.is_boxed else []
+        )
+
+    def function_definition(
+        self,
+        defname: str,
+        declaration: Stmt.Function,
+        type: FunctionType,
+    ):
+        function = self.begin_function(type)
+
+        params = []
+        self.scopes.append({})
+        # Methods take their instance in the first slot, like in the
+        # Analyzer
+        first = 0
+        if type in (FunctionType.METHOD, FunctionType.INITIALIZER):
+            function.this = self.declare("this", 0)
+            params.append(f"\0V{function.this.id}\0")
+            first = 1
+
+        for slot, param in enumerate(declaration.params, first):
+            params.append(f"\0V{self.declare(param.lexeme, slot).id}\0")
+
+        if params:
+            self.emit(f"def {defname}({', '.join(params)}\0K{function.id}\0):")
+        else:
+            self.emit(f"def {defname}(\0J{function.id}\0):")
+
+        body: list[Stmt.Statement] = list(declaration.body)
+        if type == FunctionType.INITIALIZER:
+            body.append(Stmt.Return(declaration.name, None))
+        self.body(body, function)
+
+        self.scopes.pop()
+        self.end_function()
+
+    def class_declaration(self, declaration: Stmt.Class):
+        name = declaration.name
+        if declaration.slot is None:
+            target = self.declare_global(name)
+        else:
+            binding = self.declare(name.lexeme, declaration.slot)
+            self.emit(
+                lambda: [f"{binding.pyname} = [None]"] if binding.is_boxed else []
+            )
+            target = f"\0R{binding.id}\0"
+
+        superclass = "None"
+        if declaration.superclass:
+            value = self.expression(declaration.superclass)
+            line = declaration.superclass.name.line + 1
+
+            self.scopes.append({})
+            binding = self.declare("super", 0)
+            id = binding.id
+            self.emit(
+                f"\0V{id}\0 = \0O{id}\0check_superclass({value}, {line})\0C{id}\0"
+            )
+            superclass = f"\0R{id}\0"
+
+        methods = []
+        for method in declaration.methods:
+            defname = f"l{self.next_id()}_{method.name.lexeme}"
+            type = (
+                FunctionType.INITIALIZER
+                if method.name.lexeme == "init"
+                else FunctionType.METHOD
+            )
+            self.function_definition(defname, method, type)
+            methods.append(f"{method.name.lexeme!r}: {defname}")
+
+        if declaration.superclass:
+            self.scopes.pop()
+
+        self.emit(
+            f"{target} = Class({name.lexeme!r}, {superclass}, {{{', '.join(methods)}}})"
+        )
+
+    # Expressions
+    def condition(self, expr: Expr.Expression, depth: int = 0) -> str:
+        """An expression evaluating to the truthiness of expr."""
+        if is_boolean(expr):
+            return self.expression(expr, depth)
+
+        while isinstance(expr, Expr.Grouping):
+            expr = expr.expression
+        if isinstance(expr, Expr.Literal):
+            return repr(expr.value is not None and expr.value is not False)
+
+        if is_pure(expr):
+            value = self.expression(expr, depth)
+            return f"{value} is not None and {value} is not False"
+
+        temp = f"_c{depth}"
+        value = self.expression(expr, depth + 1)
+        return f"({temp} := {value}) is not None and {temp} is not False"
+
+    def expression(self, expression: Expr.Expression, depth: int = 0) -> str:
+        match expression:
+            case Expr.Literal(value):
+                return literal(value)
+
+            case Expr.Grouping(expr):
+                return self.expression(expr, depth)
+
+            case Expr.Variable(name):
+                return self.read(name, expression.depth, expression.slot)
+
+            case Expr.This(keyword):
+                return self.read(keyword, expression.depth, expression.slot)
+
+            case Expr.Assignment(name, value):
+                val = self.expression(value, depth + 1)
+                if expression.depth is None:
+                    pyname = self.declare_global(name)
+                    return f'({pyname} := defined(G, "{pyname}", {val}, {name.line + 1}))'
+
+                assert expression.slot is not None
+                binding = self.resolve(expression.depth, expression.slot, True)
+                return f"\0A{binding.id}\0{val})"
+
+            case Expr.Unary(operator, right):
+                return self.unary(operator, right, depth)
+
+            case Expr.Binary(operator, left, right):
+                return self.binary(operator, left, right, depth)
+
+            case Expr.Logical(operator, left, right):
+                lhs = self.expression(left, depth + 1)
+                rhs = self.expression(right, depth + 1)
+                is_or = operator.type == Token.Type.OR
+
+                if is_boolean(left):
+                    return f"({lhs} {'or' if is_or else 'and'} {rhs})"
+
+                temp = f"_v{depth}"
+                truthy = f"({temp} := {lhs}) is not None and {temp} is not False"
+                if is_or:
+                    return f"({temp} if {truthy} else {rhs})"
+                return f"({rhs} if {truthy} else {temp})"
+
+            case Expr.Call(callee, paren, args):
+                return self.call(callee, paren, args, depth)
+
+            case Expr.Get(target, name):
+                obj = self.expression(target, depth + 1)
+                key = repr(name.lexeme)
+                line = name.line + 1
+
+                if is_pure(target):
+                    temp, bind = obj, obj
+                else:
+                    temp = f"_o{depth}"
+                    bind = f"{temp} := {obj}"
+
+                return (
+                    f"({temp}.fields[{key}] if type({bind}) is Instance and "
+                    f"{key} in {temp}.fields else get_property({temp}, {key}, {line}))"
+                )
+
+            case Expr.Set(target, name, value):
+                obj = self.expression(target, depth + 1)
+                val = self.expression(value, depth + 1)
+                key = repr(name.lexeme)
+                line = name.line + 1
+
+                if is_pure(target):
+                    temp, bind = obj, obj
+                else:
+                    temp = f"_o{depth}"
+                    bind = f"{temp} := {obj}"
+
+                return (
+                    f"(set_field({temp}, {key}, {val}) if type({bind}) is Instance "
+                    f'else fail({line}, "Only instances have fields"))'
+                )
+
+            case Expr.Super(_, method):
+                assert expression.depth
+                superclass = f"\0R{self.resolve(expression.depth, 0).id}\0"
+                this = f"\0R{self.resolve(expression.depth - 1, 0).id}\0"
+                return (
+                    f"bind_super({superclass}, {this}, "
+                    f"{method.lexeme!r}, {method.line + 1})"
+                )
+
+            case _:
+                raise NotImplementedError
+
+    def unary(self, operator: Token, right: Expr.Expression, depth: int) -> str:
+        while isinstance(right, Expr.Grouping):
+            right = right.expression
+        value = self.expression(right, depth + 1)
+
+        if operator.type == Token.Type.BANG:
+            if is_boolean(right):
+                return f"(not {value})"
+            if isinstance(right, Expr.Literal):
+                return repr(right.value is None or right.value is False)
+            if is_pure(right):
+                return f"({value} is None or {value} is False)"
+            temp = f"_u{depth}"
+            return f"(({temp} := {value}) is None or {temp} is False)"
+
+        if is_pure(right):
+            temp, bind = value, value
+        else:
+            temp = f"_u{depth}"
+            bind = f"{temp} := {value}"
+
+        return (
+            f"(-{temp} if type({bind}) is float else "
+            f'fail({operator.line + 1}, "Operand must be a number"))'
+        )
+
+    def binary(
+        self,
+        operator: Token,
+        left: Expr.Expression,
+        right: Expr.Expression,
+        depth: int,
+    ) -> str:
+        lhs = self.expression(left, depth + 1)
+        rhs = self.expression(right, depth + 1)
+        line = operator.line + 1
+
+        match operator.type:
+            case Token.Type.EQUAL_EQUAL:
+                return f"is_equal({lhs}, {rhs})"
+            case Token.Type.BANG_EQUAL:
+                return f"(not is_equal({lhs}, {rhs}))"
+
+        # A variable on the left is only read once if the right operand
+        # can't assign it.
+        if isinstance(left, Expr.Literal) or (is_pure(left) and is_pure(right)):
+            ltemp, lbind = lhs, lhs
+        else:
+            ltemp = f"_l{depth}"
+            lbind = f"{ltemp} := {lhs}"
+
+        if is_pure(right):
+            rtemp, rbind = rhs, rhs
+        else:
+            rtemp = f"_r{depth}"
+            rbind = f"{rtemp} := {rhs}"
+
+        constant = right.value if isinstance(right, Expr.Literal) else None
+
+        match operator.type:
+            case Token.Type.PLUS:
+                if type(constant) is float:
+                    check = f"type({lbind}) is float"
+                elif type(constant) is str:
+                    check = f"type({lbind}) is str"
+                else:
+                    check = f"type({lbind}) is type({rbind}) in ADDABLE"
+                return (
+                    f"({ltemp} + {rtemp} if {check} else fail({line}, "
+                    '"Operands must be two numbers or two strings"))'
+                )
+
+            case Token.Type.SLASH:
+                if type(constant) is float and constant != 0.0:
+                    return (
+                        f"({ltemp} / {rtemp} if type({lbind}) is float else "
+                        f'fail({line}, "Operands must be numbers"))'
+                    )
+                return (
+                    f"(INF if (({lbind}), ({rbind}))[1] == 0.0 else "
+                    f"{ltemp} / {rtemp} if type({ltemp}) is type({rtemp}) is float "
+                    f'else fail({line}, "Operands must be numbers"))'
+                )
+
+            case _:
+                symbol = NUMBER_OPERATORS[operator.type]
+                if type(constant) is float:
+                    check = f"type({lbind}) is float"
+                else:
+                    check = f"type({lbind}) is type({rbind}) is float"
+                return (
+                    f"({ltemp} {symbol} {rtemp} if {check} else "
+                    f'fail({line}, "Operands must be numbers"))'
+                )
+
+    def call(
+        self,
+        callee: Expr.Expression,
+        paren: Token,
+        args: list[Expr.Expression],
+        depth: int,
+    ) -> str:
+        function = f"_f{depth}"
+        binds = [f"({function} := {self.expression(callee, depth + 1)})"]
+
+        # Arguments are evaluated into temporaries before the callee is
+        # checked, except literals and variables that no later argument
+        # can assign.
+        impure = [i for i, arg in enumerate(args) if not is_pure(arg)]
+        last_impure = impure[-1] if impure else -1
+
+        values = []
+        for i, arg in enumerate(args):
+            value = self.expression(arg, depth + 1)
+            if isinstance(arg, Expr.Literal) or (is_pure(arg) and i > last_impure):
+                values.append(value)
+            else:
+                temp = f"_a{depth}_{i}"
+                binds.append(f"({temp} := {value})")
+                values.append(temp)
+
+        argv = ", ".join(values)
+        argc = len(args)
+        if len(binds) == 1:
+            check = f"type({binds[0]}) is FunctionType"
+        else:
+            check = f"({', '.join(binds)}) and type({function}) is FunctionType"
+        check += f" and {function}.__code__.co_argcount == {argc}"
+
+        args_tuple = f"({argv},)" if argc == 1 else f"({argv})"
+        return (
+            f"({function}({argv}) if {check} else "
+            f"call({function}, {args_tuple}, {paren.line + 1}))"
+        )
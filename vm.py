@@ -0,0 +1,557 @@
+# vm
+
+import logging
+import math
+from bisect import bisect_right
+
+from bytecode import (
+    OP_ADD,
+    OP_CALL,
+    OP_CLASS,
+    OP_CLOSE_UPVALUE,
+    OP_CLOSURE,
+    OP_CONSTANT,
+    OP_DEFINE_GLOBAL,
+    OP_DIVIDE,
+    OP_EQUAL,
+    OP_FALSE,
+    OP_GET_GLOBAL,
+    OP_GET_LOCAL,
+    OP_GET_PROPERTY,
+    OP_GET_SUPER,
+    OP_GET_UPVALUE,
+    OP_GREATER,
+    OP_GREATER_EQUAL,
+    OP_INHERIT,
+    OP_INVOKE,
+    OP_JUMP,
+    OP_JUMP_IF_FALSE,
+    OP_LESS,
+    OP_LESS_EQUAL,
+    OP_LOOP,
+    OP_METHOD,
+    OP_MULTIPLY,
+    OP_NEGATE,
+    OP_NIL,
+    OP_NOT,
+    OP_NOT_EQUAL,
+    OP_POP,
+    OP_PRINT,
+    OP_RETURN,
+    OP_SET_GLOBAL,
+    OP_SET_LOCAL,
+    OP_SET_PROPERTY,
+    OP_SET_UPVALUE,
+    OP_SUBTRACT,
+    OP_SUPER_INVOKE,
+    OP_TRUE,
+    Function,
+)
+from errors import LoxError, LoxRuntimeError
+from interpreter import Clock
+from loxcallable import LoxCallable
+from loxvalue import is_equal, stringify
+from tokens import Token
+
+# Maximum depth of Lox calls
+FRAMES_MAX = 4096
+
+
+class VMRuntimeError(LoxRuntimeError):
+    def __init__(self, line: int, message: str):
+        super().__init__(Token(Token.Type.EOF, line=line), message)
+
+
+# Runtime objects
+class Upvalue:
+    """A variable captured by a closure, on the stack until it goes out of scope."""
+
+    __slots__ = ("location", "index")
+
+    def __init__(self, stack: list[object], index: int):
+        self.location = stack
+        self.index = index
+
+    def close(self):
+        self.location = [self.location[self.index]]
+        self.index = 0
+
+
+class Closure:
+    __slots__ = ("function", "upvalues")
+
+    def __init__(self, function: Function, upvalues: list[Upvalue]):
+        self.function = function
+        self.upvalues = upvalues
+
+    def __str__(self):
+        return str(self.function)
+
+
+class Class:
+    def __init__(self, name: str):
+        self.name = name
+        self.methods: dict[str, Closure] = {}
+
+    def __str__(self):
+        return self.name
+
+
+class Instance:
+    __slots__ = ("klass", "fields")
+
+    def __init__(self, klass: Class):
+        self.klass = klass
+        self.fields: dict[str, object] = {}
+
+    def __str__(self):
+        return f"{self.klass.name} instance"
+
+
+class BoundMethod:
+    __slots__ = ("receiver", "method")
+
+    def __init__(self, receiver: Instance, method: Closure):
+        self.receiver = receiver
+        self.method = method
+
+    def __str__(self):
+        return str(self.method)
+
+
+class CallFrame:
+    __slots__ = ("closure", "ip", "base")
+
+    def __init__(self, closure: Closure, base: int):
+        self.closure = closure
+        self.ip = 0
+        self.base = base
+
+
+class VM:
+    """Execute the bytecode produced by the Compiler on a value stack."""
+
+    def __init__(self):
+        self.stack: list[object] = []
+        self.frames: list[CallFrame] = []
+        self.open_upvalues: dict[int, Upvalue] = {}
+        self.globals: dict[str, object] = {"clock": Clock()}
+        self.logger = logging.getLogger("Lox.VM")
+
+    def interpret(self, function: Function):
+        self.stack.append(Closure(function, []))
+        script = CallFrame(self.stack[-1], 0)
+        self.frames.append(script)
+
+        has_error = False
+        try:
+            while True:
+                try:
+                    self.run()
+                    break
+
+                except LoxRuntimeError as e:
+                    self.logger.error(e)
+                    has_error = True
+
+                    # Go on with the next top-level statement, like the
+                    # Interpreter
+                    self.close_upvalues(1)
+                    del self.stack[1:]
+                    del self.frames[1:]
+                    script.ip = function.statements[
+                        bisect_right(function.statements, script.ip - 1)
+                    ]
+
+        finally:
+            self.stack.clear()
+            self.frames.clear()
+            self.open_upvalues.clear()
+
+        if has_error:
+            raise LoxError()
+
+    def error(self, message: str) -> VMRuntimeError:
+        frame = self.frames[-1]
+        line = frame.closure.function.chunk.lines[frame.ip - 1]
+        return VMRuntimeError(line, message)
+
+    # Calls
+    def call(self, closure: Closure, argc: int):
+        if argc != closure.function.arity:
+            raise self.error(
+                f"Expected {closure.function.arity} arguments but got {argc}"
+            )
+
+        if len(self.frames) == FRAMES_MAX:
+            raise self.error("Stack overflow")
+
+        self.frames.append(CallFrame(closure, len(self.stack) - argc - 1))
+
+    def call_value(self, callee: object, argc: int):
+        match callee:
+            case Closure():
+                self.call(callee, argc)
+
+            case BoundMethod():
+                self.stack[-argc - 1] = callee.receiver
+                self.call(callee.method, argc)
+
+            case Class():
+                self.stack[-argc - 1] = Instance(callee)
+                initializer = callee.methods.get("init")
+                if initializer is not None:
+                    self.call(initializer, argc)
+                elif argc != 0:
+                    raise self.error(f"Expected 0 arguments but got {argc}")
+
+            case LoxCallable():
+                if argc != callee.arity():
+                    raise self.error(
+                        f"Expected {callee.arity()} arguments but got {argc}"
+                    )
+                args = self.stack[len(self.stack) - argc :]
+                result = callee.call(self, args)
+                del self.stack[len(self.stack) - argc - 1 :]
+                self.stack.append(result)
+
+            case _:
+                raise self.error("Can only call functions and classes")
+
+    def invoke(self, name: str, argc: int):
+        receiver = self.stack[-argc - 1]
+        if not isinstance(receiver, Instance):
+            raise self.error("Only instances have properties")
+
+        if name in receiver.fields:
+            value = receiver.fields[name]
+            self.stack[-argc - 1] = value
+            self.call_value(value, argc)
+        else:
+            self.invoke_from_class(receiver.klass, name, argc)
+
+    def invoke_from_class(self, klass: Class, name: str, argc: int):
+        method = klass.methods.get(name)
+        if method is None:
+            raise self.error(f"Undefined property '{name}'")
+        self.call(method, argc)
+
+    def bind_method(self, klass: Class, name: str, receiver: Instance) -> BoundMethod:
+        method = klass.methods.get(name)
+        if method is None:
+            raise self.error(f"Undefined property '{name}'")
+        return BoundMethod(receiver, method)
+
+    # Upvalues
+    def capture_upvalue(self, index: int) -> Upvalue:
+        upvalue = self.open_upvalues.get(index)
+        if upvalue is None:
+            upvalue = Upvalue(self.stack, index)
+            self.open_upvalues[index] = upvalue
+        return upvalue
+
+    def close_upvalues(self, last: int):
+        for index in [i for i in self.open_upvalues if i >= last]:
+            self.open_upvalues.pop(index).close()
+
+    def run(self):
+        stack = self.stack
+        frames = self.frames
+        push = stack.append
+        pop = stack.pop
+        globals = self.globals
+
+        frame = frames[-1]
+        closure = frame.closure
+        code = closure.function.chunk.code
+        constants = closure.function.chunk.constants
+        base = frame.base
+        ip = frame.ip
+
+        while True:
+            op = code[ip]
+            ip += 1
+
+            # Instructions are roughly sorted by how often they run
+            if op == OP_GET_LOCAL:
+                push(stack[base + code[ip]])
+                ip += 1
+
+            elif op == OP_CONSTANT:
+                push(constants[code[ip]])
+                ip += 1
+
+            elif op == OP_POP:
+                pop()
+
+            elif op == OP_JUMP_IF_FALSE:
+                value = stack[-1]
+                if value is None or value is False:
+                    ip += code[ip] << 8 | code[ip + 1]
+                ip += 2
+
+            elif op == OP_GET_GLOBAL:
+                name = constants[code[ip]]
+                ip += 1
+                try:
+                    push(globals[name])
+                except KeyError:
+                    frame.ip = ip
+                    raise self.error(f"Undefined variable '{name}'") from None
+
+            elif op == OP_SET_LOCAL:
+                stack[base + code[ip]] = stack[-1]
+                ip += 1
+
+            elif op == OP_ADD:
+                right = pop()
+                left = stack[-1]
+                if type(left) is float and type(right) is float:
+                    stack[-1] = left + right
+                elif type(left) is str and type(right) is str:
+                    stack[-1] = left + right
+                else:
+                    frame.ip = ip
+                    raise self.error("Operands must be two numbers or two strings")
+
+            elif op == OP_SUBTRACT:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not float or type(right) is not float:
+                    frame.ip = ip
+                    raise self.error("Operands must be numbers")
+                stack[-1] = left - right
+
+            elif op == OP_LESS:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not float or type(right) is not float:
+                    frame.ip = ip
+                    raise self.error("Operands must be numbers")
+                stack[-1] = left < right
+
+            elif op == OP_CALL:
+                argc = code[ip]
+                frame.ip = ip + 1
+                self.call_value(stack[-argc - 1], argc)
+                frame = frames[-1]
+                closure = frame.closure
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                base = frame.base
+                ip = frame.ip
+
+            elif op == OP_RETURN:
+                result = pop()
+                if self.open_upvalues:
+                    self.close_upvalues(base)
+                frames.pop()
+                if not frames:
+                    pop()
+                    return
+
+                del stack[base:]
+                push(result)
+                frame = frames[-1]
+                closure = frame.closure
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                base = frame.base
+                ip = frame.ip
+
+            elif op == OP_LOOP:
+                ip += 2 - (code[ip] << 8 | code[ip + 1])
+
+            elif op == OP_JUMP:
+                ip += (code[ip] << 8 | code[ip + 1]) + 2
+
+            elif op == OP_GET_UPVALUE:
+                upvalue = closure.upvalues[code[ip]]
+                push(upvalue.location[upvalue.index])
+                ip += 1
+
+            elif op == OP_SET_UPVALUE:
+                upvalue = closure.upvalues[code[ip]]
+                upvalue.location[upvalue.index] = stack[-1]
+                ip += 1
+
+            elif op == OP_INVOKE:
+                name = constants[code[ip]]
+                argc = code[ip + 1]
+                frame.ip = ip + 2
+                self.invoke(name, argc)
+                frame = frames[-1]
+                closure = frame.closure
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                base = frame.base
+                ip = frame.ip
+
+            elif op == OP_GET_PROPERTY:
+                instance = stack[-1]
+                name = constants[code[ip]]
+                ip += 1
+                if not isinstance(instance, Instance):
+                    frame.ip = ip
+                    raise self.error("Only instances have properties")
+
+                if name in instance.fields:
+                    stack[-1] = instance.fields[name]
+                else:
+                    frame.ip = ip
+                    stack[-1] = self.bind_method(instance.klass, name, instance)
+
+            elif op == OP_SET_PROPERTY:
+                instance = stack[-2]
+                if not isinstance(instance, Instance):
+                    frame.ip = ip + 1
+                    raise self.error("Only instances have fields")
+
+                value = pop()
+                instance.fields[constants[code[ip]]] = value
+                stack[-1] = value
+                ip += 1
+
+            elif op == OP_SET_GLOBAL:
+                name = constants[code[ip]]
+                ip += 1
+                if name not in globals:
+                    frame.ip = ip
+                    raise self.error(f"Undefined variable '{name}'")
+                globals[name] = stack[-1]
+
+            elif op == OP_MULTIPLY:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not float or type(right) is not float:
+                    frame.ip = ip
+                    raise self.error("Operands must be numbers")
+                stack[-1] = left * right
+
+            elif op == OP_DIVIDE:
+                right = pop()
+                left = stack[-1]
+                if right == 0.0:
+                    stack[-1] = math.inf
+                    continue
+
+                if type(left) is not float or type(right) is not float:
+                    frame.ip = ip
+                    raise self.error("Operands must be numbers")
+                stack[-1] = left / right
+
+            elif op == OP_GREATER:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not float or type(right) is not float:
+                    frame.ip = ip
+                    raise self.error("Operands must be numbers")
+                stack[-1] = left > right
+
+            elif op == OP_GREATER_EQUAL:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not float or type(right) is not float:
+                    frame.ip = ip
+                    raise self.error("Operands must be numbers")
+                stack[-1] = left >= right
+
+            elif op == OP_LESS_EQUAL:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not float or type(right) is not float:
+                    frame.ip = ip
+                    raise self.error("Operands must be numbers")
+                stack[-1] = left <= right
+
+            elif op == OP_EQUAL:
+                right = pop()
+                stack[-1] = is_equal(stack[-1], right)
+
+            elif op == OP_NOT_EQUAL:
+                right = pop()
+                stack[-1] = not is_equal(stack[-1], right)
+
+            elif op == OP_NOT:
+                value = stack[-1]
+                stack[-1] = value is None or value is False
+
+            elif op == OP_NEGATE:
+                value = stack[-1]
+                if type(value) is not float:
+                    frame.ip = ip
+                    raise self.error("Operand must be a number")
+                stack[-1] = -value
+
+            elif op == OP_NIL:
+                push(None)
+
+            elif op == OP_TRUE:
+                push(True)
+
+            elif op == OP_FALSE:
+                push(False)
+
+            elif op == OP_PRINT:
+                print(stringify(pop()))
+
+            elif op == OP_DEFINE_GLOBAL:
+                globals[constants[code[ip]]] = pop()
+                ip += 1
+
+            elif op == OP_CLOSURE:
+                function = constants[code[ip]]
+                ip += 1
+                upvalues = []
+                for _ in range(function.upvalue_count):
+                    if code[ip]:
+                        upvalues.append(self.capture_upvalue(base + code[ip + 1]))
+                    else:
+                        upvalues.append(closure.upvalues[code[ip + 1]])
+                    ip += 2
+                push(Closure(function, upvalues))
+
+            elif op == OP_CLOSE_UPVALUE:
+                self.close_upvalues(len(stack) - 1)
+                pop()
+
+            elif op == OP_GET_SUPER:
+                name = constants[code[ip]]
+                ip += 1
+                superclass = pop()
+                frame.ip = ip
+                stack[-1] = self.bind_method(superclass, name, stack[-1])
+
+            elif op == OP_SUPER_INVOKE:
+                name = constants[code[ip]]
+                argc = code[ip + 1]
+                frame.ip = ip + 2
+                self.invoke_from_class(pop(), name, argc)
+                frame = frames[-1]
+                closure = frame.closure
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                base = frame.base
+                ip = frame.ip
+
+            elif op == OP_CLASS:
+                push(Class(constants[code[ip]]))
+                ip += 1
+
+            elif op == OP_INHERIT:
+                superclass = stack[-2]
+                if not isinstance(superclass, Class):
+                    frame.ip = ip
+                    raise self.error("Superclass must be a class")
+                # Copy the inherited methods down before the subclass
+                # defines its own, so that overrides win.
+                stack[-1].methods.update(superclass.methods)
+                pop()
+
+            elif op == OP_METHOD:
+                method = pop()
+                stack[-1].methods[constants[code[ip]]] = method
+                ip += 1
+
+            else:
+                raise NotImplementedError(f"Unknown opcode {op}")